@@ -4,11 +4,13 @@ range_breakout_ea.py — Range Breakout Strategy (cTrader Integration)
 ✅ Использует реальные данные из cTrader API
 ✅ Автоматический анализ и отчёт для orchestrator.py
 ✅ Работает с M15 таймфреймом (можно изменить)
+✅ Симуляция сделок — через analytics.bracket_orders (без iterrows)
 """
 
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from trading_ai.analytics.bracket_orders import (
+    backtest_range_breakout,
+    summarize_bracket_trades,
+)
 from trading_ai.connectors.ctrader_connector import CTraderConnector
 
 # === ПАРАМЕТРЫ СТРАТЕГИИ ===
@@ -38,53 +40,16 @@ def main():
         }
 
     # === Расчёт стратегии ===
-    trades = []
-    open_trade = None
-    range_high = None
-    range_low = None
-
-    for ts, row in data.iterrows():
-        hour = ts.hour + ts.minute / 60
-
-        # Диапазон накопления
-        if RANGE_HOURS[0] <= hour < RANGE_HOURS[1]:
-            range_high = row["high"] if range_high is None else max(range_high, row["high"])
-            range_low = row["low"] if range_low is None else min(range_low, row["low"])
-
-        # Пробой
-        elif hour >= BREAKOUT_HOUR and range_high and range_low and open_trade is None:
-            range_size = range_high - range_low
-            buy_level = range_high
-            sell_level = range_low
-            tp_buy = buy_level + range_size * TP_MULT
-            sl_buy = buy_level - range_size * SL_MULT
-            tp_sell = sell_level - range_size * TP_MULT
-            sl_sell = sell_level + range_size * SL_MULT
-
-            if row["high"] >= buy_level:
-                open_trade = {"type": "BUY", "entry": buy_level, "tp": tp_buy, "sl": sl_buy, "entry_time": ts}
-            elif row["low"] <= sell_level:
-                open_trade = {"type": "SELL", "entry": sell_level, "tp": tp_sell, "sl": sl_sell, "entry_time": ts}
-
-        # Проверяем закрытие сделки
-        if open_trade:
-            if open_trade["type"] == "BUY":
-                if row["low"] <= open_trade["sl"]:
-                    trades.append({"result": open_trade["sl"] - open_trade["entry"]})
-                    open_trade = None
-                elif row["high"] >= open_trade["tp"]:
-                    trades.append({"result": open_trade["tp"] - open_trade["entry"]})
-                    open_trade = None
-            elif open_trade["type"] == "SELL":
-                if row["high"] >= open_trade["sl"]:
-                    trades.append({"result": open_trade["entry"] - open_trade["sl"]})
-                    open_trade = None
-                elif row["low"] <= open_trade["tp"]:
-                    trades.append({"result": open_trade["entry"] - open_trade["tp"]})
-                    open_trade = None
+    trades = backtest_range_breakout(
+        data,
+        range_hours=RANGE_HOURS,
+        breakout_hour=BREAKOUT_HOUR,
+        tp_mult=TP_MULT,
+        sl_mult=SL_MULT,
+    )
 
     # === Результаты ===
-    if not trades:
+    if trades.empty:
         return {
             "symbol": SYMBOL,
             "total_trades": 0,
@@ -93,20 +58,19 @@ def main():
             "comment_ru": "Пробой не произошёл. Нейтральный день на рынке."
         }
 
-    df = pd.DataFrame(trades)
-    df["pnl"] = df["result"] * LOT_SIZE * 100
-    total_pnl = round(df["pnl"].sum(), 2)
-    win_rate = round((df["pnl"] > 0).mean() * 100, 1)
+    summary = summarize_bracket_trades(trades, lot_size=LOT_SIZE, point_value=100)
+    total_pnl = summary["total_pnl"]
+    win_rate = summary["win_rate"]
 
     comment = (
-        f"📊 За период протестировано {len(df)} сделок. "
+        f"📊 За период протестировано {summary['total_trades']} сделок. "
         f"Итоговая прибыль: {total_pnl}$, винрейт {win_rate}%. "
         f"Рынок {'бычий' if total_pnl > 0 else 'медвежий'} на отрезке {TIMEFRAME}."
     )
 
     return {
         "symbol": SYMBOL,
-        "total_trades": len(df),
+        "total_trades": summary["total_trades"],
         "total_pnl": total_pnl,
         "win_rate": win_rate,
         "comment_ru": comment
@@ -1,6 +1,34 @@
 # src/trading_ai/agents/cfa_agent.py
 
+from typing import Optional
+
+import pandas as pd
+
+from src.trading_ai.analytics.portfolio import (
+    FeeSpec,
+    equal_weights,
+    portfolio_backtest,
+    summarize_portfolio,
+)
+
+
 class CFAAgent:
     def run(self):
         print("💼 CFAAgent: analyzing financial ratios & valuations...")
         # например: P/E, P/B, ROE из API или CSV
+
+    def analyze_portfolio(
+        self,
+        prices: pd.DataFrame,
+        weights: Optional[pd.DataFrame] = None,
+        fees: FeeSpec = 0.0,
+        name: str = "WATCHLIST",
+    ) -> str:
+        """
+        Оценка портфельной экспозиции: цены (время × символы) и целевые веса.
+        Без весов — равные доли с еженедельной ребалансировкой.
+        """
+        if weights is None:
+            weights = equal_weights(prices, freq="W")
+        res = portfolio_backtest(prices, weights, fees=fees)
+        return summarize_portfolio(name, res)
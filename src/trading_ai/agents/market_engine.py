@@ -3,28 +3,104 @@ market_engine.py — FULL Market Engine v1 + Candle Engine
 
 Задачи:
 - собрать срез рынка по ключевым инструментам (WATCHLIST)
-- собрать свечи по всем нужным таймфреймам (CANDLE_TIMEFRAMES)
+- собрать свечи по всем нужным таймфреймам (CANDLE_TIMEFRAMES) —
+  одним пакетом CandleBatch (массивы на символ × таймфрейм)
+- вести потоковую статистику доходности по каждому символу (O(1) на новую свечу)
+- вести потоковую корреляционную матрицу по всему WATCHLIST
+- потоковые детекторы всплесков объёма и сдвигов волатильности → события в Discord
+- режимы волатильности по всем символам (сетка пар окон)
+- записывать спреды снапшотов (data/spreads) для модели издержек бэктеста
 - отправить аккуратный отчёт в Discord через router.dispatch(...)
 """
 
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime
+from datetime import datetime, timezone
 from textwrap import shorten
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
+
+from trading_ai.analytics.correlation import StreamingCorrelation, summarize_correlation
+from trading_ai.analytics.execution import record_spreads
+from trading_ai.analytics.regimes import (
+    DEFAULT_WINDOW_PAIRS,
+    RegimeScan,
+    WindowPair,
+    scan_volatility_regimes,
+    summarize_regimes,
+)
+from trading_ai.analytics.statistics import (
+    MarketEvent,
+    OnlineReturnStats,
+    RollingVolatility,
+    RunningDrawdown,
+    VolatilityShiftDetector,
+    VolumeSpikeDetector,
+)
 from trading_ai.services.ctrader.market_snapshot import (
     WATCHLIST,
     CANDLE_TIMEFRAMES,
+    CandleBatch,
     SymbolSnapshot,
-    Candle,
+    get_candle_batch,
     get_full_market_snapshot,
-    get_full_candles_snapshot,
 )
 from trading_ai.services.discord.router import dispatch
 
 
+class SymbolStreamStats:
+    """
+    Потоковая статистика по одному символу: кормим только новые свечи,
+    историю не пересканируем.
+    """
+
+    def __init__(self, periods_per_year: int = 252, vol_window: int = 14) -> None:
+        self.returns = OnlineReturnStats(periods_per_year=periods_per_year)
+        self.volatility = RollingVolatility(window=vol_window, periods_per_year=periods_per_year)
+        self.drawdown = RunningDrawdown()
+        self.last_time: Optional[int] = None      # UTC, сек (как time в CANDLE_DTYPE)
+
+    def update(self, bars: np.ndarray) -> int:
+        """Добавляет свечи новее последней учтённой. Возвращает число новых."""
+        if self.last_time is not None:
+            bars = bars[bars["time"] > self.last_time]
+        for close in bars["close"].tolist():
+            self.returns.update(close)
+            self.volatility.update(close)
+            self.drawdown.update(close)
+        if len(bars):
+            self.last_time = int(bars["time"][-1])
+        return len(bars)
+
+
+class SymbolDetectors:
+    """Детекторы событий по одной паре (символ, таймфрейм)."""
+
+    def __init__(self, symbol_key: str, timeframe: str) -> None:
+        self.volume = VolumeSpikeDetector(symbol_key, timeframe)
+        self.volatility = VolatilityShiftDetector(symbol_key, timeframe)
+        self.last_time: Optional[int] = None      # UTC, сек
+
+    def update(self, bars: np.ndarray) -> List[MarketEvent]:
+        """
+        Прогоняет свечи новее последней учтённой. Первый прогон — прогрев
+        по истории: события из него не возвращаются.
+        """
+        warmup = self.last_time is None
+        if not warmup:
+            bars = bars[bars["time"] > self.last_time]
+        events: List[MarketEvent] = []
+        for ts, close, volume in zip(bars["time"].tolist(), bars["close"].tolist(), bars["volume"].tolist()):
+            t = datetime.fromtimestamp(ts, tz=timezone.utc)
+            for ev in (self.volume.update(volume, t), self.volatility.update(close, t)):
+                if ev is not None:
+                    events.append(ev)
+            self.last_time = ts
+        return [] if warmup else events
+
+
 class MarketEngine:
     """
     FULL Market Engine v1:
@@ -33,16 +109,49 @@ class MarketEngine:
     - шлёт в Discord по маршрутам:
         - market_snapshot → market_analyzer
         - market_candles  → technicals_15m
+        - market_correlation → market_analyzer
+        - market_events   → market_analyzer
+        - market_regimes  → market_analyzer
         - engine_logs     → system_logs
         - errors          → system_logs
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        stats_timeframe: str = "M15",
+        corr_window: int = 96,
+        event_timeframes: Sequence[str] = ("M15", "H1"),
+        regime_pairs: Sequence[WindowPair] = DEFAULT_WINDOW_PAIRS,
+    ) -> None:
         self.snapshot_route = "market_snapshot"
         self.candles_route = "market_candles"
+        self.correlation_route = "market_correlation"
+        self.events_route = "market_events"
+        self.regimes_route = "market_regimes"
         self.engine_logs_route = "engine_logs"
         self.errors_route = "errors"
 
+        # потоковая статистика по закрытым свечам stats_timeframe
+        self.stats_timeframe = stats_timeframe
+        self.stream_stats: Dict[str, SymbolStreamStats] = {
+            key: SymbolStreamStats() for key in WATCHLIST.keys()
+        }
+        # корреляции доходностей между инструментами (окно corr_window свечей)
+        self.correlation = StreamingCorrelation(list(WATCHLIST.keys()), window=corr_window)
+        self._corr_last_time: Optional[int] = None
+        self.last_regimes: Optional[RegimeScan] = None
+        # режимам нужно recent + past доходностей самой длинной пары:
+        # +1 цена на доходность и +1 формирующаяся свеча
+        self.regime_pairs = tuple(regime_pairs)
+        self.candle_limit = max(50, max(r + p for r, p in self.regime_pairs) + 2)
+
+        # детекторы событий: по одному набору на (символ, таймфрейм)
+        self.detectors: Dict[Tuple[str, str], SymbolDetectors] = {
+            (key, tf): SymbolDetectors(key, tf)
+            for key in WATCHLIST.keys()
+            for tf in event_timeframes
+        }
+
     # ─────────────────────────────────────────
     # Форматирование snapshot
     # ─────────────────────────────────────────
@@ -67,46 +176,101 @@ class MarketEngine:
     # Форматирование свечей
     # ─────────────────────────────────────────
     @staticmethod
-    def _format_candle_block(symbol_key: str, tf: str, candles: List[Candle]) -> str:
+    def _format_candle_block(symbol_key: str, tf: str, bars: np.ndarray) -> str:
         """
         Берём последнюю свечу (и предыдущую для изменения).
         """
-        if not candles:
+        if len(bars) == 0:
             return f"**{symbol_key} {tf}** — нет данных"
 
-        last = candles[-1]
-        prev = candles[-2] if len(candles) > 1 else None
+        ts, o, h, l, c, _ = bars[-1].tolist()
 
         change = ""
-        if prev:
-            diff = last.close - prev.close
-            pct = (diff / prev.close) * 100 if prev.close else 0
+        if len(bars) > 1:
+            prev_close = float(bars["close"][-2])
+            diff = c - prev_close
+            pct = (diff / prev_close) * 100 if prev_close else 0
             sign = "+" if diff >= 0 else "-"
             change = f" ({sign}{abs(diff):.2f}, {sign}{abs(pct):.2f}%)"
 
-        t = last.time.strftime("%Y-%m-%d %H:%M")
+        t = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
         return (
             f"**{symbol_key} {tf}** [{t} UTC]\n"
-            f" O: {last.open:.2f}  H: {last.high:.2f}  "
-            f"L: {last.low:.2f}  C: {last.close:.2f}{change}\n"
+            f" O: {o:.2f}  H: {h:.2f}  "
+            f"L: {l:.2f}  C: {c:.2f}{change}\n"
         )
 
-    def build_candles_report(
-        self,
-        candles: Dict[str, Dict[str, List[Candle]]],
-    ) -> str:
+    def build_candles_report(self, candles: CandleBatch) -> str:
         lines: List[str] = ["**Candle Engine v1 — M5/M15/M30/H1/H4/D1**", ""]
         for symbol_key in WATCHLIST.keys():
             lines.append(f"__{symbol_key}__")
             for tf in CANDLE_TIMEFRAMES:
-                block = self._format_candle_block(
-                    symbol_key, tf, candles[symbol_key][tf]
-                )
+                block = self._format_candle_block(symbol_key, tf, candles.get(symbol_key, tf))
                 # слегка режем длину каждой строки, чтобы итоговый текст не был гигантским
                 lines.append(shorten(block, width=400, placeholder=" ."))
             lines.append("")  # пустая строка между инструментами
         return "\n".join(lines)
 
+    # ─────────────────────────────────────────
+    # Потоковая статистика
+    # ─────────────────────────────────────────
+    def update_stream_stats(self, candles: CandleBatch) -> None:
+        for symbol_key, stats in self.stream_stats.items():
+            # последняя свеча ещё формируется — учитываем только закрытые
+            stats.update(candles.closed(symbol_key, self.stats_timeframe))
+
+    def update_correlation(self, candles: CandleBatch) -> int:
+        """
+        Выравнивает закрытые свечи всех символов по времени и подаёт
+        в StreamingCorrelation только новые метки. Символ без свечи
+        на метке считается неизменным. Возвращает число новых меток.
+        """
+        closes: Dict[int, Dict[str, float]] = {}
+        for symbol_key in WATCHLIST.keys():
+            bars = candles.closed(symbol_key, self.stats_timeframe)
+            if self._corr_last_time is not None:
+                bars = bars[bars["time"] > self._corr_last_time]
+            for ts, close in zip(bars["time"].tolist(), bars["close"].tolist()):
+                closes.setdefault(ts, {})[symbol_key] = close
+
+        for ts in sorted(closes):
+            self.correlation.update(closes[ts], time=datetime.fromtimestamp(ts, tz=timezone.utc))
+            self._corr_last_time = ts
+        return len(closes)
+
+    def update_detectors(self, candles: CandleBatch) -> List[MarketEvent]:
+        events: List[MarketEvent] = []
+        for (symbol_key, tf), det in self.detectors.items():
+            events.extend(det.update(candles.closed(symbol_key, tf)))
+        return events
+
+    def scan_regimes(self, candles: CandleBatch) -> RegimeScan:
+        """Режимы волатильности по закрытым свечам stats_timeframe всех символов."""
+        closes = candles.closes(self.stats_timeframe)
+        self.last_regimes = scan_volatility_regimes(
+            {k: closes[k] for k in WATCHLIST.keys()}, window_pairs=self.regime_pairs
+        )
+        return self.last_regimes
+
+    @staticmethod
+    def build_events_report(events: List[MarketEvent]) -> str:
+        lines: List[str] = [f"**Market Events — {len(events)}**", ""]
+        lines.extend(ev.describe() for ev in events)
+        return "\n".join(lines)
+
+    def build_stats_report(self) -> str:
+        lines: List[str] = [f"**Streaming Stats — {self.stats_timeframe}**", ""]
+        for symbol_key, stats in self.stream_stats.items():
+            rs = stats.returns.result()
+            vol = stats.volatility.value
+            vol_txt = f"{vol * 100:.2f}%" if vol is not None else "n/a"
+            lines.append(
+                f"{symbol_key:<7} | Ret: {rs.total_return:.2f}%  "
+                f"AnnVol: {rs.annual_vol:.2f}%  RollVol: {vol_txt}  "
+                f"MaxDD: {stats.drawdown.max_drawdown_pct:.2f}%"
+            )
+        return "\n".join(lines)
+
     # ─────────────────────────────────────────
     # Основные методы
     # ─────────────────────────────────────────
@@ -115,6 +279,7 @@ class MarketEngine:
         Один цикл:
         - забирает snapshot рынка
         - забирает свечи
+        - обновляет потоковую статистику, корреляции и детекторы событий
         - отправляет всё в Discord
         """
         # 1. Snapshot
@@ -122,16 +287,52 @@ class MarketEngine:
             snapshots = await asyncio.to_thread(get_full_market_snapshot)
             snapshot_msg = self.build_snapshot_report(snapshots)
             dispatch(self.snapshot_route, "Full Market Snapshot v1", snapshot_msg)
+            # история спредов — для модели издержек в бэктестах
+            record_spreads(snapshots)
         except Exception as e:  # noqa
             dispatch(self.errors_route, "Snapshot Engine Error", str(e))
 
         # 2. Candles
         try:
-            candles = await asyncio.to_thread(get_full_candles_snapshot)
+            candles = await asyncio.to_thread(get_candle_batch, None, self.candle_limit)
             candles_msg = self.build_candles_report(candles)
             dispatch(self.candles_route, "Candle Engine v1", candles_msg)
         except Exception as e:  # noqa
             dispatch(self.errors_route, "Candle Engine Error", str(e))
+            return
+
+        # 3. Потоковая статистика (только новые свечи)
+        try:
+            self.update_stream_stats(candles)
+            dispatch(self.candles_route, "Streaming Stats", self.build_stats_report())
+        except Exception as e:  # noqa
+            dispatch(self.errors_route, "Stats Engine Error", str(e))
+
+        # 4. Корреляции между инструментами (только новые свечи)
+        try:
+            self.update_correlation(candles)
+            dispatch(
+                self.correlation_route,
+                "Cross-Asset Correlation",
+                summarize_correlation(self.correlation, top=8),
+            )
+        except Exception as e:  # noqa
+            dispatch(self.errors_route, "Correlation Engine Error", str(e))
+
+        # 5. События: всплески объёма / сдвиги волатильности
+        try:
+            events = self.update_detectors(candles)
+            if events:
+                dispatch(self.events_route, "Market Events", self.build_events_report(events))
+        except Exception as e:  # noqa
+            dispatch(self.errors_route, "Event Detectors Error", str(e))
+
+        # 6. Режимы волатильности
+        try:
+            scan = self.scan_regimes(candles)
+            dispatch(self.regimes_route, "Volatility Regimes", summarize_regimes(scan))
+        except Exception as e:  # noqa
+            dispatch(self.errors_route, "Regime Scanner Error", str(e))
 
     async def run_forever(self, interval_seconds: int = 300) -> None:
         """
@@ -0,0 +1,208 @@
+# ==============================================
+# src/trading_ai/analytics/backtest_cache.py
+# Дисковый кэш результатов бэктеста (content-addressed):
+# ключ = отпечаток данных + параметры + версия кода,
+# значение = компактный результат (equity float64 + итоговые метрики).
+# Вытеснение — LRU по времени последнего доступа и лимиту размера.
+# ==============================================
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.trading_ai.analytics import execution as _execution_module
+from src.trading_ai.analytics import statistics as _statistics_module
+from src.trading_ai.analytics.statistics import BacktestResult
+
+CACHE_FORMAT = 2                 # 2: equity во float64
+
+CACHE_DIR = Path(os.getenv("TRADING_AI_DATA_DIR", ".")) / "data" / "backtest_cache"
+CACHE_MAX_MB = float(os.getenv("TRADING_AI_BT_CACHE_MB", "256"))
+CACHE_ENABLED: bool = os.getenv("TRADING_AI_BT_CACHE", "1") == "1"
+
+
+def _code_version() -> str:
+    """Хэш исходников statistics.py и execution.py: правка логики бэктеста инвалидирует кэш."""
+    h = hashlib.sha256(f"format={CACHE_FORMAT}".encode())
+    for module in (_statistics_module, _execution_module):
+        try:
+            h.update(Path(module.__file__).read_bytes())
+        except OSError:
+            pass
+    return h.hexdigest()[:16]
+
+
+CODE_VERSION = _code_version()
+
+
+class BacktestCache:
+    """
+    Кэш BacktestResult на диске: один .npz на ключ.
+
+    - get(): при попадании обновляет mtime файла (для LRU)
+    - put(): атомарная запись (tmp + os.replace); размер кэша ведётся в памяти,
+      каталог сканируется только при превышении max_bytes — тогда вытесняются
+      самые старые записи
+    - equity хранится в float64: попадание возвращает ровно то, что промах
+    - hits / misses / evictions — счётчики текущего процесса
+    """
+
+    def __init__(self, directory: Path = CACHE_DIR, max_mb: float = CACHE_MAX_MB):
+        self.directory = Path(directory)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total: Optional[int] = None    # байт на диске; None — ещё не сканировали
+
+    # ---------- ключ ----------
+
+    @staticmethod
+    def make_key(
+        df: pd.DataFrame,
+        signal_col: str,
+        price_col: str,
+        params: Dict[str, Any],
+    ) -> str:
+        """
+        Отпечаток: индекс + цены + сигналы (после того же dropna, что в
+        simple_signal_backtest), параметры запуска и версия кода.
+        """
+        data = df[[price_col, signal_col]].dropna()
+        h = hashlib.blake2b(digest_size=20)
+        h.update(CODE_VERSION.encode())
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+        h.update(np.ascontiguousarray(data.index.asi8).tobytes())
+        h.update(np.ascontiguousarray(data[price_col].to_numpy(dtype=np.float64)).tobytes())
+        h.update(np.ascontiguousarray(data[signal_col].to_numpy(dtype=np.float64)).tobytes())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.npz"
+
+    # ---------- чтение / запись ----------
+
+    def get(self, key: str, index: pd.Index) -> Optional[BacktestResult]:
+        """index — индекс equity curve (строки df после dropna), в кэше не хранится."""
+        path = self._path(key)
+        try:
+            with np.load(path) as z:
+                equity = z["equity"].astype(np.float64, copy=False)
+                summary = z["summary"]
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+
+        if equity.shape[0] != len(index):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        initial, final, total_ret, max_dd = (float(x) for x in summary)
+        return BacktestResult(
+            initial_balance=initial,
+            final_balance=final,
+            total_return_pct=total_ret,
+            max_drawdown_pct=max_dd,
+            equity_curve=pd.Series(equity, index=index),
+        )
+
+    def put(self, key: str, result: BacktestResult) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        summary = np.array([
+            result.initial_balance,
+            result.final_balance,
+            result.total_return_pct,
+            result.max_drawdown_pct,
+        ], dtype=np.float64)
+        equity = result.equity_curve.to_numpy(dtype=np.float64)
+
+        path = self._path(key)
+        tmp = self.directory / f".{key}.{uuid.uuid4().hex}.tmp.npz"
+        try:
+            np.savez(tmp, equity=equity, summary=summary)
+            size = tmp.stat().st_size
+            try:
+                size -= path.stat().st_size      # перезапись ключа
+            except OSError:
+                pass
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+        if self._total is not None:
+            self._total += size
+        if self._total is None or self._total > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Скан каталога: точный размер (пишут и другие процессы) и вытеснение LRU."""
+        entries = []
+        total = 0
+        for p in self.directory.glob("*.npz"):
+            if p.name.startswith("."):
+                continue
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+
+        if total > self.max_bytes:
+            for _, size, p in sorted(entries):
+                try:
+                    p.unlink()
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+                if total <= self.max_bytes:
+                    break
+        self._total = total
+
+    # ---------- сервис ----------
+
+    def stats(self) -> Dict[str, Any]:
+        files = [p for p in self.directory.glob("*.npz") if not p.name.startswith(".")] \
+            if self.directory.exists() else []
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate_pct": round(self.hits / lookups * 100.0, 1) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(files),
+            "size_mb": round(sum(p.stat().st_size for p in files) / 1024 / 1024, 2),
+        }
+
+    def clear(self) -> None:
+        if self.directory.exists():
+            for p in self.directory.glob("*.npz"):
+                p.unlink()
+        self._total = 0
+
+
+_default_cache: Optional[BacktestCache] = None
+
+
+def get_default_cache() -> BacktestCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = BacktestCache()
+    return _default_cache
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Счётчики кэша по умолчанию (для дашбордов / логов)."""
+    return get_default_cache().stats()
@@ -2,7 +2,10 @@
 # src/trading_ai/analytics/backtester.py
 # Расширенный бэктест и анализ паттернов:
 # - day of week / hour of day / month of year
-# - обёртка над simple_signal_backtest
+#   (+ hour×weekday, сессии, минута часа — один bincount на срез)
+# - обёртка над simple_signal_backtest (с дисковым кэшем результатов)
+# - журнал сделок (MAE/MFE, время удержания)
+# - Monte Carlo устойчивость equity curve
 # ==============================================
 
 from __future__ import annotations
@@ -20,6 +23,11 @@ from src.trading_ai.analytics.statistics import (
     ensure_datetime_index,
     BacktestResult,
 )
+from src.trading_ai.analytics.backtest_cache import CACHE_ENABLED, get_default_cache
+from src.trading_ai.analytics.execution import ExecutionCostModel
+from src.trading_ai.analytics.monte_carlo import monte_carlo_equity, summarize_monte_carlo
+from src.trading_ai.analytics.regimes import scan_volatility_regimes
+from src.trading_ai.analytics.trade_ledger import extract_trade_ledger, summarize_trade_ledger
 
 
 # ---------- Вспомогательные структуры ----------
@@ -28,6 +36,30 @@ class TimePatternAnalysis:
     day_of_week: pd.DataFrame
     hour_of_day: Optional[pd.DataFrame]
     month_of_year: pd.DataFrame
+    hour_weekday: Optional[pd.DataFrame] = None    # MultiIndex (day_of_week, hour)
+    session: Optional[pd.DataFrame] = None         # торговые сессии (UTC)
+    minute_of_hour: Optional[pd.DataFrame] = None
+
+
+# Торговые сессии по часу UTC: (имя, начало, конец); наивный индекс считается UTC
+SESSIONS = (
+    ("Asia", 0, 7),
+    ("London", 7, 13),
+    ("London/NY", 13, 16),
+    ("NewYork", 16, 21),
+    ("Late", 21, 24),
+)
+_HOUR_TO_SESSION = np.zeros(24, dtype=np.int64)
+for _i, (_name, _h0, _h1) in enumerate(SESSIONS):
+    _HOUR_TO_SESSION[_h0:_h1] = _i
+
+
+@dataclass
+class _PreparedReturns:
+    rets: np.ndarray                # доходности (pct_change без NaN)
+    fields: Dict[str, np.ndarray]   # календарные поля времени каждой доходности
+    intraday: bool                  # в исходном индексе больше одного часа
+    minutes: bool                   # в исходном индексе больше одной минуты внутри часа
 
 
 # ---------- Вспомогательные функции ----------
@@ -36,75 +68,198 @@ def _returns_from_prices(df: pd.DataFrame, price_col: str = "Close") -> pd.Serie
     return df[price_col].pct_change().dropna()
 
 
-def day_of_week_performance(df: pd.DataFrame, price_col: str = "Close") -> pd.DataFrame:
-    rets = _returns_from_prices(df, price_col)
-    dow = rets.index.dayofweek
-    grp = rets.groupby(dow)
+def _calendar_fields(index: pd.DatetimeIndex) -> Dict[str, np.ndarray]:
+    """
+    day_of_week / hour / minute из целых минут с эпохи (без объектных аксессоров),
+    month — через pandas. Для tz-aware индекса берётся локальное время
+    (как index.hour / dayofweek / month). session — по часу UTC (часы SESSIONS
+    заданы в UTC): tz-aware индекс переводится в UTC, наивный считается уже UTC.
+    """
+    utc = index.values                            # datetime64 tz-aware индекса — это UTC
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    minutes_total = np.asarray(index.values, dtype="datetime64[m]").astype(np.int64)
+    utc_hour = (np.asarray(utc, dtype="datetime64[m]").astype(np.int64) // 60) % 24
+    days = minutes_total // 1440
+    return {
+        "day_of_week": (days + 3) % 7,          # 1970-01-01 — четверг
+        "hour": (minutes_total // 60) % 24,
+        "minute": minutes_total % 60,
+        "month": np.asarray(index.month, dtype=np.int64),
+        "session": _HOUR_TO_SESSION[utc_hour],
+    }
+
+
+def _prepare_returns(df: pd.DataFrame, price_col: str = "Close") -> _PreparedReturns:
+    """Доходности и календарные поля считаются один раз на все группировки."""
+    df = ensure_datetime_index(df)
+    px = df[price_col].to_numpy(dtype=np.float64)
+    rets = np.empty(0) if px.size < 2 else px[1:] / px[:-1] - 1.0
+    mask = ~np.isnan(rets)
+
+    fields = _calendar_fields(df.index)
+    return _PreparedReturns(
+        rets=rets[mask],
+        fields={k: v[1:][mask] for k, v in fields.items()},
+        intraday=np.unique(fields["hour"]).size > 1,
+        minutes=np.unique(fields["minute"]).size > 1,
+    )
+
+
+def _bucket_sums(rets: np.ndarray, codes: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Агрегаты по корзинам одним bincount на каждую величину:
+    [count, sum, sum of squares, wins]. Суммы считаются по доходностям,
+    центрированным на общее среднее, — так дисперсия численно стабильнее.
+    """
+    shift = float(rets.mean()) if rets.size else 0.0
+    centered = rets - shift
+    out = np.vstack([
+        np.bincount(codes, minlength=n_buckets),
+        np.bincount(codes, weights=centered, minlength=n_buckets),
+        np.bincount(codes, weights=centered * centered, minlength=n_buckets),
+        np.bincount(codes, weights=(rets > 0), minlength=n_buckets),
+    ]).astype(np.float64)
+    out[1] += shift * out[0]   # sum(r) = sum(r - shift) + shift * n
+    return np.vstack([out, np.full(n_buckets, shift)])
+
+
+def _stats_from_sums(sums: np.ndarray, labels, index_name) -> pd.DataFrame:
+    """Из агрегатов _bucket_sums — таблица в формате *_performance()."""
+    count, total, sq_c, wins, shift = sums
+    keep = count > 0
+    n = count[keep]
+    mean = total[keep] / n
+    # дисперсия по центрированным суммам: sq_c - (sum_c)^2 / n, ddof=1
+    sum_c = total[keep] - shift[keep] * n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = (sq_c[keep] - sum_c * sum_c / n) / (n - 1)
+    std = np.sqrt(np.where(n > 1, np.maximum(var, 0.0), np.nan))
+
+    if isinstance(labels, pd.MultiIndex):
+        index = labels[keep]
+    else:
+        index = pd.Index(np.asarray(labels)[keep], name=index_name)
+
     stats = pd.DataFrame({
-        "mean_ret": grp.mean(),
-        "std_ret": grp.std(),
-        "count": grp.count(),
-        "win_rate": grp.apply(lambda x: (x > 0).sum()) / grp.count(),
-    })
+        "mean_ret": mean,
+        "std_ret": std,
+        "count": n.astype(np.int64),
+        "win_rate": wins[keep] / n,
+    }, index=index)
     stats["mean_ret_pct"] = stats["mean_ret"] * 100
     stats["std_ret_pct"] = stats["std_ret"] * 100
     stats["win_rate_pct"] = stats["win_rate"] * 100
     stats = stats.sort_values("mean_ret", ascending=False)
-    stats.index.name = "day_of_week"
+    if not isinstance(labels, pd.MultiIndex):
+        stats.index.name = index_name
     return stats
 
 
-def hour_of_day_performance(df: pd.DataFrame, price_col: str = "Close") -> Optional[pd.DataFrame]:
-    df = ensure_datetime_index(df)
-    if not isinstance(df.index, pd.DatetimeIndex):
-        return None
+# Описание корзин: имя → (код корзины по календарным полям, число корзин, метки, имя индекса)
+_BUCKETS = {
+    "day_of_week": (lambda f: f["day_of_week"], 7, np.arange(7), "day_of_week"),
+    "hour_of_day": (lambda f: f["hour"], 24, np.arange(24), "hour"),
+    "month_of_year": (lambda f: f["month"] - 1, 12, np.arange(1, 13), "month"),
+    "hour_weekday": (
+        lambda f: f["day_of_week"] * 24 + f["hour"],
+        7 * 24,
+        pd.MultiIndex.from_product([range(7), range(24)], names=["day_of_week", "hour"]),
+        None,
+    ),
+    "session": (
+        lambda f: f["session"],
+        len(SESSIONS),
+        [name for name, _, _ in SESSIONS],
+        "session",
+    ),
+    "minute_of_hour": (lambda f: f["minute"], 60, np.arange(60), "minute"),
+}
+
+
+def _bucket_stats(prep: _PreparedReturns, kind: str) -> pd.DataFrame:
+    code_fn, n_buckets, labels, index_name = _BUCKETS[kind]
+    sums = _bucket_sums(prep.rets, code_fn(prep.fields), n_buckets)
+    return _stats_from_sums(sums, labels, index_name)
 
-    hours = df.index.hour
-    if len(set(hours)) <= 1:
-        return None
 
-    rets = df[price_col].pct_change().dropna()
-    grp = rets.groupby(rets.index.hour)
-    stats = pd.DataFrame({
-        "mean_ret": grp.mean(),
-        "std_ret": grp.std(),
-        "count": grp.count(),
-        "win_rate": grp.apply(lambda x: (x > 0).sum()) / grp.count(),
-    })
-    stats["mean_ret_pct"] = stats["mean_ret"] * 100
-    stats["std_ret_pct"] = stats["std_ret"] * 100
-    stats["win_rate_pct"] = stats["win_rate"] * 100
-    stats = stats.sort_values("mean_ret", ascending=False)
-    stats.index.name = "hour"
-    return stats
+def day_of_week_performance(df: pd.DataFrame, price_col: str = "Close") -> pd.DataFrame:
+    return _bucket_stats(_prepare_returns(df, price_col), "day_of_week")
+
+
+def hour_of_day_performance(df: pd.DataFrame, price_col: str = "Close") -> Optional[pd.DataFrame]:
+    prep = _prepare_returns(df, price_col)
+    if not prep.intraday:
+        return None
+    return _bucket_stats(prep, "hour_of_day")
 
 
 def month_of_year_performance(df: pd.DataFrame, price_col: str = "Close") -> pd.DataFrame:
-    rets = _returns_from_prices(df, price_col)
-    grp = rets.groupby(rets.index.month)
-    stats = pd.DataFrame({
-        "mean_ret": grp.mean(),
-        "std_ret": grp.std(),
-        "count": grp.count(),
-        "win_rate": grp.apply(lambda x: (x > 0).sum()) / grp.count(),
-    })
-    stats["mean_ret_pct"] = stats["mean_ret"] * 100
-    stats["std_ret_pct"] = stats["std_ret"] * 100
-    stats["win_rate_pct"] = stats["win_rate"] * 100
-    stats = stats.sort_values("mean_ret", ascending=False)
-    stats.index.name = "month"
-    return stats
+    return _bucket_stats(_prepare_returns(df, price_col), "month_of_year")
 
 
-def analyze_time_patterns(df: pd.DataFrame, price_col: str = "Close") -> TimePatternAnalysis:
-    df = ensure_datetime_index(df)
+def _analysis_from_prepared(prep: _PreparedReturns) -> TimePatternAnalysis:
     return TimePatternAnalysis(
-        day_of_week=day_of_week_performance(df, price_col),
-        hour_of_day=hour_of_day_performance(df, price_col),
-        month_of_year=month_of_year_performance(df, price_col),
+        day_of_week=_bucket_stats(prep, "day_of_week"),
+        hour_of_day=_bucket_stats(prep, "hour_of_day") if prep.intraday else None,
+        month_of_year=_bucket_stats(prep, "month_of_year"),
+        hour_weekday=_bucket_stats(prep, "hour_weekday") if prep.intraday else None,
+        session=_bucket_stats(prep, "session") if prep.intraday else None,
+        minute_of_hour=_bucket_stats(prep, "minute_of_hour") if prep.minutes else None,
     )
 
 
+def analyze_time_patterns(df: pd.DataFrame, price_col: str = "Close") -> TimePatternAnalysis:
+    """
+    Все временные срезы за один расчёт доходностей:
+    день недели, час, месяц, час × день недели, сессия, минута часа.
+    Внутридневные срезы возвращаются только для внутридневных данных.
+    """
+    return _analysis_from_prepared(_prepare_returns(df, price_col))
+
+
+def analyze_time_patterns_many(
+    data: Dict[str, pd.DataFrame],
+    price_col: str = "Close",
+) -> Dict[str, TimePatternAnalysis]:
+    """
+    Временные паттерны сразу для многих инструментов (например, весь WATCHLIST).
+    Доходности всех символов склеиваются в один массив, а код корзины
+    сдвигается на номер символа — так каждая группировка — один bincount
+    на весь список, а не по циклу на символ.
+    """
+    names = list(data.keys())
+    preps = [_prepare_returns(data[name], price_col) for name in names]
+    n_sym = len(names)
+    if n_sym == 0:
+        return {}
+
+    rets_all = np.concatenate([p.rets for p in preps])
+    sym_ids = np.repeat(np.arange(n_sym), [p.rets.size for p in preps])
+
+    per_kind: Dict[str, np.ndarray] = {}
+    for kind, (code_fn, n_buckets, _, _) in _BUCKETS.items():
+        codes = np.concatenate([code_fn(p.fields) for p in preps]) if rets_all.size else np.empty(0, dtype=np.int64)
+        sums = _bucket_sums(rets_all, sym_ids * n_buckets + codes, n_sym * n_buckets)
+        per_kind[kind] = sums.reshape(5, n_sym, n_buckets)
+
+    out: Dict[str, TimePatternAnalysis] = {}
+    for i, (name, prep) in enumerate(zip(names, preps)):
+        def stats(kind: str) -> pd.DataFrame:
+            _, _, labels, index_name = _BUCKETS[kind]
+            return _stats_from_sums(per_kind[kind][:, i, :], labels, index_name)
+
+        out[name] = TimePatternAnalysis(
+            day_of_week=stats("day_of_week"),
+            hour_of_day=stats("hour_of_day") if prep.intraday else None,
+            month_of_year=stats("month_of_year"),
+            hour_weekday=stats("hour_weekday") if prep.intraday else None,
+            session=stats("session") if prep.intraday else None,
+            minute_of_hour=stats("minute_of_hour") if prep.minutes else None,
+        )
+    return out
+
+
 def summarize_time_patterns(name: str, patterns: TimePatternAnalysis) -> str:
     lines = [f"⏱ Time pattern analysis for {name}"]
 
@@ -130,6 +285,9 @@ def summarize_time_patterns(name: str, patterns: TimePatternAnalysis) -> str:
         best_h_idx = int(hod.index[0])
         best_h = hod.iloc[0]
         lines.append(f"- Best hour: {best_h_idx}:00 ({best_h['mean_ret_pct']:.2f}% mean, win {best_h['win_rate_pct']:.1f}%)")
+        if patterns.session is not None and not patterns.session.empty:
+            best_s = patterns.session.iloc[0]
+            lines.append(f"- Best session: {patterns.session.index[0]} ({best_s['mean_ret_pct']:.2f}% mean, win {best_s['win_rate_pct']:.1f}%)")
     else:
         lines.append("- No intraday data detected")
 
@@ -138,19 +296,44 @@ def summarize_time_patterns(name: str, patterns: TimePatternAnalysis) -> str:
 
 # ---------- Основная логика ----------
 def run_strategy_backtest(df: pd.DataFrame, signal_col: str, price_col: str = "Close",
-                          initial_balance: float = 100_000.0, fee_per_trade: float = 0.0) -> BacktestResult:
+                          initial_balance: float = 100_000.0, fee_per_trade: float = 0.0,
+                          use_cache: bool = True,
+                          cost_model: Optional[ExecutionCostModel] = None) -> BacktestResult:
+    """
+    Бэктест по колонке сигналов. Результаты кэшируются на диске
+    (backtest_cache): повторный прогон на тех же данных и параметрах
+    читает готовый результат. Отключить: use_cache=False или TRADING_AI_BT_CACHE=0.
+    """
     df = ensure_datetime_index(df)
     if signal_col not in df.columns:
         raise ValueError(f"Signal column '{signal_col}' not found in DataFrame.")
-    return simple_signal_backtest(df, signal_col, price_col, initial_balance, fee_per_trade)
+
+    if not (use_cache and CACHE_ENABLED):
+        return simple_signal_backtest(df, signal_col, price_col, initial_balance, fee_per_trade, cost_model)
+
+    cache = get_default_cache()
+    params = {"initial_balance": initial_balance, "fee_per_trade": fee_per_trade}
+    if cost_model is not None:
+        params["cost_model"] = cost_model.fingerprint()
+    key = cache.make_key(df, signal_col, price_col, params)
+    index = df.dropna(subset=[price_col, signal_col]).index
+
+    result = cache.get(key, index)
+    if result is None:
+        result = simple_signal_backtest(df, signal_col, price_col, initial_balance, fee_per_trade, cost_model)
+        cache.put(key, result)
+    return result
 
 
 def full_backtest_report(name: str, df: pd.DataFrame, signal_col: str,
                          price_col: str = "Close", initial_balance: float = 100_000.0,
-                         fee_per_trade: float = 0.0) -> str:
+                         fee_per_trade: float = 0.0, mc_paths: int = 10_000,
+                         mc_block_size: int = 20, mc_seed: Optional[int] = None,
+                         cost_model: Optional[ExecutionCostModel] = None) -> str:
     df = ensure_datetime_index(df)
     base_stats = calc_return_stats(df, price_col=price_col)
-    bt_res = run_strategy_backtest(df, signal_col, price_col, initial_balance, fee_per_trade)
+    bt_res = run_strategy_backtest(df, signal_col, price_col, initial_balance, fee_per_trade,
+                                   cost_model=cost_model)
     patterns = analyze_time_patterns(df, price_col)
     time_txt = summarize_time_patterns(name, patterns)
 
@@ -161,6 +344,8 @@ def full_backtest_report(name: str, df: pd.DataFrame, signal_col: str,
     lines.append(f"- Annual return: {base_stats.annual_return:.2f}%")
     lines.append(f"- Annual volatility: {base_stats.annual_vol:.2f}%")
     lines.append(f"- Sharpe (approx): {base_stats.sharpe:.2f}")
+    regime = scan_volatility_regimes({name: df[price_col]})
+    lines.append(f"- Volatility regime: {regime.labels[name]}")
     lines.append("")
     lines.append("=== Strategy performance (signals) ===")
     lines.append(f"- Initial balance: {bt_res.initial_balance:.2f}")
@@ -168,6 +353,18 @@ def full_backtest_report(name: str, df: pd.DataFrame, signal_col: str,
     lines.append(f"- Total return: {bt_res.total_return_pct:.2f}%")
     lines.append(f"- Max drawdown: {bt_res.max_drawdown_pct:.2f}%")
     lines.append("")
+    lines.append("=== Trades ===")
+    lines.append(summarize_trade_ledger(extract_trade_ledger(df, signal_col, price_col)))
+    lines.append("")
+
+    # Monte Carlo: block bootstrap доходностей стратегии (mc_paths=0 — пропустить)
+    if mc_paths > 0 and len(bt_res.equity_curve) > 2:
+        mc = monte_carlo_equity(bt_res.equity_curve, n_paths=mc_paths,
+                                block_size=mc_block_size, seed=mc_seed)
+        lines.append("=== Monte Carlo robustness ===")
+        lines.append(summarize_monte_carlo(mc))
+        lines.append("")
+
     lines.append("=== Time patterns ===")
     lines.append(time_txt)
 
@@ -14,6 +14,7 @@ import pandas as pd
 
 from trading_ai.analytics.backtester import full_backtest_report
 from trading_ai.analytics.statistics import ensure_datetime_index
+from trading_ai.analytics.trade_ledger import extract_trade_ledger
 
 
 @dataclass
@@ -31,6 +32,7 @@ class BacktesterAgent:
       - взять данные по инструменту (CSV / DataFrame),
       - найти колонку сигналов (signal_col),
       - запустить backtest+time-analysis,
+      - построить журнал сделок (вход/выход, PnL, MAE/MFE),
       - выдать текстовый отчёт и (опционально) сохранить его в файл.
     """
 
@@ -67,6 +69,14 @@ class BacktesterAgent:
         )
         return report
 
+    def trade_ledger(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = ensure_datetime_index(df)
+        if self.config.signal_col not in df.columns:
+            raise ValueError(
+                f"DataFrame must contain signal column '{self.config.signal_col}'."
+            )
+        return extract_trade_ledger(df, self.config.signal_col, self.config.price_col)
+
     def run_on_csv(self, name: str, csv_path: str, save_report: bool = True) -> str:
         df = self.load_csv(csv_path)
         report = self.run_on_dataframe(name, df)
@@ -83,6 +93,10 @@ class BacktesterAgent:
                 f.write(report)
             print(f"💾 Backtest report saved to: {out_path}")
 
+            ledger_path = os.path.join(reports_dir, f"trades_{name}.csv")
+            self.trade_ledger(df).to_csv(ledger_path, index=False)
+            print(f"💾 Trade ledger saved to: {ledger_path}")
+
         return report
 
 
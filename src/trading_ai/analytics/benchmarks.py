@@ -0,0 +1,223 @@
+# ==============================================
+# src/trading_ai/analytics/benchmarks.py
+# Бенчмарки аналитики на синтетических данных:
+# - генераторы OHLCV / сигналов / набора активов
+# - замер времени и пикового объёма памяти (tracemalloc)
+# - результаты в JSON для сравнения между прогонами
+#
+# Запуск:
+#   python -m src.trading_ai.analytics.benchmarks --sizes 1e4 1e5 1e6
+# ==============================================
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.trading_ai.analytics.backtester import analyze_time_patterns
+from src.trading_ai.analytics.statistics import (
+    add_basic_indicators,
+    calc_return_stats,
+    correlation_matrix_from_dict,
+    detect_volume_spikes,
+    simple_signal_backtest,
+)
+
+REPORTS_DIR = os.path.join("reports", "benchmarks")
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+
+
+# ---------- 1. Генераторы синтетики ----------
+
+def synthetic_ohlcv(
+    n_bars: int,
+    freq: str = "5min",
+    start: str = "2010-01-01",
+    base_price: float = 100.0,
+    vol: float = 0.001,
+    seed: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Геометрическое случайное блуждание + OHLC вокруг него + объём
+    (логнормальный, с редкими всплесками — чтобы detect_volume_spikes было что искать).
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=n_bars, freq=freq)
+
+    log_ret = rng.normal(0.0, vol, n_bars)
+    close = base_price * np.exp(np.cumsum(log_ret))
+    open_ = np.empty(n_bars)
+    open_[0] = base_price
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0.0, vol / 2, n_bars)) * close
+    high = np.maximum(open_, close) + wick
+    low = np.minimum(open_, close) - wick
+
+    volume = rng.lognormal(6.0, 0.3, n_bars)
+    spikes = rng.random(n_bars) < 0.001
+    volume[spikes] *= 10
+
+    return pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+        index=index,
+    )
+
+
+def synthetic_signal(close: pd.Series, window: int = 24) -> pd.Series:
+    """Сигнал «цена выше SMA(window)» — та же стратегия, что в compare_strategies."""
+    return (close > close.rolling(window).mean()).astype(int)
+
+
+def synthetic_universe(
+    n_bars: int,
+    n_assets: int = 10,
+    freq: str = "5min",
+    seed: Optional[int] = None,
+) -> Dict[str, pd.Series]:
+    """Словарь {актив: Series цен} с общим рыночным фактором (ненулевые корреляции)."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2010-01-01", periods=n_bars, freq=freq)
+    market = rng.normal(0.0, 0.001, n_bars)
+    out = {}
+    for i in range(n_assets):
+        beta = rng.uniform(0.2, 1.2)
+        rets = beta * market + rng.normal(0.0, 0.001, n_bars)
+        out[f"ASSET_{i}"] = pd.Series(100.0 * np.exp(np.cumsum(rets)), index=index)
+    return out
+
+
+# ---------- 2. Замер ----------
+
+@dataclass
+class BenchmarkRecord:
+    name: str
+    n_bars: int
+    seconds: float
+    peak_mb: float
+    repeat: int
+
+
+def measure(fn: Callable[[], object], repeat: int = 1) -> tuple:
+    """
+    Лучшее время из repeat запусков (perf_counter) и пиковая память
+    (tracemalloc, отдельный прогон — чтобы трассировка не искажала время).
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 1024 / 1024
+
+
+def _cases(df: pd.DataFrame, universe: Dict[str, pd.Series]) -> Dict[str, Callable[[], object]]:
+    return {
+        "calc_return_stats": lambda: calc_return_stats(df),
+        "add_basic_indicators": lambda: add_basic_indicators(df),
+        "detect_volume_spikes": lambda: detect_volume_spikes(df),
+        "simple_signal_backtest": lambda: simple_signal_backtest(df, "signal"),
+        "analyze_time_patterns": lambda: analyze_time_patterns(df),
+        "correlation_matrix_from_dict": lambda: correlation_matrix_from_dict(universe),
+    }
+
+
+def run_benchmarks(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    only: Optional[Sequence[str]] = None,
+    repeat: int = 1,
+    n_assets: int = 10,
+    seed: int = 42,
+) -> List[BenchmarkRecord]:
+    records: List[BenchmarkRecord] = []
+    for n in sizes:
+        n = int(n)
+        df = synthetic_ohlcv(n, seed=seed)
+        df["signal"] = synthetic_signal(df["Close"])
+        universe = synthetic_universe(n, n_assets=n_assets, seed=seed)
+
+        for name, fn in _cases(df, universe).items():
+            if only and name not in only:
+                continue
+            seconds, peak_mb = measure(fn, repeat=repeat)
+            rec = BenchmarkRecord(name, n, round(seconds, 6), round(peak_mb, 2), repeat)
+            records.append(rec)
+            print(f"{name:<30} n={n:>10,}  {seconds:>9.4f}s  peak {peak_mb:>9.1f} MB")
+
+        del df, universe
+    return records
+
+
+# ---------- 3. Сохранение и сравнение ----------
+
+def save_results(records: List[BenchmarkRecord], out_dir: str = REPORTS_DIR) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    payload = {
+        "timestamp": timestamp,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "results": [asdict(r) for r in records],
+    }
+    path = os.path.join(out_dir, f"benchmarks_{timestamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def compare_results(old_path: str, new_path: str, threshold_pct: float = 10.0) -> pd.DataFrame:
+    """
+    Сравнение двух JSON-прогонов: изменение времени и памяти в %.
+    regression = True, если время выросло больше threshold_pct.
+    """
+    def load(path: str) -> pd.DataFrame:
+        with open(path, "r", encoding="utf-8") as f:
+            return pd.DataFrame(json.load(f)["results"]).set_index(["name", "n_bars"])
+
+    old, new = load(old_path), load(new_path)
+    joined = old.join(new, lsuffix="_old", rsuffix="_new", how="inner")
+    joined["time_change_pct"] = (joined["seconds_new"] / joined["seconds_old"] - 1.0) * 100.0
+    joined["mem_change_pct"] = (joined["peak_mb_new"] / joined["peak_mb_old"] - 1.0) * 100.0
+    joined["regression"] = joined["time_change_pct"] > threshold_pct
+    return joined[["seconds_old", "seconds_new", "time_change_pct",
+                   "peak_mb_old", "peak_mb_new", "mem_change_pct", "regression"]]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Analytics benchmarks on synthetic data")
+    parser.add_argument("--sizes", nargs="+", type=float, default=list(DEFAULT_SIZES),
+                        help="bar counts, e.g. 1e4 1e5 1e6 1e7")
+    parser.add_argument("--only", nargs="+", default=None, help="benchmark names to run")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--compare", default=None, help="previous JSON to compare against")
+    args = parser.parse_args(argv)
+
+    records = run_benchmarks([int(s) for s in args.sizes], only=args.only, repeat=args.repeat)
+    path = save_results(records)
+    print(f"\n💾 Benchmark results saved to: {path}")
+
+    if args.compare:
+        print("\n📊 Comparison with previous run:\n")
+        print(compare_results(args.compare, path).to_string())
+
+
+if __name__ == "__main__":
+    main()
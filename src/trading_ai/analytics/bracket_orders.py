@@ -0,0 +1,281 @@
+# ==============================================
+# src/trading_ai/analytics/bracket_orders.py
+# Симулятор bracket-ордеров (entry + TP + SL) на массивах:
+# - поиск первого касания TP/SL без iterrows
+# - генерация ордеров для стратегии Range Breakout
+# ==============================================
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+BUY = 1
+SELL = -1
+
+# ограничение на размер временной матрицы (ордера × бары) при поиске касаний
+_MAX_CELLS = 4_000_000
+# сколько входов за раз проверяется в режиме one_position
+_LAZY_BLOCK = 16
+
+
+# ---------- 1. Первое касание TP/SL ----------
+
+def first_touch_exits(
+    high: np.ndarray,
+    low: np.ndarray,
+    entry_idx: np.ndarray,
+    side: np.ndarray,
+    tp: np.ndarray,
+    sl: np.ndarray,
+    initial_horizon: int = 64,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Для каждого ордера ищет первую свечу (начиная со свечи входа),
+    на которой задет SL или TP. Если на одной свече задеты оба уровня —
+    считаем, что сработал SL (консервативно, как в EA).
+
+    Поиск идёт окнами растущей длины (64, 128, 256, ... баров вперёд),
+    так что короткие сделки не тянут за собой сканирование всей истории.
+
+    Возвращает (exit_idx, exit_price, hit_tp); для незакрытых сделок
+    exit_idx = -1, exit_price = NaN.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    side = np.asarray(side, dtype=np.int8)
+    tp = np.asarray(tp, dtype=np.float64)
+    sl = np.asarray(sl, dtype=np.float64)
+
+    n_bars = high.shape[0]
+    n_orders = entry_idx.shape[0]
+    exit_idx = np.full(n_orders, -1, dtype=np.int64)
+    hit_tp = np.zeros(n_orders, dtype=bool)
+
+    pending = np.arange(n_orders)
+    lo, hi = 0, max(int(initial_horizon), 1)
+
+    while pending.size and lo < n_bars:
+        offsets = np.arange(lo, hi)
+        rows_per_chunk = max(_MAX_CELLS // offsets.size, 1)
+        still_open = []
+
+        for c0 in range(0, pending.size, rows_per_chunk):
+            rows = pending[c0:c0 + rows_per_chunk]
+            idx = entry_idx[rows, None] + offsets[None, :]
+            valid = idx < n_bars
+            idx = np.minimum(idx, n_bars - 1)
+
+            h = high[idx]
+            l = low[idx]
+            is_long = (side[rows] == BUY)[:, None]
+            sl_r = sl[rows, None]
+            tp_r = tp[rows, None]
+
+            sl_hit = np.where(is_long, l <= sl_r, h >= sl_r) & valid
+            tp_hit = np.where(is_long, h >= tp_r, l <= tp_r) & valid
+            any_hit = sl_hit | tp_hit
+
+            first = any_hit.argmax(axis=1)
+            r = np.arange(rows.size)
+            found = any_hit[r, first]
+
+            done = rows[found]
+            exit_idx[done] = entry_idx[done] + lo + first[found]
+            hit_tp[done] = ~sl_hit[r, first][found]
+            still_open.append(rows[~found])
+
+        pending = np.concatenate(still_open) if still_open else pending[:0]
+        lo, hi = hi, hi * 2
+
+    closed = exit_idx >= 0
+    exit_price = np.full(n_orders, np.nan)
+    exit_price[closed] = np.where(hit_tp[closed], tp[closed], sl[closed])
+    return exit_idx, exit_price, hit_tp
+
+
+# ---------- 2. Симуляция последовательности сделок ----------
+
+def simulate_bracket_orders(
+    high: np.ndarray,
+    low: np.ndarray,
+    entry_idx: np.ndarray,
+    side: np.ndarray,
+    entry: np.ndarray,
+    tp: np.ndarray,
+    sl: np.ndarray,
+    index: Optional[pd.Index] = None,
+    one_position: bool = True,
+) -> pd.DataFrame:
+    """
+    Прогоняет набор потенциальных входов (отсортированных по entry_idx).
+
+    one_position=True — как в EA: пока сделка открыта, новые входы
+    игнорируются; следующий вход возможен только на свече после выхода.
+    Незакрытая к концу истории сделка в результат не попадает.
+
+    Возвращает DataFrame сделок:
+      entry_idx, exit_idx, side, entry, tp, sl, exit, hit_tp, result
+    (+ entry_time / exit_time, если передан index).
+    """
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    side = np.asarray(side, dtype=np.int8)
+    entry = np.asarray(entry, dtype=np.float64)
+    tp = np.asarray(tp, dtype=np.float64)
+    sl = np.asarray(sl, dtype=np.float64)
+
+    if one_position:
+        # Цикл идёт по сделкам, а не по барам: прыгаем к первому входу после выхода.
+        # Выходы считаются лениво, блоками входов от текущего места цепочки —
+        # входы внутри уже открытых сделок (обычно большинство) не сканируются.
+        exit_idx = np.full(entry_idx.size, -1, dtype=np.int64)
+        exit_price = np.full(entry_idx.size, np.nan)
+        hit_tp = np.zeros(entry_idx.size, dtype=bool)
+        known = np.zeros(entry_idx.size, dtype=bool)
+        taken = []
+        k = 0
+        while k < entry_idx.size:
+            if not known[k]:
+                block = slice(k, min(k + _LAZY_BLOCK, entry_idx.size))
+                exit_idx[block], exit_price[block], hit_tp[block] = first_touch_exits(
+                    high, low, entry_idx[block], side[block], tp[block], sl[block]
+                )
+                known[block] = True
+            if exit_idx[k] < 0:
+                break  # сделка так и не закрылась — дальше входов не будет
+            taken.append(k)
+            k = int(np.searchsorted(entry_idx, exit_idx[k], side="right"))
+        sel = np.asarray(taken, dtype=np.int64)
+    else:
+        exit_idx, exit_price, hit_tp = first_touch_exits(high, low, entry_idx, side, tp, sl)
+        sel = np.flatnonzero(exit_idx >= 0)
+
+    trades = pd.DataFrame({
+        "entry_idx": entry_idx[sel],
+        "exit_idx": exit_idx[sel],
+        "side": side[sel],
+        "entry": entry[sel],
+        "tp": tp[sel],
+        "sl": sl[sel],
+        "exit": exit_price[sel],
+        "hit_tp": hit_tp[sel],
+    })
+    trades["result"] = (trades["exit"] - trades["entry"]) * trades["side"]
+
+    if index is not None:
+        trades.insert(0, "entry_time", index[trades["entry_idx"].to_numpy()])
+        trades.insert(1, "exit_time", index[trades["exit_idx"].to_numpy()])
+    return trades
+
+
+# ---------- 3. Range Breakout: генерация ордеров ----------
+
+def bar_hours(index: pd.DatetimeIndex) -> np.ndarray:
+    """Время свечи в часах дня (14:30 → 14.5)."""
+    return np.asarray(index.hour + index.minute / 60, dtype=np.float64)
+
+
+def range_breakout_orders(
+    index: pd.DatetimeIndex,
+    high: np.ndarray,
+    low: np.ndarray,
+    range_hours: Tuple[float, float] = (14, 19),
+    breakout_hour: float = 19.5,
+    tp_mult: float = 1.5,
+    sl_mult: float = 0.5,
+) -> Dict[str, np.ndarray]:
+    """
+    Все свечи, на которых EA открыл бы сделку, если бы позиции не было.
+
+    Диапазон накопления — накопленный max(high)/min(low) по свечам
+    внутри range_hours (как в EA, диапазон не сбрасывается между днями).
+    Пробой проверяется на свечах после breakout_hour вне диапазона:
+    сначала BUY (high >= range_high), иначе SELL (low <= range_low).
+    """
+    return range_breakout_orders_from_hours(
+        bar_hours(index), high, low, range_hours, breakout_hour, tp_mult, sl_mult
+    )
+
+
+def range_breakout_orders_from_hours(
+    hours: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    range_hours: Tuple[float, float] = (14, 19),
+    breakout_hour: float = 19.5,
+    tp_mult: float = 1.5,
+    sl_mult: float = 0.5,
+) -> Dict[str, np.ndarray]:
+    """То же, что range_breakout_orders, по готовому массиву часов (bar_hours) — без индекса."""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    hours = np.asarray(hours, dtype=np.float64)
+
+    in_range = (hours >= range_hours[0]) & (hours < range_hours[1])
+    range_high = np.maximum.accumulate(np.where(in_range, high, -np.inf))
+    range_low = np.minimum.accumulate(np.where(in_range, low, np.inf))
+    has_range = np.isfinite(range_high) & (range_high != 0) & (range_low != 0)
+
+    eligible = ~in_range & (hours >= breakout_hour) & has_range
+    buy = eligible & (high >= range_high)
+    sell = eligible & ~buy & (low <= range_low)
+
+    idx = np.flatnonzero(buy | sell)
+    rh = range_high[idx]
+    rl = range_low[idx]
+    size = rh - rl
+    is_buy = buy[idx]
+
+    side = np.where(is_buy, BUY, SELL).astype(np.int8)
+    entry = np.where(is_buy, rh, rl)
+    return {
+        "entry_idx": idx,
+        "side": side,
+        "entry": entry,
+        "tp": entry + side * size * tp_mult,
+        "sl": entry - side * size * sl_mult,
+    }
+
+
+def backtest_range_breakout(
+    data: pd.DataFrame,
+    range_hours: Tuple[float, float] = (14, 19),
+    breakout_hour: float = 19.5,
+    tp_mult: float = 1.5,
+    sl_mult: float = 0.5,
+    high_col: str = "high",
+    low_col: str = "low",
+) -> pd.DataFrame:
+    """
+    Полный прогон Range Breakout по свечам (DatetimeIndex + high/low).
+    Возвращает DataFrame сделок (см. simulate_bracket_orders).
+    """
+    high = data[high_col].to_numpy(dtype=np.float64)
+    low = data[low_col].to_numpy(dtype=np.float64)
+    orders = range_breakout_orders(
+        data.index, high, low, range_hours, breakout_hour, tp_mult, sl_mult
+    )
+    return simulate_bracket_orders(high, low, index=data.index, **orders)
+
+
+def summarize_bracket_trades(
+    trades: pd.DataFrame,
+    lot_size: float = 0.1,
+    point_value: float = 100.0,
+) -> Dict[str, float]:
+    """
+    Итог по сделкам в деньгах: количество, PnL, винрейт (%).
+    pnl сделки = result * lot_size * point_value.
+    """
+    if trades.empty:
+        return {"total_trades": 0, "total_pnl": 0.0, "win_rate": 0.0}
+
+    pnl = trades["result"].to_numpy() * lot_size * point_value
+    return {
+        "total_trades": int(pnl.size),
+        "total_pnl": round(float(pnl.sum()), 2),
+        "win_rate": round(float((pnl > 0).mean() * 100), 1),
+    }
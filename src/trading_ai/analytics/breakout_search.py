@@ -0,0 +1,398 @@
+# ==============================================
+# src/trading_ai/analytics/breakout_search.py
+# Подбор параметров Range Breakout EA:
+# - сетка / случайный поиск / successive halving (ранняя отсечка)
+# - свечи всех символов в одном блоке shared memory,
+#   наборы параметров считаются пачками в ProcessPoolExecutor
+# - ранжированный результат → CSV + reports/history.json
+# ==============================================
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.trading_ai.analytics.bracket_orders import (
+    bar_hours,
+    range_breakout_orders_from_hours,
+    simulate_bracket_orders,
+)
+from src.trading_ai.analytics.parallel_runner import (
+    SharedPriceArrays,
+    _init_worker,
+    _worker_prices,
+)
+
+REPORTS_DIR = "reports"
+STRATEGY_NAME = "RangeBreakout"
+
+PARAM_NAMES = ("range_start", "range_end", "breakout_hour", "tp_mult", "sl_mult")
+
+# Список — перебор значений; кортеж (lo, hi[, step]) — равномерно (с шагом) в random-поиске
+SpaceValue = Union[Sequence[float], Tuple[float, ...]]
+
+DEFAULT_SPACE: Dict[str, SpaceValue] = {
+    "range_start": [12, 13, 14, 15],
+    "range_end": [17, 18, 19],
+    "breakout_hour": [18.0, 19.0, 19.5, 20.0],
+    "tp_mult": [1.0, 1.5, 2.0, 3.0],
+    "sl_mult": [0.25, 0.5, 0.75, 1.0],
+}
+
+DEFAULT_METRIC = "Total Return %"
+
+
+@dataclass
+class SearchResult:
+    method: str
+    ranked: pd.DataFrame                 # параметры + метрики, лучшие сверху
+    evaluations: int                     # сколько прогонов (набор × доля истории) сделано
+    rungs: List[pd.DataFrame] = field(default_factory=list)   # successive halving: все ступени
+
+    @property
+    def best(self) -> Dict[str, float]:
+        if self.ranked.empty:
+            return {}
+        row = self.ranked.iloc[0]
+        return {name: float(row[name]) for name in PARAM_NAMES}
+
+
+# ---------- 1. Кандидаты ----------
+
+def _is_valid(params: Mapping[str, float]) -> bool:
+    """Диапазон непустой, пробой не раньше конца диапазона, TP/SL > 0."""
+    return (
+        params["range_start"] < params["range_end"] <= params["breakout_hour"]
+        and params["tp_mult"] > 0
+        and params["sl_mult"] > 0
+    )
+
+
+def grid_candidates(space: Mapping[str, SpaceValue] = DEFAULT_SPACE) -> List[Dict[str, float]]:
+    """Все допустимые комбинации значений-списков."""
+    values = [list(space[name]) for name in PARAM_NAMES]
+    out = []
+    for combo in itertools.product(*values):
+        params = {name: float(v) for name, v in zip(PARAM_NAMES, combo)}
+        if _is_valid(params):
+            out.append(params)
+    return out
+
+
+def _sample(value: SpaceValue, rng: np.random.Generator) -> float:
+    if isinstance(value, tuple):
+        lo, hi = value[0], value[1]
+        step = value[2] if len(value) > 2 else None
+        if step:
+            return float(lo + step * rng.integers(0, int(round((hi - lo) / step)) + 1))
+        return float(rng.uniform(lo, hi))
+    return float(rng.choice(np.asarray(value, dtype=np.float64)))
+
+
+def random_candidates(
+    n: int,
+    space: Mapping[str, SpaceValue] = DEFAULT_SPACE,
+    seed: Optional[int] = None,
+    max_tries: int = 50,
+) -> List[Dict[str, float]]:
+    """n случайных допустимых наборов без повторов (попыток не больше n * max_tries)."""
+    rng = np.random.default_rng(seed)
+    seen = set()
+    out: List[Dict[str, float]] = []
+    for _ in range(n * max_tries):
+        if len(out) >= n:
+            break
+        params = {name: _sample(space[name], rng) for name in PARAM_NAMES}
+        key = tuple(round(params[name], 6) for name in PARAM_NAMES)
+        if key in seen or not _is_valid(params):
+            continue
+        seen.add(key)
+        out.append(params)
+    return out
+
+
+# ---------- 2. Оценка набора параметров ----------
+
+def _evaluate(
+    params_list: Sequence[Mapping[str, float]],
+    series: Mapping[str, Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    fraction: float = 1.0,
+) -> List[dict]:
+    """
+    Метрики каждого набора, суммарно по всем символам {symbol: (hours, high, low)}.
+    fraction < 1 — только первая доля истории (ранние ступени successive halving).
+    Доходность сделки = result / entry, поэтому символы с разной ценой пункта сопоставимы.
+    """
+    rows = []
+    for params in params_list:
+        rets = []
+        for hours, high, low in series.values():
+            n = int(len(high) * fraction)
+            orders = range_breakout_orders_from_hours(
+                hours[:n], high[:n], low[:n],
+                range_hours=(params["range_start"], params["range_end"]),
+                breakout_hour=params["breakout_hour"],
+                tp_mult=params["tp_mult"],
+                sl_mult=params["sl_mult"],
+            )
+            trades = simulate_bracket_orders(high[:n], low[:n], **orders)
+            rets.append((trades["result"] / trades["entry"]).to_numpy())
+        r = np.concatenate(rets) if rets else np.empty(0)
+
+        gains = r[r > 0].sum()
+        losses = -r[r < 0].sum()
+        rows.append({
+            **{name: params[name] for name in PARAM_NAMES},
+            "Total Return %": round(float(r.sum() * 100), 4),
+            "Trades": int(r.size),
+            "Win Rate %": round(float((r > 0).mean() * 100), 1) if r.size else 0.0,
+            "Profit Factor": round(float(gains / losses), 3) if losses > 0 else (np.inf if gains > 0 else 0.0),
+            "Avg Trade %": round(float(r.mean() * 100), 4) if r.size else 0.0,
+        })
+    return rows
+
+
+def _run_batch(params_list: List[Dict[str, float]], symbols: List[str], fraction: float) -> List[dict]:
+    """Задача воркера: массивы символов берутся из shared memory без копирования."""
+    series = {
+        sym: tuple(_worker_prices((sym, part)) for part in ("hours", "high", "low"))
+        for sym in symbols
+    }
+    return _evaluate(params_list, series, fraction)
+
+
+class _Evaluator:
+    """Оценка пачек наборов: в процессе (max_workers=1) или в пуле над shared memory."""
+
+    def __init__(self, series, max_workers: Optional[int], params_per_task: int):
+        self.series = series
+        self.symbols = list(series.keys())
+        self.step = max(int(params_per_task), 1)
+        self.max_workers = max_workers
+        self.shared: Optional[SharedPriceArrays] = None
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "_Evaluator":
+        if self.max_workers != 1:
+            arrays = {
+                (sym, part): arr
+                for sym, parts in self.series.items()
+                for part, arr in zip(("hours", "high", "low"), parts)
+            }
+            self.shared = SharedPriceArrays(arrays)
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.shared.name, self.shared.layout),
+            )
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.shared is not None:
+            self.shared.close()
+
+    def __call__(self, candidates: List[Dict[str, float]], fraction: float) -> pd.DataFrame:
+        batches = [candidates[i:i + self.step] for i in range(0, len(candidates), self.step)]
+        rows: List[dict] = []
+        if self.pool is None:
+            for batch in batches:
+                rows.extend(_evaluate(batch, self.series, fraction))
+        else:
+            futures = [self.pool.submit(_run_batch, b, self.symbols, fraction) for b in batches]
+            for fut in futures:
+                rows.extend(fut.result())
+        return pd.DataFrame(rows, columns=[*PARAM_NAMES, "Total Return %", "Trades",
+                                           "Win Rate %", "Profit Factor", "Avg Trade %"])
+
+
+def _rank(table: pd.DataFrame, metric: str, min_trades: int) -> pd.DataFrame:
+    """Сортировка по метрике; наборы с малым числом сделок — в конец."""
+    enough = table["Trades"] >= min_trades
+    order = np.lexsort((-table[metric].to_numpy(dtype=np.float64), ~enough.to_numpy()))
+    return table.iloc[order].reset_index(drop=True)
+
+
+# ---------- 3. Поиск ----------
+
+def _prepare(candles: Mapping[str, pd.DataFrame], high_col: str, low_col: str):
+    return {
+        sym: (
+            bar_hours(df.index),
+            df[high_col].to_numpy(dtype=np.float64),
+            df[low_col].to_numpy(dtype=np.float64),
+        )
+        for sym, df in candles.items()
+    }
+
+
+def search_range_breakout(
+    candles: Mapping[str, pd.DataFrame],
+    method: str = "halving",
+    space: Mapping[str, SpaceValue] = DEFAULT_SPACE,
+    n_iter: int = 200,
+    eta: int = 3,
+    min_fraction: float = 0.1,
+    metric: str = DEFAULT_METRIC,
+    min_trades: int = 10,
+    max_workers: Optional[int] = None,
+    params_per_task: int = 8,
+    seed: Optional[int] = None,
+    high_col: str = "high",
+    low_col: str = "low",
+) -> SearchResult:
+    """
+    Подбор RANGE_HOURS / BREAKOUT_HOUR / TP_MULT / SL_MULT по свечам {symbol: DataFrame}
+    (DatetimeIndex + high/low, как у CTraderConnector).
+
+    method:
+      "grid"    — все комбинации space (значения-списки)
+      "random"  — n_iter случайных наборов (кортежи (lo, hi[, step]) — непрерывные диапазоны)
+      "halving" — successive halving над n_iter случайными наборами: на каждой ступени
+                  наборы считаются на первой доле истории, дальше проходит лучшая 1/eta,
+                  доля растёт в eta раз до полной истории (не меньше min_fraction).
+
+    max_workers=1 — без процессов (удобно для отладки и маленьких сеток).
+    """
+    series = _prepare(candles, high_col, low_col)
+    if method == "grid":
+        candidates = grid_candidates(space)
+    elif method in ("random", "halving"):
+        candidates = random_candidates(n_iter, space, seed)
+    else:
+        raise ValueError(f"Unknown search method: {method}")
+
+    with _Evaluator(series, max_workers, params_per_task) as evaluate:
+        if method != "halving":
+            table = evaluate(candidates, 1.0)
+            return SearchResult(method, _rank(table, metric, min_trades), len(candidates))
+
+        n_rungs = 1
+        while n_rungs < 1 + math.log(max(len(candidates), 1), eta) and eta ** -n_rungs >= min_fraction:
+            n_rungs += 1
+
+        rungs: List[pd.DataFrame] = []
+        evaluations = 0
+        survivors = candidates
+        for k in range(n_rungs):
+            fraction = float(eta ** (k - n_rungs + 1))
+            # на ранних ступенях порог сделок пропорционален доле истории
+            table = _rank(evaluate(survivors, fraction), metric, math.ceil(min_trades * fraction))
+            table.insert(0, "rung", k)
+            table.insert(1, "fraction", round(fraction, 4))
+            rungs.append(table)
+            evaluations += len(survivors)
+            if k < n_rungs - 1:
+                keep = max(len(survivors) // eta, 1)
+                survivors = table.head(keep)[list(PARAM_NAMES)].to_dict(orient="records")
+
+    ranked = rungs[-1].drop(columns=["rung", "fraction"]) if rungs else pd.DataFrame()
+    return SearchResult(method, ranked, evaluations, rungs)
+
+
+# ---------- 4. Сохранение ----------
+
+def save_search_results(
+    result: SearchResult,
+    symbols: Sequence[str],
+    timeframe: str,
+    reports_dir: str = REPORTS_DIR,
+    top: int = 50,
+) -> str:
+    """CSV с полным рейтингом + запись в reports/history.json (формат compare_strategies)."""
+    os.makedirs(reports_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    csv_path = os.path.join(reports_dir, f"breakout_search_{result.method}_{timestamp}.csv")
+    result.ranked.to_csv(csv_path, index=False)
+
+    # inf (profit factor без убытков) не сериализуется в JSON
+    records = result.ranked.head(top).replace([np.inf, -np.inf], None).to_dict(orient="records")
+    entry = {
+        "timestamp": timestamp,
+        "strategies": [STRATEGY_NAME],
+        "symbols": sorted(symbols),
+        "timeframes": [timeframe],
+        "search": {"method": result.method, "evaluations": result.evaluations, "best": result.best},
+        "results": records,
+        "report_paths": {"csv": csv_path},
+    }
+
+    history_path = os.path.join(reports_dir, "history.json")
+    if os.path.exists(history_path):
+        with open(history_path, "r", encoding="utf-8") as f:
+            history = json.load(f)
+    else:
+        history = []
+    history.append(entry)
+    with open(history_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=4, ensure_ascii=False)
+
+    print(f"📚 Search logged to history.json ({len(history)} total entries), CSV: {csv_path}")
+    return csv_path
+
+
+# ---------- 5. CLI ----------
+
+def synthetic_candles(days: int = 250, seed: int = 0, freq: str = "15min") -> pd.DataFrame:
+    """Случайное блуждание с внутридневной волатильностью — для проверки без брокера."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2024-01-01", periods=days * 96, freq=freq)
+    vol = 0.0008 * (1 + (index.hour >= 14).astype(float))
+    close = 40_000 * np.exp(np.cumsum(rng.normal(0, vol)))
+    spread = np.abs(rng.normal(0, vol)) * close
+    return pd.DataFrame({"high": close + spread, "low": close - spread, "close": close}, index=index)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> SearchResult:
+    parser = argparse.ArgumentParser(description="Range Breakout parameter search")
+    parser.add_argument("--symbols", nargs="+", default=None, help="по умолчанию — весь WATCHLIST")
+    parser.add_argument("--timeframe", default="M15")
+    parser.add_argument("--bars", type=int, default=20_000)
+    parser.add_argument("--method", choices=["grid", "random", "halving"], default="halving")
+    parser.add_argument("--n-iter", type=int, default=200)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--synthetic", action="store_true", help="синтетические свечи вместо cTrader")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        symbols = args.symbols or ["SYN1", "SYN2"]
+        candles = {sym: synthetic_candles(seed=i) for i, sym in enumerate(symbols)}
+    else:
+        from trading_ai.connectors.ctrader_connector import CTraderConnector
+        from trading_ai.services.ctrader.market_snapshot import WATCHLIST
+
+        symbols = args.symbols or list(WATCHLIST.keys())
+        ctrader = CTraderConnector()
+        candles = {}
+        for sym in symbols:
+            data = ctrader.get_historical_data(sym, timeframe=args.timeframe, bars=args.bars)
+            if data is not None and not data.empty:
+                candles[sym] = data
+        if not candles:
+            print("⚠ Нет данных из cTrader — запусти с --synthetic для проверки.")
+            return SearchResult(args.method, pd.DataFrame(), 0)
+
+    result = search_range_breakout(
+        candles, method=args.method, n_iter=args.n_iter, eta=args.eta,
+        max_workers=args.workers, seed=args.seed,
+    )
+    print(result.ranked.head(10).to_string(index=False))
+    save_search_results(result, list(candles.keys()), args.timeframe)
+    return result
+
+
+if __name__ == "__main__":
+    main()
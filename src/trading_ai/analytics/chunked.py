@@ -0,0 +1,356 @@
+# ==============================================
+# src/trading_ai/analytics/chunked.py
+# Out-of-core режим: бэктест, статистика доходностей и временные
+# паттерны по истории, которая не помещается в память.
+# - источник читается кусками (Parquet row groups / memmap .npy / CSV)
+# - состояние переносится через границы кусков
+#   (последняя цена и сигнал, equity, пик, моменты доходностей)
+# - память ограничена размером куска, а не длиной истории
+# ==============================================
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from src.trading_ai.analytics.backtester import (
+    _BUCKETS,
+    TimePatternAnalysis,
+    _bucket_sums,
+    _calendar_fields,
+    _stats_from_sums,
+)
+from src.trading_ai.analytics.statistics import (
+    BacktestResult,
+    ReturnStats,
+    ensure_datetime_index,
+)
+
+# Parquet (по желанию). Нужно: pip install pyarrow
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+TIME_COLUMN = "Date"
+
+Source = Union[str, os.PathLike, Iterable[pd.DataFrame]]
+
+
+# ---------- 1. Источники кусков ----------
+
+def iter_candle_chunks(
+    source: Source,
+    columns: Optional[Sequence[str]] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """
+    Куски свечей с DatetimeIndex по возрастанию времени.
+
+    - *.parquet — пакеты по row groups (pyarrow)
+    - *.npy     — структурированный массив с полем Date, открывается через memmap
+                  (см. write_candle_npy)
+    - *.csv     — pandas.read_csv(chunksize=...)
+    - итерируемое DataFrame — как есть (например, генератор из БД)
+    """
+    cols = None if columns is None else list(dict.fromkeys([TIME_COLUMN, *columns]))
+
+    if not isinstance(source, (str, os.PathLike)):
+        for chunk in source:
+            yield ensure_datetime_index(chunk)
+        return
+
+    path = os.fspath(source)
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".parquet":
+        if pq is None:
+            raise ImportError("Reading Parquet requires pyarrow: pip install pyarrow")
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=cols):
+            yield ensure_datetime_index(batch.to_pandas())
+
+    elif ext == ".npy":
+        arr = np.load(path, mmap_mode="r")
+        names = cols or list(arr.dtype.names)
+        for start in range(0, arr.shape[0], chunk_rows):
+            part = arr[start:start + chunk_rows]
+            frame = pd.DataFrame({name: np.asarray(part[name]) for name in names})
+            yield ensure_datetime_index(frame)
+
+    elif ext == ".csv":
+        for chunk in pd.read_csv(path, usecols=cols, chunksize=chunk_rows):
+            yield ensure_datetime_index(chunk)
+
+    else:
+        raise ValueError(f"Unsupported candle file: {path}")
+
+
+def write_candle_npy(df: pd.DataFrame, path: Union[str, os.PathLike]) -> None:
+    """Сохраняет свечи в .npy-структуру для memmap-чтения (Date + числовые колонки)."""
+    df = ensure_datetime_index(df)
+    fields = [(TIME_COLUMN, "datetime64[ns]")] + [(c, "f8") for c in df.columns]
+    arr = np.empty(len(df), dtype=fields)
+    arr[TIME_COLUMN] = df.index.tz_localize(None).values if df.index.tz is not None else df.index.values
+    for c in df.columns:
+        arr[c] = df[c].to_numpy(dtype=np.float64)
+    np.save(path, arr)
+
+
+# ---------- 2. Аккумуляторы с переносом состояния ----------
+
+def _merge_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """Объединение (n, mean, M2) двух выборок (Chan et al.), поэлементно для массивов."""
+    n = n_a + n_b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = mean_b - mean_a
+        mean = np.where(n > 0, mean_a + delta * n_b / n, 0.0)
+        m2 = np.where(n > 0, m2_a + m2_b + delta * delta * n_a * n_b / n, 0.0)
+    return n, mean, m2
+
+
+class ChunkedReturnStats:
+    """calc_return_stats по кускам: первая/последняя цена и моменты доходностей."""
+
+    def __init__(self, periods_per_year: int = 252):
+        self.periods_per_year = periods_per_year
+        self.first_price: Optional[float] = None
+        self.last_price: Optional[float] = None
+        self.n = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, prices: np.ndarray) -> None:
+        px = prices[~np.isnan(prices)]
+        if px.size == 0:
+            return
+        if self.last_price is None:
+            self.first_price = float(px[0])
+        else:
+            px = np.concatenate(([self.last_price], px))
+        self.last_price = float(px[-1])
+
+        rets = px[1:] / px[:-1] - 1.0
+        if rets.size == 0:
+            return
+        mean_b = rets.mean()
+        m2_b = float(((rets - mean_b) ** 2).sum())
+        n, mean, m2 = _merge_moments(self.n, self.mean, self.m2, float(rets.size), mean_b, m2_b)
+        self.n, self.mean, self.m2 = float(n), float(mean), float(m2)
+
+    def result(self) -> ReturnStats:
+        if self.n == 0:
+            return ReturnStats(0.0, 0.0, 0.0, 0.0)
+        total_return = (self.last_price / self.first_price - 1.0) * 100.0
+        vol = np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else float("nan")
+        annual_return = (1 + self.mean) ** self.periods_per_year - 1
+        annual_vol = vol * np.sqrt(self.periods_per_year)
+        sharpe = annual_return / annual_vol if annual_vol != 0 else 0.0
+        return ReturnStats(
+            total_return=round(total_return, 2),
+            annual_return=round(annual_return * 100.0, 2),
+            annual_vol=round(annual_vol * 100.0, 2),
+            sharpe=round(sharpe, 2),
+        )
+
+
+class ChunkedSignalBacktest:
+    """
+    simple_signal_backtest по кускам. Между кусками переносятся последняя
+    цена, последний сигнал (позиция следующей свечи и детектор смены для
+    комиссии), текущий equity, его пик и максимальная просадка.
+
+    keep_equity=False — в equity_curve только значение на конце каждого куска
+    (память O(число кусков)); True — полная кривая во float32.
+    """
+
+    def __init__(
+        self,
+        initial_balance: float = 100_000.0,
+        fee_per_trade: float = 0.0,
+        keep_equity: bool = False,
+    ):
+        self.initial_balance = initial_balance
+        self.fee_per_trade = fee_per_trade
+        self.keep_equity = keep_equity
+
+        self.last_price = np.nan
+        self.last_signal = np.nan
+        self.equity = initial_balance
+        self.peak = initial_balance
+        self.max_drawdown = 0.0
+        self._curve_values = []
+        self._curve_index = []
+
+    def update(self, prices: np.ndarray, signals: np.ndarray, index: pd.Index) -> None:
+        mask = ~(np.isnan(prices) | np.isnan(signals))
+        px, sig, index = prices[mask], signals[mask], index[mask]
+        if px.size == 0:
+            return
+
+        prev_px = np.concatenate(([self.last_price], px[:-1]))
+        prev_sig = np.concatenate(([self.last_signal], sig[:-1]))
+        rets = np.nan_to_num(px / prev_px - 1.0, nan=0.0)          # первая свеча истории — 0
+        strat = np.nan_to_num(prev_sig, nan=0.0) * rets
+        if self.fee_per_trade > 0.0:
+            trades = (sig != prev_sig).astype(np.float64)          # NaN != x → сделка, как в pandas
+            strat = strat - trades * (self.fee_per_trade / self.initial_balance)
+
+        equity = self.equity * np.cumprod(1.0 + strat)
+        running_peak = np.maximum.accumulate(np.maximum(equity, self.peak))
+        self.max_drawdown = min(self.max_drawdown, float((equity / running_peak - 1.0).min()))
+        self.peak = float(running_peak[-1])
+        self.equity = float(equity[-1])
+        self.last_price = float(px[-1])
+        self.last_signal = float(sig[-1])
+
+        if self.keep_equity:
+            self._curve_values.append(equity.astype(np.float32))
+            self._curve_index.append(index)
+        else:
+            self._curve_values.append(np.array([self.equity], dtype=np.float32))
+            self._curve_index.append(index[-1:])
+
+    def result(self) -> BacktestResult:
+        if self._curve_values:
+            values = np.concatenate(self._curve_values)
+            index = self._curve_index[0].append(self._curve_index[1:])
+            curve = pd.Series(values, index=index)
+        else:
+            curve = pd.Series(dtype=np.float32)
+        return BacktestResult(
+            initial_balance=self.initial_balance,
+            final_balance=round(self.equity, 2),
+            total_return_pct=round((self.equity / self.initial_balance - 1.0) * 100.0, 2),
+            max_drawdown_pct=round(self.max_drawdown * 100.0, 2),
+            equity_curve=curve,
+        )
+
+
+class ChunkedTimePatterns:
+    """
+    analyze_time_patterns по кускам: агрегаты корзин (_bucket_sums) каждого
+    куска сливаются через (n, mean, M2), поэтому дисперсии по корзинам
+    не зависят от разбиения.
+    """
+
+    def __init__(self):
+        self.last_price = np.nan
+        self.hours_seen = np.zeros(24, dtype=bool)
+        self.minutes_seen = np.zeros(60, dtype=bool)
+        self._acc: Dict[str, Dict[str, np.ndarray]] = {
+            kind: {k: np.zeros(n_buckets) for k in ("n", "mean", "m2", "wins")}
+            for kind, (_, n_buckets, _, _) in _BUCKETS.items()
+        }
+
+    def update(self, prices: np.ndarray, index: pd.DatetimeIndex) -> None:
+        if prices.size == 0:
+            return
+        px = np.concatenate(([self.last_price], prices))
+        self.last_price = float(prices[-1])
+        rets = px[1:] / px[:-1] - 1.0
+        mask = ~np.isnan(rets)
+
+        fields = _calendar_fields(index)
+        self.hours_seen[fields["hour"]] = True
+        self.minutes_seen[fields["minute"]] = True
+        rets = rets[mask]
+        if rets.size == 0:
+            return
+        fields = {k: v[mask] for k, v in fields.items()}
+
+        for kind, (code_fn, n_buckets, _, _) in _BUCKETS.items():
+            count, total, sq_c, wins, shift = _bucket_sums(rets, code_fn(fields), n_buckets)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mean_b = np.where(count > 0, total / count, 0.0)
+                sum_c = total - shift * count
+                m2_b = np.where(count > 0, sq_c - sum_c * sum_c / count, 0.0)
+            acc = self._acc[kind]
+            acc["n"], acc["mean"], acc["m2"] = _merge_moments(
+                acc["n"], acc["mean"], acc["m2"], count, mean_b, m2_b,
+            )
+            acc["wins"] += wins
+
+    def _stats(self, kind: str) -> pd.DataFrame:
+        _, _, labels, index_name = _BUCKETS[kind]
+        acc = self._acc[kind]
+        # shift = среднее корзины → центрированная сумма 0, сумма квадратов = M2
+        sums = np.vstack([acc["n"], acc["mean"] * acc["n"], acc["m2"], acc["wins"], acc["mean"]])
+        return _stats_from_sums(sums, labels, index_name)
+
+    def result(self) -> TimePatternAnalysis:
+        intraday = int(self.hours_seen.sum()) > 1
+        minutes = int(self.minutes_seen.sum()) > 1
+        return TimePatternAnalysis(
+            day_of_week=self._stats("day_of_week"),
+            hour_of_day=self._stats("hour_of_day") if intraday else None,
+            month_of_year=self._stats("month_of_year"),
+            hour_weekday=self._stats("hour_weekday") if intraday else None,
+            session=self._stats("session") if intraday else None,
+            minute_of_hour=self._stats("minute_of_hour") if minutes else None,
+        )
+
+
+# ---------- 3. Прогон ----------
+
+@dataclass
+class ChunkedResult:
+    stats: ReturnStats
+    backtest: Optional[BacktestResult]
+    patterns: TimePatternAnalysis
+    rows: int
+    chunks: int
+
+
+def run_chunked(
+    source: Source,
+    signal_col: Optional[str] = None,
+    price_col: str = "Close",
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    initial_balance: float = 100_000.0,
+    fee_per_trade: float = 0.0,
+    periods_per_year: int = 252,
+    keep_equity: bool = False,
+) -> ChunkedResult:
+    """
+    Один проход по источнику: статистика доходностей, временные паттерны
+    и (если задан signal_col) бэктест. Результаты совпадают с
+    calc_return_stats / analyze_time_patterns / simple_signal_backtest
+    на всей истории.
+    """
+    columns = [price_col] + ([signal_col] if signal_col else [])
+    stats_acc = ChunkedReturnStats(periods_per_year)
+    patterns_acc = ChunkedTimePatterns()
+    bt_acc = ChunkedSignalBacktest(initial_balance, fee_per_trade, keep_equity) if signal_col else None
+
+    rows = chunks = 0
+    for chunk in iter_candle_chunks(source, columns, chunk_rows):
+        prices = chunk[price_col].to_numpy(dtype=np.float64)
+        stats_acc.update(prices)
+        patterns_acc.update(prices, chunk.index)
+        if bt_acc is not None:
+            bt_acc.update(prices, chunk[signal_col].to_numpy(dtype=np.float64), chunk.index)
+        rows += len(chunk)
+        chunks += 1
+
+    return ChunkedResult(
+        stats=stats_acc.result(),
+        backtest=bt_acc.result() if bt_acc is not None else None,
+        patterns=patterns_acc.result(),
+        rows=rows,
+        chunks=chunks,
+    )
+
+
+def run_chunked_many(
+    sources: Dict[str, Source],
+    signal_col: Optional[str] = None,
+    **kwargs,
+) -> Dict[str, ChunkedResult]:
+    """По символам последовательно: в памяти один кусок одного символа."""
+    return {name: run_chunked(src, signal_col, **kwargs) for name, src in sources.items()}
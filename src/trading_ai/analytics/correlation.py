@@ -0,0 +1,193 @@
+# ==============================================
+# src/trading_ai/analytics/correlation.py
+# Потоковая корреляционная матрица по набору активов:
+# - скользящее окно (суммы и кросс-произведения доходностей)
+#   или экспоненциальное взвешивание (EW-ковариация)
+# - O(N²) на новую свечу, история не пересканируется
+# - текущая матрица + история матриц
+# ==============================================
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, Hashable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+PriceVector = Union[Mapping[str, float], Sequence[float], np.ndarray]
+
+
+class StreamingCorrelation:
+    """
+    Корреляции доходностей между symbols, обновляемые по одной свече.
+
+    - window=W      — скользящее окно из W последних доходностей
+                      (как DataFrame.pct_change().rolling(W).corr())
+    - halflife=H    — экспоненциальное взвешивание
+                      (как pct_change().ewm(halflife=H, adjust=False).corr())
+
+    Цены подаются вектором по всем символам сразу. NaN = цена не изменилась
+    (берётся прошлая, доходность 0) — удобно, когда сессии у активов разные.
+    history хранит последние history_size матриц с метками времени.
+    """
+
+    _RESYNC_EVERY = 10_000  # точный пересчёт сумм окна от накопления ошибок округления
+
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        window: Optional[int] = 100,
+        halflife: Optional[float] = None,
+        min_periods: Optional[int] = None,
+        history_size: int = 500,
+    ):
+        if halflife is None and (window is None or window < 2):
+            raise ValueError("Either window >= 2 or halflife must be set.")
+        self.symbols: List[str] = list(symbols)
+        n = len(self.symbols)
+
+        self.halflife = halflife
+        self.window = None if halflife is not None else int(window)
+        self.min_periods = min_periods if min_periods is not None else (self.window or 2)
+        self.alpha = 1.0 - np.exp(np.log(0.5) / halflife) if halflife is not None else None
+
+        self.count = 0                       # число учтённых доходностей
+        self._last = np.full(n, np.nan)
+        self._mean = np.zeros(n)             # EW: среднее; окно: сумма доходностей
+        self._comoment = np.zeros((n, n))    # EW: ковариация; окно: сумма r rᵀ
+        self._buffer = np.zeros((self.window or 0, n))
+        self._pos = 0
+        self._since_resync = 0
+
+        self.history: Deque[Tuple[Hashable, np.ndarray]] = deque(maxlen=history_size)
+
+    # ---------- обновление ----------
+
+    def _vector(self, prices: PriceVector) -> np.ndarray:
+        if isinstance(prices, Mapping):
+            return np.array([prices.get(s, np.nan) for s in self.symbols], dtype=np.float64)
+        return np.asarray(prices, dtype=np.float64)
+
+    def update(self, prices: PriceVector, time: Hashable = None) -> Optional[np.ndarray]:
+        """Добавляет свечу. Возвращает текущую матрицу (ndarray) или None, пока данных мало."""
+        p = self._vector(prices)
+        p = np.where(np.isnan(p), self._last, p)
+        prev, self._last = self._last, p
+        if np.isnan(prev).all():
+            return None
+
+        r = np.nan_to_num(p / prev - 1.0, nan=0.0)   # символ без истории — доходность 0
+        if self.alpha is None:
+            self._push_window(r)
+        else:
+            self._push_ew(r)
+        self.count += 1
+
+        corr = self.current()
+        if corr is not None:
+            self.history.append((time, corr))
+        return corr
+
+    def update_frame(self, prices: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Прогон истории (строки по времени, колонки = symbols)."""
+        values = prices.reindex(columns=self.symbols).to_numpy(dtype=np.float64)
+        for t, row in zip(prices.index, values):
+            self.update(row, time=t)
+        return self.matrix
+
+    def _push_window(self, r: np.ndarray) -> None:
+        w = self.window
+        if self.count >= w:
+            old = self._buffer[self._pos]
+            self._mean -= old
+            self._comoment -= np.outer(old, old)
+            self._since_resync += 1
+        self._buffer[self._pos] = r
+        self._pos = (self._pos + 1) % w
+        self._mean += r
+        self._comoment += np.outer(r, r)
+
+        if self._since_resync >= self._RESYNC_EVERY:
+            self._mean = self._buffer.sum(axis=0)
+            self._comoment = self._buffer.T @ self._buffer
+            self._since_resync = 0
+
+    def _push_ew(self, r: np.ndarray) -> None:
+        if self.count == 0:
+            self._mean = r.copy()
+            return
+        a = self.alpha
+        delta = r - self._mean
+        self._mean += a * delta
+        self._comoment = (1.0 - a) * (self._comoment + a * np.outer(delta, delta))
+
+    # ---------- результаты ----------
+
+    def current(self) -> Optional[np.ndarray]:
+        if self.count < self.min_periods:
+            return None
+        if self.alpha is None:
+            n = min(self.count, self.window)
+            mean = self._mean / n
+            cov = self._comoment / n - np.outer(mean, mean)
+        else:
+            cov = self._comoment
+        std = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+        corr[np.outer(std, std) <= 1e-24] = np.nan   # нулевая дисперсия → корреляция не определена
+        np.clip(corr, -1.0, 1.0, out=corr)
+        return corr
+
+    @property
+    def matrix(self) -> Optional[pd.DataFrame]:
+        corr = self.current()
+        if corr is None:
+            return None
+        return pd.DataFrame(corr, index=self.symbols, columns=self.symbols)
+
+    def history_frame(self) -> pd.DataFrame:
+        """История в формате rolling().corr(): MultiIndex (time, symbol) × symbols."""
+        if not self.history:
+            return pd.DataFrame(columns=self.symbols)
+        times = [t for t, _ in self.history]
+        stacked = np.concatenate([m for _, m in self.history])
+        index = pd.MultiIndex.from_arrays([
+            pd.Index(times).repeat(len(self.symbols)),
+            np.tile(self.symbols, len(times)),
+        ])
+        return pd.DataFrame(stacked, index=index, columns=self.symbols)
+
+    def pair_history(self, a: str, b: str) -> pd.Series:
+        """Корреляция одной пары во времени."""
+        i, j = self.symbols.index(a), self.symbols.index(b)
+        return pd.Series(
+            [m[i, j] for _, m in self.history],
+            index=[t for t, _ in self.history],
+            name=f"{a}/{b}",
+        )
+
+    def top_pairs(self, n: int = 5) -> List[Tuple[str, str, float]]:
+        """Пары с наибольшей по модулю корреляцией (без диагонали)."""
+        corr = self.current()
+        if corr is None:
+            return []
+        iu, ju = np.triu_indices(len(self.symbols), k=1)
+        vals = corr[iu, ju]
+        ok = ~np.isnan(vals)
+        iu, ju, vals = iu[ok], ju[ok], vals[ok]
+        order = np.argsort(-np.abs(vals))[:n]
+        return [(self.symbols[iu[k]], self.symbols[ju[k]], float(vals[k])) for k in order]
+
+
+def summarize_correlation(engine: StreamingCorrelation, top: int = 5) -> str:
+    mode = f"EW halflife={engine.halflife}" if engine.alpha is not None else f"window={engine.window}"
+    lines = [f"🔗 Cross-asset correlation ({mode}, {engine.count} returns)"]
+    pairs = engine.top_pairs(top)
+    if not pairs:
+        lines.append("- Not enough data yet")
+        return "\n".join(lines)
+    for a, b, v in pairs:
+        lines.append(f"- {a}/{b}: {v:+.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,152 @@
+# ==============================================
+# src/trading_ai/analytics/execution.py
+# Модель издержек исполнения для бэктеста:
+# - спред: исторический ряд (записи снапшотов) или таблица по символам
+# - проскальзывание: доля от текущей волатильности доходностей
+# - комиссия за лот
+# Всё считается векторно: издержки = оборот позиции × стоимость единицы оборота.
+# ==============================================
+
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+SPREADS_DIR = Path(os.getenv("TRADING_AI_DATA_DIR", ".")) / "data" / "spreads"
+
+# Ориентировочные спреды (в единицах цены) по инструментам WATCHLIST —
+# запасной вариант, когда истории спредов ещё нет.
+DEFAULT_SPREAD_TABLE: Dict[str, float] = {
+    "US30": 2.0,
+    "DE40": 1.0,
+    "USTEC": 1.0,
+    "SP500": 0.5,
+    "EURUSD": 0.00008,
+    "USDJPY": 0.012,
+    "USDCHF": 0.00012,
+    "GBPUSD": 0.0001,
+    "XAUUSD": 0.25,
+    "BRENT": 0.03,
+}
+
+
+# ---------- 1. История спредов ----------
+
+def record_spreads(snapshots: Mapping[str, Any], directory: Path = SPREADS_DIR) -> None:
+    """
+    Дописывает спреды снапшотов (SymbolSnapshot: bid/ask/timestamp)
+    в data/spreads/<symbol>.csv — из них потом строится спред-ряд для бэктеста.
+
+    Спред — ask − bid без округления (SymbolSnapshot.spread округлён до 0.01,
+    у FX это 0). Снапшоты-заглушки (source != "ctrader") не пишутся.
+    """
+    directory = Path(directory)
+    for key, s in snapshots.items():
+        if getattr(s, "source", "ctrader") != "ctrader":
+            continue
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{key}.csv"
+        new_file = not path.exists()
+        ts = s.timestamp.isoformat() if isinstance(s.timestamp, datetime) else str(s.timestamp)
+        with path.open("a", encoding="utf-8") as f:
+            if new_file:
+                f.write("timestamp,bid,ask,spread\n")
+            f.write(f"{ts},{s.bid},{s.ask},{float(s.ask) - float(s.bid)!r}\n")
+
+
+def load_spread_history(symbol_key: str, directory: Path = SPREADS_DIR) -> Optional[pd.Series]:
+    """Спред-ряд символа (индекс — время, UTC) или None, если записей нет."""
+    path = Path(directory) / f"{symbol_key}.csv"
+    if not path.exists():
+        return None
+    df = pd.read_csv(path)
+    if df.empty:
+        return None
+    index = pd.to_datetime(df["timestamp"], utc=True, format="ISO8601")
+    # из bid/ask, а не из колонки spread: старые записи хранили округлённый спред
+    spread = df["ask"].to_numpy(dtype=np.float64) - df["bid"].to_numpy(dtype=np.float64)
+    return pd.Series(spread, index=index, name=symbol_key).sort_index()
+
+
+# ---------- 2. Модель издержек ----------
+
+@dataclass
+class ExecutionCostModel:
+    """
+    Стоимость единицы оборота позиции (доля капитала) на свече t:
+
+        spread_t / (2 · price_t)            — половина спреда за каждую сторону
+      + slippage_vol_mult · σ_t             — σ_t: std доходностей за vol_window свечей
+      + commission_per_lot / (lot_size · price_t)
+
+    Оборот = |позиция_t − позиция_{t−1}| (переворот long→short = 2).
+    spread — число (в единицах цены) или ряд по времени (берётся последнее
+    известное значение на момент свечи; до первой записи — fallback_spread).
+    """
+
+    spread: Union[float, pd.Series] = 0.0
+    fallback_spread: float = 0.0
+    slippage_vol_mult: float = 0.0
+    vol_window: int = 20
+    commission_per_lot: float = 0.0
+    lot_size: float = 1.0
+
+    @classmethod
+    def for_symbol(
+        cls,
+        symbol_key: str,
+        use_history: bool = True,
+        table: Mapping[str, float] = DEFAULT_SPREAD_TABLE,
+        **kwargs,
+    ) -> "ExecutionCostModel":
+        """Спред из записанной истории символа, иначе (и до её начала) — из таблицы."""
+        fallback = float(table.get(symbol_key, 0.0))
+        history = load_spread_history(symbol_key) if use_history else None
+        return cls(spread=history if history is not None else fallback, fallback_spread=fallback, **kwargs)
+
+    def spread_series(self, index: pd.DatetimeIndex) -> np.ndarray:
+        if not isinstance(self.spread, pd.Series):
+            return np.full(len(index), float(self.spread))
+        spread = self.spread.sort_index()
+        if (spread.index.tz is None) != (index.tz is None):
+            # история пишется в UTC; наивный индекс свечей тоже считаем UTC
+            spread = spread.tz_convert("UTC").tz_localize(None) if index.tz is None else spread.tz_localize("UTC")
+        positions = spread.index.searchsorted(index, side="right") - 1
+        values = spread.to_numpy(dtype=np.float64)
+        return np.where(positions >= 0, values[np.maximum(positions, 0)], self.fallback_spread)
+
+    def unit_cost(self, prices: pd.Series) -> np.ndarray:
+        """Стоимость единицы оборота по каждой свече (доля капитала)."""
+        px = prices.to_numpy(dtype=np.float64)
+        cost = self.spread_series(prices.index) / (2.0 * px)
+        if self.slippage_vol_mult > 0.0:
+            sigma = prices.pct_change().rolling(self.vol_window, min_periods=2).std()
+            cost = cost + self.slippage_vol_mult * sigma.fillna(0.0).to_numpy()
+        if self.commission_per_lot > 0.0:
+            cost = cost + self.commission_per_lot / (self.lot_size * px)
+        return cost
+
+    def cost_returns(self, prices: pd.Series, positions: pd.Series) -> pd.Series:
+        """Издержки в доходности по свечам (>= 0) для ряда целевых позиций (сигналов)."""
+        turnover = positions.diff().abs()
+        turnover.iloc[:1] = positions.iloc[:1].abs()   # вход с нуля на первой свече
+        return pd.Series(turnover.to_numpy() * self.unit_cost(prices), index=prices.index)
+
+    def fingerprint(self) -> str:
+        """Отпечаток параметров (включая спред-ряд) — для ключа кэша бэктестов."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((self.fallback_spread, self.slippage_vol_mult, self.vol_window,
+                       self.commission_per_lot, self.lot_size)).encode())
+        if isinstance(self.spread, pd.Series):
+            h.update(np.ascontiguousarray(self.spread.index.asi8).tobytes())
+            h.update(np.ascontiguousarray(self.spread.to_numpy(dtype=np.float64)).tobytes())
+        else:
+            h.update(repr(float(self.spread)).encode())
+        return h.hexdigest()
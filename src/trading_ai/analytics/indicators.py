@@ -0,0 +1,285 @@
+# ==============================================
+# src/trading_ai/analytics/indicators.py
+# Движок базовых индикаторов без pandas_ta:
+# - SMA 50/200, EMA 20, RSI 14 (Wilder), MACD 12/26/9,
+#   Bollinger 20/2, Vol_MA_20
+# - один векторный проход по истории
+# - состояние между вызовами: дописать N свечей = O(N)
+# ==============================================
+
+from __future__ import annotations
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+INDICATOR_COLUMNS = [
+    "SMA_50", "SMA_200", "EMA_20", "RSI_14", "MACD", "MACD_signal",
+    "BB_up", "BB_mid", "BB_low", "Vol_MA_20",
+]
+
+SMA_WINDOWS = (50, 200)
+EMA_SPAN = 20
+RSI_LENGTH = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BB_LENGTH, BB_STD = 20, 2.0
+VOL_MA_WINDOW = 20
+
+_TAIL = max(SMA_WINDOWS + (BB_LENGTH, VOL_MA_WINDOW)) - 1
+_STD_BLOCK = 1 << 16   # строк на блок скользящего std (ограничивает память)
+
+
+# ---------- 1. Примитивы ----------
+
+def _ema_step(x: np.ndarray, alpha: float, prev: float) -> np.ndarray:
+    """y_t = alpha * x_t + (1 - alpha) * y_{t-1}, y_{-1} = prev (рекурсия через lfilter)."""
+    if x.size == 0:
+        return x.astype(np.float64)
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * prev])
+    return y
+
+
+def _rolling_mean(ext: np.ndarray, window: int, start: int) -> np.ndarray:
+    """
+    Скользящее среднее для ext[start:] через cumsum (значения центрируются
+    на ext[0], чтобы не копить большие суммы). Неполные окна — NaN.
+    """
+    ref = ext[0] if ext.size else 0.0
+    cs = np.concatenate(([0.0], np.cumsum(ext - ref)))
+    pos = np.arange(start, ext.size)
+    out = np.full(pos.size, np.nan)
+    ok = pos >= window - 1
+    p = pos[ok]
+    out[ok] = (cs[p + 1] - cs[p + 1 - window]) / window + ref
+    return out
+
+
+def _rolling_std(ext: np.ndarray, window: int, start: int) -> np.ndarray:
+    """Скользящее std (ddof=0) для ext[start:]: окна считаются блоками, без больших временных массивов."""
+    out = np.full(ext.size - start, np.nan)
+    first = max(start, window - 1)
+    if first >= ext.size:
+        return out
+    views = sliding_window_view(ext, window)     # строка j — окно, оканчивающееся на j + window - 1
+    for lo in range(first, ext.size, _STD_BLOCK):
+        hi = min(lo + _STD_BLOCK, ext.size)
+        out[lo - start:hi - start] = views[lo - window + 1:hi - window + 1].std(axis=1)
+    return out
+
+
+# ---------- 2. Движок ----------
+
+class IndicatorEngine:
+    """
+    Инкрементальный расчёт индикаторов из INDICATOR_COLUMNS.
+
+    update(df) возвращает индикаторы только для переданных свечей и
+    запоминает состояние (последние EMA, средние RSI, хвост цен/объёмов),
+    поэтому следующая порция считается без пересчёта истории:
+
+        engine = IndicatorEngine()
+        ind = engine.update(history)       # вся история за один проход
+        ind_new = engine.update(new_bars)  # O(len(new_bars))
+
+    Порции должны идти по времени без пересечений. Пропуски цены и объёма
+    заполняются предыдущим значением.
+    EMA/MACD инициализируются первой ценой (как ewm(adjust=False)),
+    RSI — по Уайлдеру: SMA первых 14 изменений, далее сглаживание 1/14.
+    """
+
+    def __init__(self, price_col: str = "Close", volume_col: str = "Volume"):
+        self.price_col = price_col
+        self.volume_col = volume_col
+
+        self.count = 0                       # обработано свечей (с валидной ценой)
+        self.prev_close = np.nan
+        self.ema: Dict[int, float] = {}      # span -> последнее значение
+        self.macd_signal = np.nan
+        self.rsi_changes = 0                 # сколько изменений цены учтено
+        self.rsi_seed = np.zeros(2)          # суммы gain/loss до инициализации RSI
+        self.avg_gain = np.nan
+        self.avg_loss = np.nan
+        self.tail_close = np.empty(0)
+        self.tail_volume = np.empty(0)
+        self.last_volume = np.nan
+
+    # ---------- публичный API ----------
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        out = pd.DataFrame(np.nan, index=df.index, columns=INDICATOR_COLUMNS)
+        has_volume = self.volume_col in df.columns
+        if not has_volume:
+            out = out.drop(columns="Vol_MA_20")
+        if df.empty:
+            return out
+
+        close = df[self.price_col].to_numpy(dtype=np.float64)
+        close = self._fill_forward(close, self.prev_close)
+        skip = 0
+        if self.count == 0:
+            # ведущие NaN (до первой цены) пропускаются целиком
+            valid = ~np.isnan(close)
+            if not valid.any():
+                return out
+            skip = int(np.argmax(valid))
+            close = close[skip:]
+
+        values = self._price_indicators(close)
+        if has_volume:
+            volume = df[self.volume_col].to_numpy(dtype=np.float64)[skip:]
+            volume = np.nan_to_num(self._fill_forward(volume, self.last_volume), nan=0.0)
+            values["Vol_MA_20"] = self._volume_ma(volume)
+
+        self.count += close.size
+        block = np.column_stack([values[c] for c in out.columns])
+        out.iloc[skip:] = block
+        return out
+
+    @property
+    def last(self) -> Dict[str, float]:
+        """Последние значения EMA / RSI / MACD — для живого потока свечей."""
+        if self.count == 0:
+            return {}
+        rsi = self._rsi_value(self.avg_gain, self.avg_loss)
+        macd = self.ema[MACD_FAST] - self.ema[MACD_SLOW]
+        return {
+            "EMA_20": float(self.ema[EMA_SPAN]),
+            "RSI_14": float(rsi),
+            "MACD": float(macd) if self.count >= MACD_SLOW else np.nan,
+            "MACD_signal": float(self.macd_signal)
+            if self.count >= MACD_SLOW + MACD_SIGNAL - 1 else np.nan,
+        }
+
+    # ---------- внутренние шаги ----------
+
+    @staticmethod
+    def _fill_forward(x: np.ndarray, prev: float) -> np.ndarray:
+        mask = np.isnan(x)
+        if not mask.any():
+            return x
+        x = x.copy()
+        if np.isnan(x[0]):
+            x[0] = prev
+        idx = np.where(~np.isnan(x), np.arange(x.size), 0)
+        np.maximum.accumulate(idx, out=idx)
+        return x[idx]
+
+    @staticmethod
+    def _rsi_value(gain, loss):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100.0 - 100.0 / (1.0 + np.asarray(gain) / np.asarray(loss))
+        return np.where(np.asarray(loss) == 0.0, np.where(np.isnan(gain), np.nan, 100.0), rsi)
+
+    def _price_indicators(self, close: np.ndarray) -> Dict[str, np.ndarray]:
+        n = close.size
+        g0 = self.count
+        pos = g0 + np.arange(n)              # глобальные номера свечей
+        values: Dict[str, np.ndarray] = {}
+
+        # SMA / Bollinger по хвосту + новым ценам
+        ext = np.concatenate((self.tail_close, close))
+        start = self.tail_close.size
+        for w in SMA_WINDOWS:
+            values[f"SMA_{w}"] = _rolling_mean(ext, w, start)
+        mid = _rolling_mean(ext, BB_LENGTH, start)
+        std = _rolling_std(ext, BB_LENGTH, start)
+        values["BB_up"] = mid + BB_STD * std
+        values["BB_mid"] = mid
+        values["BB_low"] = mid - BB_STD * std
+        self.tail_close = ext[-_TAIL:].copy()
+
+        # EMA / MACD
+        seed = close[0]
+        ema = {}
+        for span in (EMA_SPAN, MACD_FAST, MACD_SLOW):
+            ema[span] = _ema_step(close, 2.0 / (span + 1), self.ema.get(span, seed))
+            self.ema[span] = float(ema[span][-1])
+        values["EMA_20"] = ema[EMA_SPAN]
+
+        macd = ema[MACD_FAST] - ema[MACD_SLOW]
+        prev_sig = self.macd_signal if g0 > 0 else macd[0]
+        signal = _ema_step(macd, 2.0 / (MACD_SIGNAL + 1), prev_sig)
+        self.macd_signal = float(signal[-1])
+        values["MACD"] = np.where(pos >= MACD_SLOW - 1, macd, np.nan)
+        values["MACD_signal"] = np.where(pos >= MACD_SLOW + MACD_SIGNAL - 2, signal, np.nan)
+
+        values["RSI_14"] = self._rsi(close)
+        self.prev_close = float(close[-1])
+        return values
+
+    def _rsi(self, close: np.ndarray) -> np.ndarray:
+        n = close.size
+        rsi = np.full(n, np.nan)
+        if self.count > 0:
+            diff = np.diff(close, prepend=self.prev_close)
+            offset = 0
+        else:
+            diff = np.diff(close)
+            offset = 1                       # у первой свечи изменения нет
+        if diff.size == 0:
+            return rsi
+
+        gain = np.maximum(diff, 0.0)
+        loss = np.maximum(-diff, 0.0)
+        alpha = 1.0 / RSI_LENGTH
+
+        start = 0
+        if self.rsi_changes < RSI_LENGTH:
+            need = RSI_LENGTH - self.rsi_changes
+            if diff.size < need:
+                self.rsi_seed += (gain.sum(), loss.sum())
+                self.rsi_changes += diff.size
+                return rsi
+            self.rsi_seed += (gain[:need].sum(), loss[:need].sum())
+            self.avg_gain, self.avg_loss = self.rsi_seed / RSI_LENGTH
+            rsi[offset + need - 1] = self._rsi_value(self.avg_gain, self.avg_loss)
+            start = need
+
+        if start < diff.size:
+            ag = _ema_step(gain[start:], alpha, self.avg_gain)
+            al = _ema_step(loss[start:], alpha, self.avg_loss)
+            rsi[offset + start:] = self._rsi_value(ag, al)
+            self.avg_gain, self.avg_loss = float(ag[-1]), float(al[-1])
+
+        self.rsi_changes += diff.size
+        return rsi
+
+    def _volume_ma(self, volume: np.ndarray) -> np.ndarray:
+        ext = np.concatenate((self.tail_volume, volume))
+        out = _rolling_mean(ext, VOL_MA_WINDOW, self.tail_volume.size)
+        self.tail_volume = ext[-(VOL_MA_WINDOW - 1):].copy()
+        self.last_volume = float(volume[-1])
+        return out
+
+
+# ---------- 3. Разовый расчёт ----------
+
+def compute_indicators(
+    df: pd.DataFrame,
+    price_col: str = "Close",
+    volume_col: str = "Volume",
+) -> pd.DataFrame:
+    """Все индикаторы по истории за один проход (без сохранения состояния)."""
+    return IndicatorEngine(price_col, volume_col).update(df)
+
+
+def wilder_rsi(close: np.ndarray, length: int = 14) -> np.ndarray:
+    """
+    RSI Уайлдера для произвольной длины (как RSI_14 движка):
+    SMA первых length изменений, далее сглаживание 1/length. Цены — без пропусков.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    rsi = np.full(close.size, np.nan)
+    diff = np.diff(close)
+    if diff.size < length:
+        return rsi
+    gain = np.maximum(diff, 0.0)
+    loss = np.maximum(-diff, 0.0)
+    alpha = 1.0 / length
+    ag = np.concatenate(([gain[:length].mean()], _ema_step(gain[length:], alpha, gain[:length].mean())))
+    al = np.concatenate(([loss[:length].mean()], _ema_step(loss[length:], alpha, loss[:length].mean())))
+    rsi[length:] = IndicatorEngine._rsi_value(ag, al)
+    return rsi
@@ -0,0 +1,206 @@
+# ==============================================
+# src/trading_ai/analytics/monte_carlo.py
+# Monte Carlo / bootstrap устойчивости стратегии:
+# - block bootstrap доходностей (сохраняет автокорреляцию внутри блока)
+# - перемешивание сделок / доходностей
+# Пути генерируются пачками по бюджету ячеек: пачка ~ budget_cells
+# чисел (строк = budget_cells // n_bars), память не растёт ни с
+# n_paths, ни с длиной истории.
+# ==============================================
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+MC_BUDGET_CELLS = 1_000_000   # float64 в одной пачке путей (~8 МБ на массив)
+
+
+# ---------- Базовые структуры ----------
+
+@dataclass
+class MonteCarloResult:
+    method: str
+    n_paths: int
+    confidence: float
+    final_returns_pct: np.ndarray   # итоговая доходность каждого пути
+    max_drawdowns_pct: np.ndarray   # максимальная просадка каждого пути
+
+    def _ci(self, values: np.ndarray) -> tuple:
+        a = (1.0 - self.confidence) / 2.0
+        lo, hi = np.quantile(values, [a, 1.0 - a])
+        return float(lo), float(hi)
+
+    @property
+    def return_ci(self) -> tuple:
+        return self._ci(self.final_returns_pct)
+
+    @property
+    def drawdown_ci(self) -> tuple:
+        return self._ci(self.max_drawdowns_pct)
+
+    @property
+    def prob_loss_pct(self) -> float:
+        return float((self.final_returns_pct < 0).mean() * 100.0)
+
+    def summary(self) -> pd.DataFrame:
+        """Квантили распределений доходности и просадки."""
+        q = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+        return pd.DataFrame(
+            {
+                "final_return_pct": np.quantile(self.final_returns_pct, q),
+                "max_drawdown_pct": np.quantile(self.max_drawdowns_pct, q),
+            },
+            index=pd.Index(q, name="quantile"),
+        )
+
+
+# ---------- 1. Генераторы путей ----------
+
+def chunk_rows(n_bars: int, budget_cells: int = MC_BUDGET_CELLS, chunk_size: Optional[int] = None) -> int:
+    """Путей в пачке: столько, чтобы пачка (paths × n_bars) укладывалась в budget_cells."""
+    rows = max(1, int(budget_cells) // max(int(n_bars), 1))
+    return min(rows, chunk_size) if chunk_size else rows
+
+
+def block_bootstrap_chunks(
+    returns: np.ndarray,
+    n_paths: int,
+    block_size: int = 20,
+    chunk_size: Optional[int] = None,
+    rng: Optional[np.random.Generator] = None,
+    budget_cells: int = MC_BUDGET_CELLS,
+) -> Iterator[np.ndarray]:
+    """
+    Циклический block bootstrap: каждый путь склеен из случайных блоков
+    длиной block_size исходного ряда. Отдаёт массивы (chunk, n_bars),
+    chunk — по бюджету ячеек (chunk_size — необязательный верхний предел).
+    """
+    rng = rng or np.random.default_rng()
+    rets = np.asarray(returns, dtype=np.float64)
+    n = rets.shape[0]
+    block_size = int(min(max(block_size, 1), n))
+    n_blocks = -(-n // block_size)
+    offsets = np.arange(block_size)
+    rows = chunk_rows(n_blocks * block_size, budget_cells, chunk_size)
+
+    done = 0
+    while done < n_paths:
+        m = min(rows, n_paths - done)
+        starts = rng.integers(0, n, size=(m, n_blocks))
+        idx = (starts[:, :, None] + offsets) % n
+        yield rets[idx.reshape(m, -1)[:, :n]]
+        done += m
+
+
+def shuffle_chunks(
+    returns: np.ndarray,
+    n_paths: int,
+    chunk_size: Optional[int] = None,
+    rng: Optional[np.random.Generator] = None,
+    budget_cells: int = MC_BUDGET_CELLS,
+) -> Iterator[np.ndarray]:
+    """
+    Перемешивание порядка доходностей (или результатов сделок).
+    Итоговая доходность не меняется, меняется путь — и значит просадка.
+    """
+    rng = rng or np.random.default_rng()
+    rets = np.asarray(returns, dtype=np.float64)
+    rows = chunk_rows(rets.shape[0], budget_cells, chunk_size)
+
+    done = 0
+    while done < n_paths:
+        m = min(rows, n_paths - done)
+        yield rng.permuted(np.broadcast_to(rets, (m, rets.shape[0])), axis=1)
+        done += m
+
+
+# ---------- 2. Основная функция ----------
+
+def _path_stats(chunk: np.ndarray) -> tuple:
+    # на месте: кроме самой пачки — ещё два массива её размера
+    equity = np.add(chunk, 1.0)
+    np.cumprod(equity, axis=1, out=equity)
+    peak = np.maximum(equity, 1.0)
+    np.maximum.accumulate(peak, axis=1, out=peak)
+    np.divide(equity, peak, out=peak)
+    max_dd = peak.min(axis=1) - 1.0
+    return (equity[:, -1] - 1.0) * 100.0, np.minimum(max_dd, 0.0) * 100.0
+
+
+def monte_carlo_returns(
+    returns,
+    n_paths: int = 10_000,
+    method: str = "block",
+    block_size: int = 20,
+    chunk_size: Optional[int] = None,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+    budget_cells: int = MC_BUDGET_CELLS,
+) -> MonteCarloResult:
+    """
+    returns — доходности стратегии по барам (или по сделкам для method="shuffle").
+    method:
+      - "block"   — block bootstrap (с возвращением)
+      - "shuffle" — перестановка без возвращения
+    Хранятся только итоговые метрики путей (2 × n_paths чисел);
+    пачка путей — не больше budget_cells чисел при любой длине истории.
+    """
+    rets = np.asarray(pd.Series(returns).dropna(), dtype=np.float64)
+    if rets.size == 0:
+        raise ValueError("No returns to resample.")
+
+    rng = np.random.default_rng(seed)
+    if method == "block":
+        chunks = block_bootstrap_chunks(rets, n_paths, block_size, chunk_size, rng, budget_cells)
+    elif method == "shuffle":
+        chunks = shuffle_chunks(rets, n_paths, chunk_size, rng, budget_cells)
+    else:
+        raise ValueError("method must be 'block' or 'shuffle'.")
+
+    finals: List[np.ndarray] = []
+    dds: List[np.ndarray] = []
+    for chunk in chunks:
+        f, d = _path_stats(chunk)
+        finals.append(f)
+        dds.append(d)
+
+    return MonteCarloResult(
+        method=method,
+        n_paths=n_paths,
+        confidence=confidence,
+        final_returns_pct=np.concatenate(finals),
+        max_drawdowns_pct=np.concatenate(dds),
+    )
+
+
+def monte_carlo_equity(equity_curve: pd.Series, **kwargs) -> MonteCarloResult:
+    """Обёртка: берёт equity curve (например, BacktestResult.equity_curve)."""
+    return monte_carlo_returns(equity_curve.pct_change().dropna(), **kwargs)
+
+
+# ---------- 3. Текстовое резюме ----------
+
+def summarize_monte_carlo(res: MonteCarloResult) -> str:
+    conf = res.confidence * 100
+    r_lo, r_hi = res.return_ci
+    d_lo, d_hi = res.drawdown_ci
+    lines = [f"🎲 Monte Carlo ({res.method}, {res.n_paths} paths)"]
+    lines.append(f"- Median return: {np.median(res.final_returns_pct):.2f}%")
+    lines.append(f"- Return {conf:.0f}% CI: [{r_lo:.2f}%, {r_hi:.2f}%]")
+    lines.append(f"- Median max drawdown: {np.median(res.max_drawdowns_pct):.2f}%")
+    lines.append(f"- Max drawdown {conf:.0f}% CI: [{d_lo:.2f}%, {d_hi:.2f}%]")
+    lines.append(f"- Probability of loss: {res.prob_loss_pct:.1f}%")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    dates = pd.date_range("2024-01-01", periods=2000, freq="h")
+    equity = pd.Series(100_000 * np.cumprod(1 + np.random.randn(len(dates)) * 0.002 + 0.0001), index=dates)
+
+    res = monte_carlo_equity(equity, n_paths=10_000, seed=42)
+    print(summarize_monte_carlo(res))
+    print(res.summary())
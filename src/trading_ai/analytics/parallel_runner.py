@@ -0,0 +1,180 @@
+# ==============================================
+# src/trading_ai/analytics/parallel_runner.py
+# Параллельное сравнение стратегий:
+# strategy × symbol × timeframe → ProcessPoolExecutor
+# - цены лежат в одном блоке shared memory (без pickling на каждую задачу)
+# - каждый бэктест считается один раз, результат переиспользуется
+#   для CSV / HTML / history / PNG
+# ==============================================
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.trading_ai.analytics.sweep import rolling_mean_matrix, sweep_core
+
+SeriesKey = Tuple[str, str]                      # (symbol, timeframe)
+SignalFn = Callable[[np.ndarray], np.ndarray]    # цены → сигналы (+1 / 0 / -1)
+
+
+# ---------- Базовые структуры ----------
+
+@dataclass
+class ComparisonResult:
+    summary: pd.DataFrame                          # Strategy, Symbol, Timeframe, метрики
+    equity: Dict[Tuple[str, str, str], pd.Series]  # (strategy, symbol, tf) → equity curve
+
+
+# ---------- 1. Стандартные сигналы (picklable, для воркеров) ----------
+
+def ma_above_signal(prices: np.ndarray, window: int) -> np.ndarray:
+    """Сигнал 1, если цена выше SMA(window), иначе 0."""
+    mean = rolling_mean_matrix(prices, [window])[:, 0]
+    with np.errstate(invalid="ignore"):
+        return (prices > mean).astype(np.int8)
+
+
+def ma_strategies(windows) -> Dict[str, SignalFn]:
+    """Набор стратегий «цена выше SMA» для списка окон."""
+    return {f"MA_{w}": partial(ma_above_signal, window=w) for w in windows}
+
+
+# ---------- 2. Общая память для ценовых рядов ----------
+
+class SharedPriceArrays:
+    """
+    Все ценовые ряды подряд в одном сегменте shared memory.
+    layout: {(symbol, tf): (offset, length)} — маленький и picklable,
+    воркеры по нему находят свой срез без копирования.
+    """
+
+    def __init__(self, arrays: Dict[SeriesKey, np.ndarray]):
+        self.layout: Dict[SeriesKey, Tuple[int, int]] = {}
+        total = sum(len(a) for a in arrays.values())
+        self.shm = shared_memory.SharedMemory(create=True, size=max(total, 1) * 8)
+        buf = np.ndarray((total,), dtype=np.float64, buffer=self.shm.buf)
+
+        offset = 0
+        for key, arr in arrays.items():
+            n = len(arr)
+            buf[offset:offset + n] = arr
+            self.layout[key] = (offset, n)
+            offset += n
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self) -> "SharedPriceArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# Состояние воркера: подключённый сегмент и его layout
+_WORKER_SHM: Optional[shared_memory.SharedMemory] = None
+_WORKER_LAYOUT: Dict[SeriesKey, Tuple[int, int]] = {}
+
+
+def _init_worker(shm_name: str, layout: Dict[SeriesKey, Tuple[int, int]]) -> None:
+    global _WORKER_SHM, _WORKER_LAYOUT
+    _WORKER_SHM = shared_memory.SharedMemory(name=shm_name)
+    _WORKER_LAYOUT = layout
+
+
+def _worker_prices(key: SeriesKey) -> np.ndarray:
+    offset, n = _WORKER_LAYOUT[key]
+    full = np.ndarray((_WORKER_SHM.size // 8,), dtype=np.float64, buffer=_WORKER_SHM.buf)
+    return full[offset:offset + n]
+
+
+def _run_task(
+    key: SeriesKey,
+    strategies: List[Tuple[str, SignalFn]],
+    initial_balance: float,
+    fee_per_trade: float,
+    periods_per_year: int,
+) -> List[dict]:
+    """Одна задача = один ряд × пачка стратегий, один проход sweep_core."""
+    prices = _worker_prices(key)
+    signals = np.column_stack([fn(prices) for _, fn in strategies])
+    core = sweep_core(prices, signals, initial_balance, fee_per_trade, periods_per_year)
+
+    out = []
+    for j, (name, _) in enumerate(strategies):
+        out.append({
+            "Strategy": name,
+            "Symbol": key[0],
+            "Timeframe": key[1],
+            "Total Return %": round(float(core["total_return_pct"][j]), 2),
+            "Max Drawdown %": round(float(core["max_drawdown_pct"][j]), 2),
+            "Final Balance": round(float(core["final_balance"][j]), 2),
+            "Sharpe": round(float(core["sharpe"][j]), 2),
+            "equity": core["equity"][:, j].copy(),
+        })
+    return out
+
+
+# ---------- 3. Запуск ----------
+
+def run_parallel_comparison(
+    prices: Dict[SeriesKey, pd.Series],
+    strategies: Dict[str, SignalFn],
+    max_workers: Optional[int] = None,
+    strategies_per_task: int = 16,
+    initial_balance: float = 100_000.0,
+    fee_per_trade: float = 0.0,
+    periods_per_year: int = 252,
+) -> ComparisonResult:
+    """
+    Прогоняет все стратегии по всем рядам {(symbol, tf): Series цен}.
+    Стратегии внутри ряда режутся на пачки по strategies_per_task —
+    каждая пачка считается одним векторизованным проходом в воркере.
+
+    Функции сигналов должны быть picklable (функции модуля / functools.partial).
+    """
+    clean = {key: s.dropna() for key, s in prices.items()}
+    arrays = {key: s.to_numpy(dtype=np.float64) for key, s in clean.items()}
+
+    items = list(strategies.items())
+    step = max(int(strategies_per_task), 1)
+    tasks = [
+        (key, items[i:i + step])
+        for key in arrays
+        for i in range(0, len(items), step)
+    ]
+
+    rows: List[dict] = []
+    with SharedPriceArrays(arrays) as shared:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(shared.name, shared.layout),
+        ) as pool:
+            futures = [
+                pool.submit(_run_task, key, batch, initial_balance, fee_per_trade, periods_per_year)
+                for key, batch in tasks
+            ]
+            for fut in futures:
+                rows.extend(fut.result())
+
+    equity: Dict[Tuple[str, str, str], pd.Series] = {}
+    for row in rows:
+        key = (row["Symbol"], row["Timeframe"])
+        curve = row.pop("equity")
+        equity[(row["Strategy"], *key)] = pd.Series(curve, index=clean[key].index)
+
+    summary = pd.DataFrame(rows)
+    return ComparisonResult(summary=summary, equity=equity)
@@ -0,0 +1,192 @@
+# ==============================================
+# src/trading_ai/analytics/portfolio.py
+# Векторизованный портфельный бэктест по нескольким активам:
+# - матрицы цен и целевых весов (T × N)
+# - ребалансировка, комиссии по активам, кэш
+# - equity портфеля, вклад каждого актива, оборот
+# Стоимость O(T × N): добавление символов масштабируется линейно.
+# ==============================================
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+FeeSpec = Union[float, Dict[str, float], pd.Series]
+
+
+# ---------- Базовые структуры ----------
+
+@dataclass
+class PortfolioResult:
+    initial_capital: float
+    final_balance: float
+    total_return_pct: float
+    max_drawdown_pct: float
+    equity_curve: pd.Series
+    weights: pd.DataFrame        # фактические (дрейфующие) веса после каждой свечи
+    pnl: pd.DataFrame            # PnL каждого актива по свечам (до комиссий)
+    contribution: pd.DataFrame   # по активу: pnl, fees, net, contribution_pct
+    turnover: pd.Series          # sum |Δw| на каждой ребалансировке
+    fees: pd.Series              # комиссии на каждой ребалансировке
+
+
+# ---------- 1. Веса ----------
+
+def rebalance_weights(
+    target: Union[Dict[str, float], pd.Series],
+    index: pd.DatetimeIndex,
+    freq: str = "W",
+) -> pd.DataFrame:
+    """
+    Постоянные целевые веса с ребалансировкой на первой свече каждого
+    периода freq ("D", "W", "M", ...). Остальные строки — NaN (без сделок).
+    """
+    target = pd.Series(target, dtype=np.float64)
+    periods = index.tz_localize(None).to_period(freq) if index.tz is not None else index.to_period(freq)
+    codes = np.asarray(periods.asi8)
+    first = np.ones(len(index), dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+
+    w = np.full((len(index), target.size), np.nan)
+    w[first] = target.to_numpy()
+    return pd.DataFrame(w, index=index, columns=target.index)
+
+
+def equal_weights(prices: pd.DataFrame, freq: str = "W", gross: float = 1.0) -> pd.DataFrame:
+    """Равные веса по всем колонкам prices (gross — суммарная доля капитала в рынке)."""
+    n = prices.shape[1]
+    return rebalance_weights(pd.Series(gross / n, index=prices.columns), prices.index, freq)
+
+
+def _fee_vector(fees: FeeSpec, columns: pd.Index) -> np.ndarray:
+    if isinstance(fees, (int, float)):
+        return np.full(len(columns), float(fees))
+    return pd.Series(fees, dtype=np.float64).reindex(columns).fillna(0.0).to_numpy()
+
+
+# ---------- 2. Бэктест ----------
+
+def portfolio_backtest(
+    prices: pd.DataFrame,
+    weights: pd.DataFrame,
+    fees: FeeSpec = 0.0,
+    initial_capital: float = 100_000.0,
+) -> PortfolioResult:
+    """
+    prices  — цены (T × N), выровненные по времени; пропуски заполняются вперёд.
+    weights — целевые веса той же формы. Строка с хотя бы одним не-NaN —
+              ребалансировка по close этой свечи (NaN в ней = вес 0);
+              полностью NaN-строка — держим позиции, веса дрейфуют.
+              1 - sum(w) остаётся в кэше (без процента), sum(w) > 1 — плечо.
+    fees    — доля от оборота по активу (0.0002 = 2 б.п.), число или {актив: ставка}.
+
+    Между ребалансировками стоимость считается через отношение цены к цене
+    на последней ребалансировке, а капитал на ребалансировках — через
+    cumprod по K ребалансировкам. Циклов по барам нет.
+    """
+    prices = prices.sort_index().ffill().dropna(how="any")
+    weights = weights.reindex(index=prices.index, columns=prices.columns)
+
+    P = prices.to_numpy(dtype=np.float64)
+    T, N = P.shape
+    fee = _fee_vector(fees, prices.columns)
+
+    is_reb = weights.notna().any(axis=1).to_numpy()
+    R = np.flatnonzero(is_reb)
+    if R.size == 0:
+        raise ValueError("weights must contain at least one rebalance row.")
+    Wk = weights.to_numpy(dtype=np.float64)[R]
+    Wk = np.nan_to_num(Wk, nan=0.0)
+    cash_k = 1.0 - Wk.sum(axis=1)
+    K = R.size
+
+    # Дрейф весов к моменту следующей ребалансировки
+    rel_end = P[R[1:]] / P[R[:-1]]                                   # (K-1, N)
+    g_end = (Wk[:-1] * rel_end).sum(axis=1) + cash_k[:-1]            # рост капитала за сегмент
+    drift = np.zeros((K, N))                                         # до первой ребалансировки — всё в кэше
+    drift[1:] = Wk[:-1] * rel_end / g_end[:, None]
+
+    trade = np.abs(Wk - drift)                                       # (K, N)
+    turnover = trade.sum(axis=1)
+    fee_factor = 1.0 - (trade * fee).sum(axis=1)
+
+    growth = np.ones(K)
+    growth[1:] = g_end
+    v_post = initial_capital * np.cumprod(growth * fee_factor)       # капитал после сделок
+    v_pre = v_post / fee_factor
+
+    # Стоимость по каждой свече
+    seg = np.searchsorted(R, np.arange(T), side="right") - 1         # -1 до первой ребалансировки
+    active = seg >= 0
+    seg_c = np.maximum(seg, 0)
+    rel = P / P[R[seg_c]]                                            # (T, N)
+    holdings = v_post[seg_c, None] * Wk[seg_c] * rel                 # стоимость позиций
+    cash = v_post[seg_c] * cash_k[seg_c]
+    holdings[~active] = 0.0
+    cash[~active] = initial_capital
+
+    equity = holdings.sum(axis=1) + cash
+
+    # PnL по активам: позиция прошлой свечи × изменение цены
+    pnl = np.zeros((T, N))
+    pnl[1:] = holdings[:-1] * (P[1:] / P[:-1] - 1.0)
+    fee_cash = v_pre[:, None] * trade * fee                          # (K, N)
+
+    index = prices.index
+    columns = prices.columns
+    equity_s = pd.Series(equity, index=index, name="equity")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        actual_w = holdings / equity[:, None]
+
+    pnl_total = pnl.sum(axis=0)
+    fee_total = fee_cash.sum(axis=0)
+    net = pnl_total - fee_total
+    contribution = pd.DataFrame({
+        "pnl": pnl_total,
+        "fees": fee_total,
+        "net": net,
+        "contribution_pct": net / initial_capital * 100.0,
+    }, index=columns)
+
+    drawdown = equity_s / equity_s.cummax() - 1.0
+    final = float(equity[-1])
+    return PortfolioResult(
+        initial_capital=initial_capital,
+        final_balance=round(final, 2),
+        total_return_pct=round((final / initial_capital - 1.0) * 100.0, 2),
+        max_drawdown_pct=round(float(drawdown.min() * 100.0), 2),
+        equity_curve=equity_s,
+        weights=pd.DataFrame(actual_w, index=index, columns=columns),
+        pnl=pd.DataFrame(pnl, index=index, columns=columns),
+        contribution=contribution,
+        turnover=pd.Series(turnover, index=index[R], name="turnover"),
+        fees=pd.Series(fee_cash.sum(axis=1), index=index[R], name="fees"),
+    )
+
+
+# ---------- 3. Текстовое резюме ----------
+
+def summarize_portfolio(name: str, res: PortfolioResult, top: int = 5) -> str:
+    lines = [f"💼 Portfolio backtest: {name}"]
+    lines.append(f"- Final balance: {res.final_balance:.2f}")
+    lines.append(f"- Total return: {res.total_return_pct:.2f}%")
+    lines.append(f"- Max drawdown: {res.max_drawdown_pct:.2f}%")
+    lines.append(f"- Rebalances: {len(res.turnover)}, avg turnover: {res.turnover.mean() * 100:.1f}%")
+    lines.append(f"- Total fees: {res.fees.sum():.2f}")
+
+    contrib = res.contribution.sort_values("net", ascending=False)
+    lines.append("- Top contributors:")
+    for sym, row in contrib.head(top).iterrows():
+        lines.append(f"    {sym}: {row['contribution_pct']:+.2f}%")
+    if len(contrib) > top:
+        lines.append("- Worst contributors:")
+        for sym, row in contrib.tail(top).iloc[::-1].iterrows():
+            lines.append(f"    {sym}: {row['contribution_pct']:+.2f}%")
+
+    last_w = res.weights.iloc[-1].sort_values(ascending=False)
+    lines.append(f"- Current gross exposure: {last_w.abs().sum() * 100:.1f}%")
+    return "\n".join(lines)
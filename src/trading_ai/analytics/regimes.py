@@ -0,0 +1,179 @@
+# ==============================================
+# src/trading_ai/analytics/regimes.py
+# Сканер режимов волатильности:
+# - сетка пар окон (recent, past) × все символы сразу
+# - F-тест отношения дисперсий и Levene-подобный тест по |r|
+# - кумулятивные суммы r, r², |r|: каждая пара окон — O(1)
+# - метка режима по символу: expansion / contraction / mixed / stable
+# ==============================================
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+WindowPair = Tuple[int, int]
+DEFAULT_WINDOW_PAIRS: Tuple[WindowPair, ...] = ((10, 50), (20, 100), (20, 250), (50, 250))
+
+REGIME_EXPANSION = "expansion"
+REGIME_CONTRACTION = "contraction"
+REGIME_MIXED = "mixed"
+REGIME_STABLE = "stable"
+REGIME_UNKNOWN = "n/a"
+
+
+@dataclass
+class RegimeScan:
+    table: pd.DataFrame    # строка = (symbol, recent, past): var_ratio, f_pvalue, levene_w, levene_pvalue
+    labels: pd.Series      # symbol -> метка режима
+    score: pd.Series       # symbol -> медиана log2(var_ratio) по значимым и незначимым парам
+
+
+# ---------- 1. Подготовка доходностей ----------
+
+def _returns_matrix(prices: Union[pd.DataFrame, Mapping[str, pd.Series]]) -> pd.DataFrame:
+    """
+    Доходности по каждому символу отдельно (свои пропуски / сессии),
+    выровненные по последнему наблюдению: строка -1 = последняя доходность.
+    """
+    if isinstance(prices, pd.DataFrame):
+        prices = {c: prices[c] for c in prices.columns}
+    cols = {k: s.dropna().pct_change().dropna().to_numpy(dtype=np.float64) for k, s in prices.items()}
+    length = max((v.size for v in cols.values()), default=0)
+    out = np.full((length, len(cols)), np.nan)
+    for j, v in enumerate(cols.values()):
+        if v.size:
+            out[length - v.size:, j] = v
+    return pd.DataFrame(out, columns=list(cols.keys()))
+
+
+def _window_sums(cs: np.ndarray, end: int, n: int) -> np.ndarray:
+    """Сумма по строкам [end - n, end) для всех символов: две выборки из кумулятивной суммы."""
+    return cs[end] - cs[end - n]
+
+
+# ---------- 2. Сканер ----------
+
+def scan_volatility_regimes(
+    prices: Union[pd.DataFrame, Mapping[str, pd.Series]],
+    window_pairs: Sequence[WindowPair] = DEFAULT_WINDOW_PAIRS,
+    alpha: float = 0.05,
+) -> RegimeScan:
+    """
+    Для каждой пары (recent, past) сравниваются последние recent доходностей
+    и past доходностей непосредственно перед ними:
+
+    - var_ratio = var(recent) / var(past), F-тест (двусторонний)
+    - levene_w  — однофакторный ANOVA по |r| (Levene с центром в 0:
+      у доходностей среднее ≈ 0, а |r|² = r², поэтому хватает сумм)
+
+    Кумулятивные суммы r, r², |r| считаются один раз; дальше каждая пара
+    окон — несколько вычитаний по всем символам сразу.
+    Символ без достаточной истории для пары получает NaN.
+    """
+    rets = _returns_matrix(prices)
+    symbols = list(rets.columns)
+    r = rets.to_numpy()
+    length = r.shape[0]
+
+    valid = ~np.isnan(r)
+    r0 = np.where(valid, r, 0.0)
+    zero = np.zeros((1, r.shape[1]))
+    cs_n = np.vstack((zero, np.cumsum(valid, axis=0)))
+    cs_1 = np.vstack((zero, np.cumsum(r0, axis=0)))
+    cs_2 = np.vstack((zero, np.cumsum(r0 * r0, axis=0)))
+    cs_a = np.vstack((zero, np.cumsum(np.abs(r0), axis=0)))
+
+    rows = []
+    for recent, past in window_pairs:
+        total = recent + past
+        if total > length:
+            block = np.full((4, len(symbols)), np.nan)
+        else:
+            block = _pair_stats(cs_n, cs_1, cs_2, cs_a, length, recent, past)
+        for j, sym in enumerate(symbols):
+            rows.append((sym, recent, past, *block[:, j]))
+
+    table = pd.DataFrame(
+        rows, columns=["symbol", "recent", "past", "var_ratio", "f_pvalue", "levene_w", "levene_pvalue"],
+    ).set_index(["symbol", "recent", "past"])
+
+    labels, score = _label_regimes(table, symbols, alpha)
+    return RegimeScan(table=table, labels=labels, score=score)
+
+
+def _pair_stats(cs_n, cs_1, cs_2, cs_a, end: int, recent: int, past: int) -> np.ndarray:
+    """Статистики одной пары окон для всех символов: (var_ratio, f_p, levene_w, levene_p) × N."""
+    mid = end - recent
+    n1 = _window_sums(cs_n, end, recent)
+    n2 = _window_sums(cs_n, mid, past)
+    s1, s2 = _window_sums(cs_1, end, recent), _window_sums(cs_1, mid, past)
+    q1, q2 = _window_sums(cs_2, end, recent), _window_sums(cs_2, mid, past)
+    a1, a2 = _window_sums(cs_a, end, recent), _window_sums(cs_a, mid, past)
+
+    full = (n1 == recent) & (n2 == past)     # окна без пропусков (история символа достаточна)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var1 = (q1 - s1 * s1 / n1) / (n1 - 1)
+        var2 = (q2 - s2 * s2 / n2) / (n2 - 1)
+        ratio = var1 / var2
+        cdf = stats.f.cdf(ratio, n1 - 1, n2 - 1)
+        f_p = np.minimum(2.0 * np.minimum(cdf, 1.0 - cdf), 1.0)
+
+        # ANOVA по z = |r|: межгрупповая / внутригрупповая дисперсия
+        n = n1 + n2
+        z1, z2 = a1 / n1, a2 / n2
+        z = (a1 + a2) / n
+        between = n1 * (z1 - z) ** 2 + n2 * (z2 - z) ** 2
+        within = (q1 - n1 * z1 * z1) + (q2 - n2 * z2 * z2)
+        w = (n - 2) * between / within
+        lev_p = stats.f.sf(w, 1, n - 2)
+
+    out = np.vstack((ratio, f_p, w, lev_p))
+    out[:, ~full] = np.nan
+    return out
+
+
+def _label_regimes(table: pd.DataFrame, symbols: Sequence[str], alpha: float) -> Tuple[pd.Series, pd.Series]:
+    """
+    Метка по доле пар окон со значимым (levene_pvalue < alpha) сдвигом:
+    ≥ половины вверх — expansion, ≥ половины вниз — contraction,
+    значимые в обе стороны — mixed, иначе stable.
+    """
+    labels: Dict[str, str] = {}
+    score: Dict[str, float] = {}
+    for sym in symbols:
+        t = table.loc[sym].dropna()
+        if t.empty:
+            labels[sym] = REGIME_UNKNOWN
+            score[sym] = np.nan
+            continue
+        sig = t["levene_pvalue"] < alpha
+        up = (sig & (t["var_ratio"] > 1)).mean()
+        down = (sig & (t["var_ratio"] < 1)).mean()
+        if up >= 0.5:
+            labels[sym] = REGIME_EXPANSION
+        elif down >= 0.5:
+            labels[sym] = REGIME_CONTRACTION
+        elif up > 0 and down > 0:
+            labels[sym] = REGIME_MIXED
+        else:
+            labels[sym] = REGIME_STABLE
+        score[sym] = float(np.median(np.log2(t["var_ratio"])))
+    return pd.Series(labels, name="regime"), pd.Series(score, name="score")
+
+
+# ---------- 3. Текстовое резюме ----------
+
+def summarize_regimes(scan: RegimeScan) -> str:
+    lines = ["🌡️ Volatility regimes (recent vs past windows)"]
+    for sym, label in scan.labels.items():
+        score = scan.score[sym]
+        if label == REGIME_UNKNOWN:
+            lines.append(f"- {sym}: {label}")
+            continue
+        lines.append(f"- {sym}: {label} (median var ratio x{2 ** score:.2f})")
+    return "\n".join(lines)
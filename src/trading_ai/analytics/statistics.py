@@ -7,18 +7,16 @@
 from __future__ import annotations
 
 import os
+from collections import deque
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from scipy import stats
 
-# TA-индикаторы (по желанию). Нужно: pip install pandas-ta
-try:
-    import pandas_ta as ta
-except ImportError:
-    ta = None
+from .execution import ExecutionCostModel
+from .indicators import compute_indicators
 
 
 # ---------- Базовые структуры ----------
@@ -106,47 +104,153 @@ def calc_rolling_volatility(
     return rolling_std * np.sqrt(periods_per_year)
 
 
-# ---------- 2. Технические индикаторы ----------
+# ---------- 1b. Потоковые (online) версии: O(1) на новую свечу ----------
 
-def add_basic_indicators(
-    df: pd.DataFrame,
-    price_col: str = "Close",
-    volume_col: str = "Volume"
-) -> pd.DataFrame:
+class OnlineReturnStats:
     """
-    Добавляет базовые индикаторы: SMA, EMA, RSI, MACD, Bollinger Bands.
-    Требует pandas-ta. Если нет — просто возвращает df.
+    Потоковый аналог calc_return_stats: цены подаются по одной,
+    среднее и дисперсия доходностей — по Уэлфорду.
+    result() даёт те же числа, что calc_return_stats по всей истории.
     """
-    df = ensure_datetime_index(df)
-    df = df.copy()
 
-    if ta is None:
-        # Без pandas_ta просто вернём исходный df
-        return df
+    def __init__(self, periods_per_year: int = 252):
+        self.periods_per_year = periods_per_year
+        self.first_price: Optional[float] = None
+        self.last_price: Optional[float] = None
+        self.count = 0          # число доходностей
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, price: float) -> None:
+        price = float(price)
+        if not price > 0:          # NaN и неположительные цены — доходность не определена
+            return
+        if self.last_price is not None:
+            r = price / self.last_price - 1.0
+            self.count += 1
+            delta = r - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (r - self.mean)
+        else:
+            self.first_price = price
+        self.last_price = price
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else float("nan")
 
-    close = df[price_col]
+    def result(self) -> ReturnStats:
+        if self.count == 0:
+            return ReturnStats(0.0, 0.0, 0.0, 0.0)
 
-    df["SMA_50"] = close.rolling(50).mean()
-    df["SMA_200"] = close.rolling(200).mean()
+        total_return = (self.last_price / self.first_price - 1.0) * 100.0
+        annual_return = (1 + self.mean) ** self.periods_per_year - 1
+        annual_vol = np.sqrt(self.variance) * np.sqrt(self.periods_per_year)
+        sharpe = annual_return / annual_vol if annual_vol != 0 else 0.0
 
-    df["EMA_20"] = close.ewm(span=20, adjust=False).mean()
+        return ReturnStats(
+            total_return=round(total_return, 2),
+            annual_return=round(annual_return * 100.0, 2),
+            annual_vol=round(annual_vol * 100.0, 2),
+            sharpe=round(sharpe, 2),
+        )
 
-    df["RSI_14"] = ta.rsi(close, length=14)
-    macd_res = ta.macd(close, fast=12, slow=26, signal=9)
-    if macd_res is not None and not macd_res.empty:
-        df["MACD"] = macd_res.iloc[:, 0]
-        df["MACD_signal"] = macd_res.iloc[:, 1]
 
-    bb = ta.bbands(close, length=20, std=2)
-    if bb is not None and not bb.empty:
-        df["BB_up"] = bb.iloc[:, 0]
-        df["BB_mid"] = bb.iloc[:, 1]
-        df["BB_low"] = bb.iloc[:, 2]
+class RollingVolatility:
+    """
+    Потоковый аналог calc_rolling_volatility: дисперсия доходностей
+    в скользящем окне (добавление/удаление по Уэлфорду).
+    value — последнее значение годовой волатильности или None, пока окно не заполнено.
+    """
 
-    if volume_col in df.columns:
-        df["Vol_MA_20"] = df[volume_col].rolling(20).mean()
+    _RESYNC_EVERY = 10_000  # периодический точный пересчёт от накопления ошибок округления
+
+    def __init__(self, window: int = 14, periods_per_year: int = 252):
+        self.window = window
+        self.periods_per_year = periods_per_year
+        self._rets: Deque[float] = deque()
+        self._last_price: Optional[float] = None
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._since_resync = 0
+
+    def update(self, price: float) -> Optional[float]:
+        price = float(price)
+        if not price > 0:
+            return self.value
+        if self._last_price is not None:
+            self._push(price / self._last_price - 1.0)
+        self._last_price = price
+        return self.value
+
+    def _push(self, r: float) -> None:
+        self._rets.append(r)
+        n = len(self._rets)
+        delta = r - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (r - self._mean)
+
+        if n > self.window:
+            old = self._rets.popleft()
+            n -= 1
+            delta = old - self._mean
+            self._mean -= delta / n
+            self._m2 -= delta * (old - self._mean)
+            self._since_resync += 1
+            if self._since_resync >= self._RESYNC_EVERY:
+                arr = np.fromiter(self._rets, dtype=np.float64)
+                self._mean = float(arr.mean())
+                self._m2 = float(((arr - self._mean) ** 2).sum())
+                self._since_resync = 0
+
+    @property
+    def value(self) -> Optional[float]:
+        n = len(self._rets)
+        if n < self.window or n < 2:
+            return None
+        var = max(self._m2 / (n - 1), 0.0)
+        return float(np.sqrt(var) * np.sqrt(self.periods_per_year))
+
+
+class RunningDrawdown:
+    """Текущая и максимальная просадка по потоку значений (цены или equity)."""
+
+    def __init__(self):
+        self.peak: Optional[float] = None
+        self.drawdown = 0.0       # текущая, доля (<= 0)
+        self.max_drawdown = 0.0   # минимальная за всё время, доля (<= 0)
+
+    def update(self, value: float) -> float:
+        value = float(value)
+        if np.isnan(value):
+            return self.drawdown
+        if self.peak is None or value > self.peak:
+            self.peak = value
+        if self.peak <= 0:
+            return self.drawdown  # от неположительного пика просадка в долях не определена
+        self.drawdown = value / self.peak - 1.0
+        self.max_drawdown = min(self.max_drawdown, self.drawdown)
+        return self.drawdown
+
+    @property
+    def max_drawdown_pct(self) -> float:
+        return round(self.max_drawdown * 100.0, 2)
 
-    return df
+
+# ---------- 2. Технические индикаторы ----------
+
+def add_basic_indicators(
+    df: pd.DataFrame,
+    price_col: str = "Close",
+    volume_col: str = "Volume"
+) -> pd.DataFrame:
+    """
+    Добавляет базовые индикаторы: SMA, EMA, RSI, MACD, Bollinger Bands
+    (один проход IndicatorEngine; для потока свечей — сам IndicatorEngine).
+    """
+    df = ensure_datetime_index(df)
+    indicators = compute_indicators(df, price_col=price_col, volume_col=volume_col)
+    return df.assign(**{c: indicators[c] for c in indicators.columns})
 
 
 # ---------- 3. Аномалии объёма и волатильности ----------
@@ -201,6 +305,135 @@ def detect_volatility_shift(
     return float(t_stat), float(p_val)
 
 
+# ---------- 3b. Потоковые детекторы: одна свеча за раз, события ----------
+
+@dataclass
+class MarketEvent:
+    kind: str            # "volume_spike" / "volatility_shift"
+    symbol: str
+    timeframe: str
+    time: Any
+    value: float         # z-score объёма / отношение std (recent / past)
+    p_value: Optional[float] = None
+
+    def describe(self) -> str:
+        ts = self.time.strftime("%Y-%m-%d %H:%M") if hasattr(self.time, "strftime") else str(self.time)
+        head = f"{self.symbol} {self.timeframe} [{ts}]"
+        if self.kind == "volume_spike":
+            return f"{head} volume spike: z={self.value:.2f}"
+        direction = "up" if self.value > 1 else "down"
+        return f"{head} volatility shift {direction}: x{self.value:.2f} (p={self.p_value:.4f})"
+
+
+class VolumeSpikeDetector:
+    """
+    Потоковый аналог detect_volume_spikes: z-score объёма в окне из
+    window последних свечей (включая текущую), среднее/дисперсия — по Уэлфорду.
+    update() возвращает MarketEvent, если z > z_threshold.
+    """
+
+    _RESYNC_EVERY = 10_000
+
+    def __init__(self, symbol: str = "", timeframe: str = "", window: int = 30, z_threshold: float = 3.0):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.window = window
+        self.z_threshold = z_threshold
+        self._vols: Deque[float] = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._since_resync = 0
+        self.zscore: Optional[float] = None
+
+    def update(self, volume: float, time: Any = None) -> Optional[MarketEvent]:
+        v = float(volume)
+        if np.isnan(v):
+            return None
+
+        self._vols.append(v)
+        n = len(self._vols)
+        delta = v - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (v - self._mean)
+
+        if n > self.window:
+            old = self._vols.popleft()
+            n -= 1
+            delta = old - self._mean
+            self._mean -= delta / n
+            self._m2 -= delta * (old - self._mean)
+            self._since_resync += 1
+            if self._since_resync >= self._RESYNC_EVERY:
+                arr = np.fromiter(self._vols, dtype=np.float64)
+                self._mean = float(arr.mean())
+                self._m2 = float(((arr - self._mean) ** 2).sum())
+                self._since_resync = 0
+
+        if n < self.window:
+            self.zscore = None
+            return None
+        std = np.sqrt(max(self._m2 / (n - 1), 0.0))
+        self.zscore = (v - self._mean) / std if std > 0 else None
+        if self.zscore is not None and self.zscore > self.z_threshold:
+            return MarketEvent("volume_spike", self.symbol, self.timeframe, time, float(self.zscore))
+        return None
+
+
+class VolatilityShiftDetector:
+    """
+    Потоковый аналог detect_volatility_shift: критерий Левена между
+    recent_window последними доходностями и past_window доходностями перед ними
+    (соседние окна, а не начало истории). Состояние — O(recent + past).
+    Событие выдаётся при входе в режим p < alpha; следующее — только
+    после того, как p снова поднимется выше alpha.
+    """
+
+    def __init__(
+        self,
+        symbol: str = "",
+        timeframe: str = "",
+        recent_window: int = 20,
+        past_window: int = 100,
+        alpha: float = 0.05,
+    ):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.recent_window = recent_window
+        self.past_window = past_window
+        self.alpha = alpha
+        self._rets: Deque[float] = deque(maxlen=recent_window + past_window)
+        self._last_price: Optional[float] = None
+        self.shifted = False
+        self.p_value: Optional[float] = None
+
+    def update(self, price: float, time: Any = None) -> Optional[MarketEvent]:
+        price = float(price)
+        if not price > 0:
+            return None
+        if self._last_price is None:
+            self._last_price = price
+            return None
+        self._rets.append(price / self._last_price - 1.0)
+        self._last_price = price
+
+        if len(self._rets) < self._rets.maxlen:
+            return None
+        arr = np.fromiter(self._rets, dtype=np.float64)
+        past, recent = arr[:self.past_window], arr[self.past_window:]
+        _, p_val = stats.levene(recent, past)
+        self.p_value = float(p_val)
+
+        if self.p_value >= self.alpha or np.isnan(self.p_value):
+            self.shifted = False
+            return None
+        if self.shifted:
+            return None
+        self.shifted = True
+        past_std = past.std(ddof=1)
+        ratio = recent.std(ddof=1) / past_std if past_std > 0 else float("inf")
+        return MarketEvent("volatility_shift", self.symbol, self.timeframe, time, float(ratio), self.p_value)
+
+
 # ---------- 4. Корреляции и кросс-активы ----------
 
 def correlation_matrix_from_dict(
@@ -223,11 +456,14 @@ def simple_signal_backtest(
     price_col: str = "Close",
     initial_balance: float = 100_000.0,
     fee_per_trade: float = 0.0,
+    cost_model: Optional[ExecutionCostModel] = None,
 ) -> BacktestResult:
     """
     Простейший бэктест: сигнал в колонке signal_col:
       +1 = long, 0 = вне рынка, -1 = шорт (при желании).
     Предполагаем, что весь капитал вкладывается по сигналу.
+    cost_model — спред / проскальзывание / комиссия за лот на оборот позиции
+    (списываются на свече смены сигнала, как и fee_per_trade).
     """
     df = ensure_datetime_index(df)
     df = df.copy().dropna(subset=[price_col, signal_col])
@@ -246,6 +482,9 @@ def simple_signal_backtest(
         fee_ret = trades * (fee_per_trade / initial_balance) * -1.0
         strat_rets = strat_rets + fee_ret
 
+    if cost_model is not None:
+        strat_rets = strat_rets - cost_model.cost_returns(prices, signals)
+
     equity = (1 + strat_rets).cumprod() * initial_balance
 
     final_balance = float(equity.iloc[-1])
@@ -0,0 +1,330 @@
+# ==============================================
+# src/trading_ai/analytics/strategy_spec.py
+# Декларативные стратегии (dict / YAML) → векторный план вычислений:
+# - выражения вида "close > sma(close, 24) and rsi(close, 14) < 70"
+# - разбор через ast (только разрешённые узлы и функции)
+# - общий граф на пачку стратегий: одинаковые подвыражения
+#   (например, общая SMA) считаются один раз
+# - результат — матрица сигналов для sweep_signal_backtest
+# ==============================================
+
+from __future__ import annotations
+
+import ast
+import itertools
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.trading_ai.analytics.indicators import wilder_rsi
+from src.trading_ai.analytics.sweep import SweepResult, sweep_signal_backtest
+
+Node = Tuple[Any, ...]     # канонический ключ узла: (op, *аргументы)
+SpecInput = Union[str, os.PathLike, Mapping[str, Any]]
+
+SERIES_NAMES = ("open", "high", "low", "close", "volume")
+
+
+# ---------- 1. Функции языка ----------
+
+def _rolling(x: np.ndarray, n: int, how: str) -> np.ndarray:
+    return getattr(pd.Series(x).rolling(int(n)), how)().to_numpy()
+
+
+def _shift(x: np.ndarray, n: int) -> np.ndarray:
+    n = int(n)
+    out = np.full_like(x, np.nan)
+    if n == 0:
+        return x.copy()
+    if n > 0:
+        out[n:] = x[:-n]
+    else:
+        out[:n] = x[-n:]
+    return out
+
+
+# имя → (функция над numpy, число аргументов-рядов, число целых параметров)
+FUNCTIONS: Dict[str, Tuple[Callable[..., np.ndarray], int, int]] = {
+    "sma": (lambda x, n: _rolling(x, n, "mean"), 1, 1),
+    "std": (lambda x, n: _rolling(x, n, "std"), 1, 1),            # ddof=1, как pandas
+    "highest": (lambda x, n: _rolling(x, n, "max"), 1, 1),
+    "lowest": (lambda x, n: _rolling(x, n, "min"), 1, 1),
+    "ema": (lambda x, n: pd.Series(x).ewm(span=int(n), adjust=False).mean().to_numpy(), 1, 1),
+    "rsi": (lambda x, n: wilder_rsi(x, int(n)), 1, 1),
+    "shift": (_shift, 1, 1),
+    "pct_change": (lambda x, n: x / _shift(x, n) - 1.0, 1, 1),
+    "abs": (np.abs, 1, 0),
+}
+
+_BINARY = {
+    ast.Add: ("add", np.add, True),
+    ast.Sub: ("sub", np.subtract, False),
+    ast.Mult: ("mul", np.multiply, True),
+    ast.Div: ("div", np.divide, False),
+}
+_COMPARE = {
+    ast.Gt: ("gt", np.greater),
+    ast.GtE: ("ge", np.greater_equal),
+    ast.Lt: ("lt", np.less),
+    ast.LtE: ("le", np.less_equal),
+    ast.Eq: ("eq", np.equal),
+    ast.NotEq: ("ne", np.not_equal),
+}
+_OPS: Dict[str, Callable[..., np.ndarray]] = {
+    **{name: fn for name, fn, _ in _BINARY.values()},
+    **{name: fn for name, fn in _COMPARE.values()},
+    "and": np.logical_and,
+    "or": np.logical_or,
+    "not": np.logical_not,
+    "neg": np.negative,
+}
+_COMMUTATIVE = {"add", "mul", "and", "or", "eq", "ne"}
+
+
+# ---------- 2. Разбор спецификаций ----------
+
+def load_strategy_specs(spec: SpecInput) -> Dict[str, Dict[str, str]]:
+    """
+    Нормализует спецификацию в {имя: {"long": expr, "short": expr} | {"signal": expr}}.
+
+    Поддерживаемые формы (dict или YAML-файл, опционально под ключом "strategies"):
+        ma_24: "close > sma(close, 24)"
+        trend:
+          long: "close > sma(close, 50) and rsi(close, 14) < 70"
+          short: "close < sma(close, 50)"
+        ma_grid:
+          signal: "close > sma(close, {w})"
+          grid: {w: [12, 24, 48]}          # → ma_grid[w=12], ma_grid[w=24], ...
+    """
+    if isinstance(spec, (str, os.PathLike)):
+        with open(spec, "r", encoding="utf-8") as f:
+            spec = yaml.safe_load(f) or {}
+    spec = spec.get("strategies", spec)
+
+    out: Dict[str, Dict[str, str]] = {}
+    for name, body in spec.items():
+        if isinstance(body, str):
+            body = {"signal": body}
+        exprs = {k: str(v) for k, v in body.items() if k in ("signal", "long", "short")}
+        if not exprs:
+            raise ValueError(f"Strategy '{name}' has no signal/long/short expression.")
+        if "signal" in exprs and len(exprs) > 1:
+            raise ValueError(f"Strategy '{name}': use either 'signal' or 'long'/'short'.")
+
+        grid = body.get("grid")
+        if not grid:
+            out[str(name)] = exprs
+            continue
+        keys = list(grid.keys())
+        for values in itertools.product(*(grid[k] for k in keys)):
+            params = dict(zip(keys, values))
+            suffix = ",".join(f"{k}={v}" for k, v in params.items())
+            out[f"{name}[{suffix}]"] = {k: v.format(**params) for k, v in exprs.items()}
+    return out
+
+
+# ---------- 3. Компиляция в общий граф ----------
+
+@dataclass
+class StrategyPlan:
+    """
+    Граф вычислений на пачку стратегий.
+    nodes — узлы в топологическом порядке (аргументы раньше узла),
+    outputs — {стратегия: (узел long/signal, узел short или None)}.
+    """
+
+    nodes: List[Node] = field(default_factory=list)
+    outputs: Dict[str, Tuple[int, Optional[int]]] = field(default_factory=dict)
+    requested: int = 0                      # узлов без устранения общих подвыражений
+    _ids: Dict[Node, int] = field(default_factory=dict, repr=False)
+
+    def _add(self, node: Node) -> int:
+        self.requested += 1
+        if node not in self._ids:
+            self._ids[node] = len(self.nodes)
+            self.nodes.append(node)
+        return self._ids[node]
+
+    @property
+    def shared(self) -> int:
+        """Сколько вычислений сэкономлено за счёт общих подвыражений."""
+        return self.requested - len(self.nodes)
+
+    def evaluate(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Матрица сигналов (свечи × стратегии), int8: +1 / 0 / -1.
+        Выход не булева выражения (например, close - sma(close, 20)) берётся
+        по знаку: > 0 → 1, < 0 → -1 (прямой astype(int8) переполнялся бы).
+        Колонки data ищутся без учёта регистра (close → Close).
+        Промежуточные массивы освобождаются после последнего использования.
+        """
+        columns = {c.lower(): c for c in data.columns}
+        last_use = self._last_use()
+        values: Dict[int, Any] = {}
+        n = len(data)
+
+        for i, node in enumerate(self.nodes):
+            op, args = node[0], node[1:]
+            if op == "series":
+                if args[0] not in columns:
+                    raise KeyError(f"Column '{args[0]}' not found in data.")
+                values[i] = data[columns[args[0]]].to_numpy(dtype=np.float64)
+            elif op == "const":
+                values[i] = args[0]
+            elif op == "call":
+                fn, _, _ = FUNCTIONS[args[0]]
+                values[i] = fn(*(values[a] for a in args[1]), *args[2])
+            else:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    values[i] = _OPS[op](*(values[a] for a in args))
+            for a in self._children(node):
+                if last_use[a] == i:
+                    values.pop(a, None)
+
+        def as_int(idx: Optional[int]) -> np.ndarray:
+            if idx is None:
+                return np.zeros(n, dtype=np.int8)
+            v = np.broadcast_to(np.asarray(values[idx]), (n,))
+            v = np.nan_to_num(v.astype(np.float64), nan=0.0, posinf=1.0, neginf=-1.0)
+            return np.sign(v).astype(np.int8)
+
+        out = {}
+        for name, (long_idx, short_idx) in self.outputs.items():
+            out[name] = as_int(long_idx) - as_int(short_idx) if short_idx is not None else as_int(long_idx)
+        return pd.DataFrame(out, index=data.index)
+
+    @staticmethod
+    def _children(node: Node) -> List[int]:
+        op, args = node[0], node[1:]
+        if op in ("series", "const"):
+            return []
+        if op == "call":
+            return list(args[1])
+        return list(args)
+
+    def _last_use(self) -> Dict[int, int]:
+        last = {}
+        for i, node in enumerate(self.nodes):
+            for a in self._children(node):
+                last[a] = i
+        # выходы стратегий живут до конца
+        for long_idx, short_idx in self.outputs.values():
+            for idx in (long_idx, short_idx):
+                if idx is not None:
+                    last[idx] = len(self.nodes)
+        return last
+
+
+class _Compiler:
+    def __init__(self, plan: StrategyPlan):
+        self.plan = plan
+
+    def compile(self, expr: str) -> int:
+        try:
+            tree = ast.parse(expr, mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid strategy expression: {expr!r}") from e
+        return self._visit(tree.body, expr)
+
+    def _node(self, op: str, *args) -> int:
+        if op in _COMMUTATIVE:
+            args = tuple(sorted(args))
+        return self.plan._add((op, *args))
+
+    def _visit(self, n: ast.AST, expr: str) -> int:
+        if isinstance(n, ast.Name):
+            name = n.id.lower()
+            if name not in SERIES_NAMES:
+                raise ValueError(f"Unknown series '{n.id}' in {expr!r}")
+            return self.plan._add(("series", name))
+
+        if isinstance(n, ast.Constant) and isinstance(n.value, (int, float)) and not isinstance(n.value, bool):
+            return self.plan._add(("const", float(n.value)))
+
+        if isinstance(n, ast.BinOp) and type(n.op) in _BINARY:
+            op, _, _ = _BINARY[type(n.op)]
+            return self._node(op, self._visit(n.left, expr), self._visit(n.right, expr))
+
+        if isinstance(n, ast.UnaryOp):
+            if isinstance(n.op, ast.USub):
+                return self._node("neg", self._visit(n.operand, expr))
+            if isinstance(n.op, ast.Not):
+                return self._node("not", self._visit(n.operand, expr))
+
+        if isinstance(n, ast.BoolOp):
+            op = "and" if isinstance(n.op, ast.And) else "or"
+            ids = [self._visit(v, expr) for v in n.values]
+            acc = ids[0]
+            for nxt in ids[1:]:
+                acc = self._node(op, acc, nxt)
+            return acc
+
+        if isinstance(n, ast.Compare):
+            # a < b < c → (a < b) and (b < c)
+            parts = []
+            left = self._visit(n.left, expr)
+            for op_node, comp in zip(n.ops, n.comparators):
+                if type(op_node) not in _COMPARE:
+                    break
+                right = self._visit(comp, expr)
+                parts.append(self._node(_COMPARE[type(op_node)][0], left, right))
+                left = right
+            else:
+                acc = parts[0]
+                for nxt in parts[1:]:
+                    acc = self._node("and", acc, nxt)
+                return acc
+
+        if isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id.lower() in FUNCTIONS:
+            name = n.func.id.lower()
+            _, n_series, n_params = FUNCTIONS[name]
+            if len(n.args) != n_series + n_params or n.keywords:
+                raise ValueError(f"{name}() expects {n_series + n_params} positional arguments in {expr!r}")
+            series = tuple(self._visit(a, expr) for a in n.args[:n_series])
+            params = []
+            for a in n.args[n_series:]:
+                if not (isinstance(a, ast.Constant) and isinstance(a.value, (int, float))
+                        and not isinstance(a.value, bool)):
+                    raise ValueError(f"{name}() parameters must be numbers in {expr!r}")
+                if not float(a.value).is_integer():
+                    raise ValueError(f"{name}() parameters must be integers, got {a.value!r} in {expr!r}")
+                params.append(int(a.value))
+            return self.plan._add(("call", name, series, tuple(params)))
+
+        raise ValueError(f"Unsupported syntax {ast.dump(n)[:60]} in {expr!r}")
+
+
+def compile_strategies(spec: SpecInput) -> StrategyPlan:
+    """Компилирует все стратегии спецификации в один общий граф."""
+    specs = load_strategy_specs(spec)
+    plan = StrategyPlan()
+    compiler = _Compiler(plan)
+    for name, exprs in specs.items():
+        long_expr = exprs.get("signal", exprs.get("long"))
+        long_idx = compiler.compile(long_expr) if long_expr is not None else None
+        short_idx = compiler.compile(exprs["short"]) if "short" in exprs else None
+        if long_idx is None:
+            # только short: long-часть — константа 0
+            long_idx = plan._add(("const", 0.0))
+        plan.outputs[name] = (long_idx, short_idx)
+    return plan
+
+
+# ---------- 4. Бэктест пачки ----------
+
+def backtest_strategy_specs(
+    data: pd.DataFrame,
+    spec: SpecInput,
+    price_col: str = "Close",
+    initial_balance: float = 100_000.0,
+    fee_per_trade: float = 0.0,
+    periods_per_year: int = 252,
+) -> SweepResult:
+    """Компиляция → одна матрица сигналов → один проход sweep_signal_backtest."""
+    plan = compile_strategies(spec)
+    signals = plan.evaluate(data)
+    return sweep_signal_backtest(data[price_col], signals, initial_balance, fee_per_trade, periods_per_year)
@@ -0,0 +1,187 @@
+# ==============================================
+# src/trading_ai/analytics/sweep.py
+# Векторизованный перебор стратегий:
+# одна цена × матрица сигналов (n_bars × n_strategies)
+# → equity, доходность, просадка и Sharpe за один проход NumPy
+# ==============================================
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+
+# ---------- Базовые структуры ----------
+
+@dataclass
+class SweepResult:
+    summary: pd.DataFrame   # одна строка на стратегию (Strategy, Total Return %, ...)
+    equity: pd.DataFrame    # equity curves: индекс — время, колонки — стратегии
+
+
+# ---------- 1. Ядро на чистых массивах ----------
+
+def sweep_core(
+    prices: np.ndarray,
+    signals: np.ndarray,
+    initial_balance: float = 100_000.0,
+    fee_per_trade: float = 0.0,
+    periods_per_year: int = 252,
+) -> Dict[str, np.ndarray]:
+    """
+    Бэктест сразу всех колонок матрицы сигналов.
+    Логика та же, что в simple_signal_backtest:
+      - позиция = сигнал предыдущей свечи,
+      - комиссия списывается на каждой свече, где сигнал изменился
+        (включая первую свечу),
+      - весь капитал в позиции.
+
+    prices:  (n_bars,)
+    signals: (n_bars, n_strategies), NaN трактуется как 0 (вне рынка)
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    sig = np.asarray(signals, dtype=np.float64)
+    if sig.ndim == 1:
+        sig = sig[:, None]
+    if sig.shape[0] != prices.shape[0]:
+        raise ValueError("signals must have the same number of rows as prices.")
+    sig = np.nan_to_num(sig, nan=0.0)
+
+    n_bars, n_strat = sig.shape
+    if n_bars == 0:
+        raise ValueError("Empty price series.")
+
+    rets = np.zeros(n_bars, dtype=np.float64)
+    rets[1:] = prices[1:] / prices[:-1] - 1.0
+
+    # входим на следующей свече
+    strat_rets = np.empty_like(sig)
+    strat_rets[0] = 0.0
+    strat_rets[1:] = sig[:-1] * rets[1:, None]
+
+    if fee_per_trade > 0.0:
+        changes = np.empty(sig.shape, dtype=bool)
+        changes[0] = True
+        changes[1:] = sig[1:] != sig[:-1]
+        strat_rets -= changes * (fee_per_trade / initial_balance)
+
+    equity = np.cumprod(1.0 + strat_rets, axis=0)
+    equity *= initial_balance
+
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1.0
+    max_dd = drawdown.min(axis=0)
+
+    final = equity[-1]
+    total_ret = final / initial_balance - 1.0
+
+    # Sharpe считается так же, как в calc_return_stats (по доходностям equity)
+    body = strat_rets[1:]
+    if body.shape[0] > 1:
+        avg = body.mean(axis=0)
+        vol = body.std(axis=0, ddof=1)
+        annual_return = (1.0 + avg) ** periods_per_year - 1.0
+        annual_vol = vol * np.sqrt(periods_per_year)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sharpe = np.where(annual_vol != 0, annual_return / annual_vol, 0.0)
+    else:
+        sharpe = np.zeros(n_strat)
+
+    return {
+        "equity": equity,
+        "final_balance": final,
+        "total_return_pct": total_ret * 100.0,
+        "max_drawdown_pct": max_dd * 100.0,
+        "sharpe": sharpe,
+    }
+
+
+# ---------- 2. Обёртка над pandas ----------
+
+def sweep_signal_backtest(
+    prices: pd.Series,
+    signals: Union[pd.DataFrame, Dict[str, pd.Series]],
+    initial_balance: float = 100_000.0,
+    fee_per_trade: float = 0.0,
+    periods_per_year: int = 252,
+) -> SweepResult:
+    """
+    Бэктест матрицы сигналов против одной ценовой серии.
+    Возвращает tidy-таблицу результатов (по строке на стратегию)
+    и equity curves всех стратегий.
+    """
+    if isinstance(signals, dict):
+        signals = pd.DataFrame(signals)
+    signals = signals.reindex(prices.index)
+
+    mask = prices.notna().to_numpy()
+    px = prices.to_numpy(dtype=np.float64)[mask]
+    sig = signals.to_numpy(dtype=np.float64)[mask]
+    index = prices.index[mask]
+
+    core = sweep_core(px, sig, initial_balance, fee_per_trade, periods_per_year)
+
+    names = list(signals.columns)
+    summary = pd.DataFrame({
+        "Strategy": names,
+        "Total Return %": np.round(core["total_return_pct"], 2),
+        "Max Drawdown %": np.round(core["max_drawdown_pct"], 2),
+        "Final Balance": np.round(core["final_balance"], 2),
+        "Sharpe": np.round(core["sharpe"], 2),
+    })
+    equity = pd.DataFrame(core["equity"], index=index, columns=names)
+    return SweepResult(summary=summary, equity=equity)
+
+
+# ---------- 3. Генераторы матриц сигналов ----------
+
+def rolling_mean_matrix(prices: np.ndarray, windows: Sequence[int]) -> np.ndarray:
+    """
+    Скользящие средние для набора окон за один cumsum.
+    Возвращает (n_bars, len(windows)), NaN до заполнения окна.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    n = prices.shape[0]
+    csum = np.concatenate(([0.0], np.cumsum(prices)))
+    out = np.full((n, len(windows)), np.nan)
+    for j, w in enumerate(windows):
+        if w <= 0:
+            raise ValueError("Window must be positive.")
+        if w > n:
+            continue
+        out[w - 1:, j] = (csum[w:] - csum[:-w]) / w
+    return out
+
+
+def ma_signal_matrix(
+    prices: pd.Series,
+    windows: Iterable[int],
+    prefix: str = "MA_",
+) -> pd.DataFrame:
+    """
+    Сигналы «цена выше SMA(window)» для всех окон сразу:
+    аналог (Close > Close.rolling(w).mean()).astype(int).
+    """
+    windows = list(windows)
+    px = prices.to_numpy(dtype=np.float64)
+    means = rolling_mean_matrix(px, windows)
+    with np.errstate(invalid="ignore"):
+        sig = (px[:, None] > means).astype(np.int8)
+    return pd.DataFrame(sig, index=prices.index, columns=[f"{prefix}{w}" for w in windows])
+
+
+if __name__ == "__main__":
+    import time
+
+    dates = pd.date_range("2024-01-01", periods=5000, freq="h")
+    prices = pd.Series(np.cumsum(np.random.randn(len(dates))) + 1000, index=dates)
+
+    t0 = time.perf_counter()
+    signals = ma_signal_matrix(prices, range(5, 505, 5))
+    res = sweep_signal_backtest(prices, signals)
+    elapsed = time.perf_counter() - t0
+
+    print(res.summary.sort_values("Total Return %", ascending=False).head(10).to_string(index=False))
+    print(f"\n{signals.shape[1]} strategies in {elapsed:.3f}s")
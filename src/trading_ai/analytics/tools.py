@@ -13,6 +13,7 @@ from src.trading_ai.analytics.backtester import (
     full_backtest_report,
     analyze_time_patterns,
 )
+from src.trading_ai.analytics.strategy_spec import backtest_strategy_specs
 
 def analyze_asset_dataframe(df: pd.DataFrame) -> Dict[str, Any]:
     """
@@ -55,3 +56,12 @@ def compute_correlation_for_assets(data_dict: Dict[str, pd.DataFrame]) -> Any:
     Строит матрицу корреляций по нескольким активам.
     """
     return correlation_matrix_from_dict(data_dict)
+
+def backtest_strategy_specs_for_agent(df: pd.DataFrame, spec: Any, top: int = 20) -> str:
+    """
+    Бэктест пачки декларативных стратегий (dict / путь к YAML, см. config/strategies.yaml)
+    одним планом: общие подвыражения считаются один раз. Возвращает текстовую таблицу.
+    """
+    result = backtest_strategy_specs(df, spec)
+    table = result.summary.sort_values("Sharpe", ascending=False).head(top)
+    return table.to_string(index=False)
@@ -0,0 +1,146 @@
+# ==============================================
+# src/trading_ai/analytics/trade_ledger.py
+# Журнал сделок из колонки сигналов (без циклов по барам):
+# - точки смены позиции → отрезки → reduceat по отрезкам
+# - вход/выход, время удержания, PnL, MAE / MFE
+# ==============================================
+
+from __future__ import annotations
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from src.trading_ai.analytics.statistics import ensure_datetime_index
+
+LEDGER_COLUMNS = [
+    "entry_time", "exit_time", "direction", "size", "entry_price", "exit_price",
+    "bars_held", "holding_time", "pnl_pct", "mae_pct", "mfe_pct", "closed",
+]
+
+
+# ---------- 1. Построение журнала ----------
+
+def extract_trade_ledger(
+    df: pd.DataFrame,
+    signal_col: str,
+    price_col: str = "Close",
+    high_col: str = "High",
+    low_col: str = "Low",
+) -> pd.DataFrame:
+    """
+    Сделка = непрерывный отрезок одинаковой ненулевой позиции.
+    Позиция считается так же, как в simple_signal_backtest:
+    сигнал свечи t исполняется по close свечи t и держится с t+1.
+
+    - entry_price — close свечи сигнала, exit_price — close последней свечи удержания
+    - pnl_pct — сложная доходность позиции за отрезок (без комиссий)
+    - mae_pct / mfe_pct — худшее / лучшее отклонение от входа по low/high
+      внутри отрезка (если high/low нет — по close)
+    - closed = False — сделка ещё открыта на последней свече
+    """
+    df = ensure_datetime_index(df)
+    df = df.dropna(subset=[price_col, signal_col])
+
+    close = df[price_col].to_numpy(dtype=np.float64)
+    high = df[high_col].to_numpy(dtype=np.float64) if high_col in df.columns else close
+    low = df[low_col].to_numpy(dtype=np.float64) if low_col in df.columns else close
+    sig = df[signal_col].to_numpy(dtype=np.float64)
+    n = close.shape[0]
+
+    if n < 2:
+        return pd.DataFrame(columns=LEDGER_COLUMNS)
+
+    pos = np.empty(n)
+    pos[0] = 0.0
+    pos[1:] = sig[:-1]
+
+    rets = np.zeros(n)
+    rets[1:] = close[1:] / close[:-1] - 1.0
+    growth = np.cumprod(1.0 + pos * rets)
+
+    # границы отрезков постоянной позиции
+    starts = np.concatenate(([0], np.flatnonzero(pos[1:] != pos[:-1]) + 1))
+    ends = np.concatenate((starts[1:] - 1, [n - 1]))
+
+    hi_max = np.maximum.reduceat(high, starts)
+    lo_min = np.minimum.reduceat(low, starts)
+
+    sel = pos[starts] != 0
+    starts, ends = starts[sel], ends[sel]
+    hi_max, lo_min = hi_max[sel], lo_min[sel]
+
+    entry_bar = starts - 1          # pos[0] = 0, поэтому ненулевой отрезок начинается с >= 1
+    direction = np.sign(pos[starts]).astype(np.int8)
+    size = np.abs(pos[starts])
+    entry_price = close[entry_bar]
+    exit_price = close[ends]
+
+    up = (hi_max / entry_price - 1.0) * size
+    down = (lo_min / entry_price - 1.0) * size
+    is_long = direction > 0
+    mfe = np.where(is_long, up, -down)
+    mae = np.where(is_long, down, -up)
+
+    closed = ends < n - 1
+    if ends.size and not closed[-1]:
+        closed[-1] = sig[-1] != pos[-1]  # выход уже дан сигналом последней свечи
+
+    index = df.index
+    ledger = pd.DataFrame({
+        "entry_time": index[entry_bar],
+        "exit_time": index[ends],
+        "direction": direction,
+        "size": size,
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "bars_held": ends - entry_bar,
+        "holding_time": index[ends] - index[entry_bar],
+        "pnl_pct": (growth[ends] / growth[entry_bar] - 1.0) * 100.0,
+        "mae_pct": mae * 100.0,
+        "mfe_pct": mfe * 100.0,
+        "closed": closed,
+    })
+    return ledger
+
+
+# ---------- 2. Сводка по журналу ----------
+
+def trade_ledger_stats(ledger: pd.DataFrame) -> Dict[str, float]:
+    """Агрегаты по сделкам: количество, винрейт, средние PnL / MAE / MFE, profit factor."""
+    if ledger.empty:
+        return {
+            "trades": 0, "win_rate_pct": 0.0, "avg_pnl_pct": 0.0, "avg_win_pct": 0.0,
+            "avg_loss_pct": 0.0, "profit_factor": 0.0, "avg_bars_held": 0.0,
+            "avg_mae_pct": 0.0, "avg_mfe_pct": 0.0,
+        }
+
+    pnl = ledger["pnl_pct"].to_numpy()
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    gross_loss = -losses.sum()
+    return {
+        "trades": int(pnl.size),
+        "win_rate_pct": round(float((pnl > 0).mean() * 100.0), 1),
+        "avg_pnl_pct": round(float(pnl.mean()), 3),
+        "avg_win_pct": round(float(wins.mean()), 3) if wins.size else 0.0,
+        "avg_loss_pct": round(float(losses.mean()), 3) if losses.size else 0.0,
+        "profit_factor": round(float(wins.sum() / gross_loss), 2) if gross_loss > 0 else float("inf"),
+        "avg_bars_held": round(float(ledger["bars_held"].mean()), 1),
+        "avg_mae_pct": round(float(ledger["mae_pct"].mean()), 3),
+        "avg_mfe_pct": round(float(ledger["mfe_pct"].mean()), 3),
+    }
+
+
+def summarize_trade_ledger(ledger: pd.DataFrame) -> str:
+    st = trade_ledger_stats(ledger)
+    if st["trades"] == 0:
+        return "- No trades"
+
+    lines = [f"- Trades: {st['trades']} (win {st['win_rate_pct']:.1f}%)"]
+    lines.append(f"- Avg trade: {st['avg_pnl_pct']:.3f}% (win {st['avg_win_pct']:.3f}%, loss {st['avg_loss_pct']:.3f}%)")
+    lines.append(f"- Profit factor: {st['profit_factor']:.2f}")
+    lines.append(f"- Avg bars held: {st['avg_bars_held']:.1f}")
+    lines.append(f"- Avg MAE / MFE: {st['avg_mae_pct']:.3f}% / {st['avg_mfe_pct']:.3f}%")
+    return "\n".join(lines)
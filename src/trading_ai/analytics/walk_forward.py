@@ -0,0 +1,261 @@
+# ==============================================
+# src/trading_ai/analytics/walk_forward.py
+# Walk-forward оптимизация:
+# - окна train/test (anchored или rolling)
+# - подбор параметров на train (векторно, sweep_core)
+# - оценка на test через run_strategy_backtest
+# - окна считаются параллельно, индикаторы кэшируются
+# ==============================================
+
+from __future__ import annotations
+
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.trading_ai.analytics.backtester import run_strategy_backtest
+from src.trading_ai.analytics.statistics import ensure_datetime_index
+from src.trading_ai.analytics.sweep import rolling_mean_matrix, sweep_core
+
+
+# ---------- Базовые структуры ----------
+
+@dataclass
+class WalkForwardWindow:
+    train_start: int
+    train_end: int      # не включительно
+    test_start: int
+    test_end: int       # не включительно
+
+
+@dataclass
+class WalkForwardResult:
+    windows: pd.DataFrame   # по строке на окно: границы, лучшие параметры, IS/OOS метрики
+    oos_equity: pd.Series   # склеенная out-of-sample equity
+    oos_return_pct: float
+    oos_max_drawdown_pct: float
+
+
+# ---------- 1. Нарезка окон ----------
+
+def make_windows(
+    n_bars: int,
+    train_size: int,
+    test_size: int,
+    anchored: bool = False,
+    step: Optional[int] = None,
+) -> List[WalkForwardWindow]:
+    """
+    rolling:  train = [k*step, k*step + train_size), test — следующие test_size баров
+    anchored: train всегда начинается с 0 и растёт на step
+    По умолчанию step = test_size (test-окна идут встык).
+    step < test_size запрещён: test-окна перекрывались бы, и склеенная
+    OOS equity считала бы одни и те же бары несколько раз.
+    """
+    if train_size <= 0 or test_size <= 0:
+        raise ValueError("train_size and test_size must be positive.")
+    step = step or test_size
+    if step < test_size:
+        raise ValueError("step must be >= test_size (out-of-sample windows must not overlap).")
+
+    windows = []
+    train_end = train_size
+    while train_end + test_size <= n_bars:
+        train_start = 0 if anchored else train_end - train_size
+        windows.append(WalkForwardWindow(train_start, train_end, train_end, train_end + test_size))
+        train_end += step
+    return windows
+
+
+# ---------- 2. Кэш индикаторов ----------
+
+class IndicatorCache:
+    """
+    Скользящие средние считаются один раз по всей серии для каждой длины.
+    SMA на срезе [start, stop) совпадает с полной SMA начиная с
+    start + length - 1, поэтому окно получает срез с NaN на прогреве
+    вместо повторного пересчёта.
+    """
+
+    def __init__(self, prices: np.ndarray):
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self._sma: Dict[int, np.ndarray] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def sma(self, length: int, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        full = self._sma.get(length)
+        if full is None:
+            self.misses += 1
+            full = rolling_mean_matrix(self.prices, [length])[:, 0]
+            self._sma[length] = full
+        else:
+            self.hits += 1
+
+        out = full[start:stop].copy()
+        out[:length - 1] = np.nan
+        return out
+
+
+# ---------- 3. Сигналы ----------
+
+SignalBuilder = Callable[..., np.ndarray]  # (cache, start, stop, **params) → сигналы
+
+
+def ma_above_signal(cache: IndicatorCache, start: int, stop: int, window: int) -> np.ndarray:
+    """1, если цена выше SMA(window), посчитанной внутри [start, stop)."""
+    mean = cache.sma(window, start, stop)
+    with np.errstate(invalid="ignore"):
+        return (cache.prices[start:stop] > mean).astype(np.int8)
+
+
+def param_grid(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """{"window": [24, 48]} → [{"window": 24}, {"window": 48}]"""
+    keys = list(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+
+# ---------- 4. Обработка одного окна ----------
+
+_METRICS = ("sharpe", "total_return_pct", "max_drawdown_pct")
+
+# состояние воркера: цены/индекс и кэш индикаторов живут весь срок процесса
+_WF_STATE: Dict[str, Any] = {}
+
+
+def _init_worker(prices: np.ndarray, index: pd.DatetimeIndex) -> None:
+    _WF_STATE["index"] = index
+    _WF_STATE["cache"] = IndicatorCache(prices)
+
+
+def _evaluate_window(
+    window: WalkForwardWindow,
+    params_list: List[Dict[str, Any]],
+    signal_fn: SignalBuilder,
+    metric: str,
+    initial_balance: float,
+    fee_per_trade: float,
+    periods_per_year: int,
+) -> Dict[str, Any]:
+    cache: IndicatorCache = _WF_STATE["cache"]
+    index: pd.DatetimeIndex = _WF_STATE["index"]
+    w = window
+
+    # In-sample: все наборы параметров одним проходом
+    train_px = cache.prices[w.train_start:w.train_end]
+    signals = np.column_stack([
+        signal_fn(cache, w.train_start, w.train_end, **p) for p in params_list
+    ])
+    core = sweep_core(train_px, signals, initial_balance, fee_per_trade, periods_per_year)
+    score = core[metric]
+    best = int(np.nanargmax(score))
+    best_params = params_list[best]
+
+    # Out-of-sample: индикатор прогревается на train, торгуем только test
+    full_sig = signal_fn(cache, w.train_start, w.test_end, **best_params)
+    offset = w.test_start - w.train_start
+    test_df = pd.DataFrame(
+        {
+            "Close": cache.prices[w.test_start:w.test_end],
+            "signal": full_sig[offset:],
+        },
+        index=index[w.test_start:w.test_end],
+    )
+    # каждое окно уникально — дисковый кэш только копил бы записи
+    bt = run_strategy_backtest(test_df, "signal", "Close", initial_balance, fee_per_trade, use_cache=False)
+
+    return {
+        "train_start": index[w.train_start],
+        "train_end": index[w.train_end - 1],
+        "test_start": index[w.test_start],
+        "test_end": index[w.test_end - 1],
+        "params": best_params,
+        f"is_{metric}": round(float(score[best]), 4),
+        "oos_return_pct": bt.total_return_pct,
+        "oos_max_drawdown_pct": bt.max_drawdown_pct,
+        "oos_equity": bt.equity_curve.to_numpy(),
+        "cache_hits": cache.hits,
+        "cache_misses": cache.misses,
+    }
+
+
+# ---------- 5. Запуск ----------
+
+def run_walk_forward(
+    df: pd.DataFrame,
+    grid: Dict[str, Sequence[Any]],
+    train_size: int,
+    test_size: int,
+    price_col: str = "Close",
+    signal_fn: SignalBuilder = ma_above_signal,
+    anchored: bool = False,
+    step: Optional[int] = None,
+    metric: str = "sharpe",
+    max_workers: Optional[int] = None,
+    initial_balance: float = 100_000.0,
+    fee_per_trade: float = 0.0,
+    periods_per_year: int = 252,
+) -> WalkForwardResult:
+    """
+    Walk-forward по одному инструменту.
+    grid — сетка параметров для signal_fn, например {"window": range(12, 241, 12)}.
+    metric — критерий выбора на train: sharpe / total_return_pct / max_drawdown_pct.
+    max_workers=1 — считать в текущем процессе (удобно для отладки).
+    """
+    if metric not in _METRICS:
+        raise ValueError(f"metric must be one of {_METRICS}")
+
+    df = ensure_datetime_index(df)
+    prices = df[price_col].dropna()
+    px = prices.to_numpy(dtype=np.float64)
+    index = prices.index
+
+    windows = make_windows(len(px), train_size, test_size, anchored, step)
+    if not windows:
+        raise ValueError("Not enough data for a single train/test window.")
+
+    params_list = param_grid(grid)
+    args = (params_list, signal_fn, metric, initial_balance, fee_per_trade, periods_per_year)
+
+    if max_workers == 1:
+        _init_worker(px, index)
+        rows = [_evaluate_window(w, *args) for w in windows]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(px, index),
+        ) as pool:
+            futures = [pool.submit(_evaluate_window, w, *args) for w in windows]
+            rows = [f.result() for f in futures]
+
+    # Склейка OOS equity: каждое окно продолжает с баланса предыдущего
+    pieces = []
+    balance = initial_balance
+    for w, row in zip(windows, rows):
+        curve = row.pop("oos_equity") / initial_balance * balance
+        balance = float(curve[-1])
+        pieces.append(pd.Series(curve, index=index[w.test_start:w.test_end]))
+    oos_equity = pd.concat(pieces)
+
+    drawdown = oos_equity / oos_equity.cummax() - 1.0
+    return WalkForwardResult(
+        windows=pd.DataFrame(rows),
+        oos_equity=oos_equity,
+        oos_return_pct=round((balance / initial_balance - 1.0) * 100.0, 2),
+        oos_max_drawdown_pct=round(float(drawdown.min() * 100.0), 2),
+    )
+
+
+if __name__ == "__main__":
+    dates = pd.date_range("2024-01-01", periods=6000, freq="h")
+    prices = pd.Series(np.cumsum(np.random.randn(len(dates))) + 100, index=dates)
+    df = pd.DataFrame({"Close": prices})
+
+    res = run_walk_forward(df, {"window": range(12, 241, 12)}, train_size=1000, test_size=250)
+    print(res.windows[["test_start", "params", "is_sharpe", "oos_return_pct"]].to_string(index=False))
+    print(f"\nOOS return: {res.oos_return_pct:.2f}%  max DD: {res.oos_max_drawdown_pct:.2f}%")
@@ -4,12 +4,14 @@ agent_data_pipeline.py — единый центр данных для CrewAI а
 ✅ Загружает данные от:
    - ctrader_symbol_details.py  (Meta Agent)
    - ctrader_candles_data.py    (Data Agent)
-✅ Объединяет и векторизует данные в один DataFrame
+✅ Одна базовая серия на символ, старшие ТФ — ресемплингом по запросу (с кэшем)
+✅ Метаданные хранятся один раз на символ, а не в каждой строке
 ✅ Готовит JSON/CSV для CrewAI, Telegram, ML и визуализации
 """
 
 import os
 import json
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
@@ -21,29 +23,96 @@ DATA_DIR = os.path.join(BASE_DIR, "data_pipeline")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # ─────────────────────────────────────────────
-# 2. Загрузка CSV свечей
+# 2. Свечи: одна базовая серия + ресемплинг по запросу
 # ─────────────────────────────────────────────
-def load_candle_data(symbol="US30"):
+TIMEFRAMES = ["M5", "M15", "M30", "H1", "H4", "D1"]
+TF_MINUTES = {"M5": 5, "M15": 15, "M30": 30, "H1": 60, "H4": 240, "D1": 1440}
+OHLCV_AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+TIME_COLUMNS = ("time", "timestamp", "datetime", "date")
+
+
+class SymbolDataset:
+    """
+    Данные одного символа:
+      - base — свечи самого мелкого доступного ТФ (DatetimeIndex)
+      - meta — метаданные символа, один словарь на символ (не по строкам)
+      - candles(tf) — старшие ТФ считаются из base при первом обращении
+        и кэшируются; H4 строится из уже посчитанного H1 и т.п.
+      - features(tf) — фичи поверх candles(tf), считаются на лету (дёшево)
+    """
+
+    def __init__(self, symbol, base, base_tf, meta=None):
+        self.symbol = symbol
+        self.base_tf = base_tf
+        self.meta = dict(meta or {})
+        self._candles = {base_tf: base}
+
+    @property
+    def base(self):
+        return self._candles[self.base_tf]
+
+    @property
+    def timeframes(self):
+        """ТФ, которые можно получить из базовой серии."""
+        return [tf for tf in TIMEFRAMES if TF_MINUTES[tf] >= TF_MINUTES[self.base_tf]]
+
+    def candles(self, tf):
+        """OHLCV свечи таймфрейма tf (кэшируются)."""
+        if tf in self._candles:
+            return self._candles[tf]
+        if tf not in self.timeframes:
+            raise ValueError(f"{self.symbol}: {tf} нельзя получить из базового ТФ {self.base_tf}")
+
+        # источник — самый крупный уже посчитанный ТФ, кратный целевому
+        minutes = TF_MINUTES[tf]
+        source_tf = max(
+            (t for t in self._candles if minutes % TF_MINUTES[t] == 0),
+            key=lambda t: TF_MINUTES[t],
+        )
+        src = self._candles[source_tf]
+        agg = {c: f for c, f in OHLCV_AGG.items() if c in src.columns}
+        out = src.resample(f"{minutes}min", label="left", closed="left").agg(agg)
+        out = out.dropna(subset=["close"])      # пустые интервалы (ночь, выходные)
+        self._candles[tf] = out
+        return out
+
+    def features(self, tf):
+        """Свечи tf + инженерные фичи (body/shadows/range)."""
+        return add_candle_features(self.candles(tf))
+
+    def memory_usage(self):
+        """Байт на символ: базовая серия + все закэшированные ТФ."""
+        return int(sum(df.memory_usage(deep=True).sum() for df in self._candles.values()))
+
+
+def _read_candles_csv(path):
+    df = pd.read_csv(path)
+    df.columns = [c.lower() for c in df.columns]
+    time_col = next((c for c in TIME_COLUMNS if c in df.columns), None)
+    if time_col is None:
+        raise ValueError(f"❌ В {path} нет колонки времени ({', '.join(TIME_COLUMNS)})")
+    index = pd.to_datetime(df.pop(time_col), utc=True, format="mixed")
+    df.index = pd.DatetimeIndex(index, name="time")
+    df = df[[c for c in OHLCV_AGG if c in df.columns]].astype("float64")
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+
+def load_candle_data(symbol="US30", meta=None):
     """
-    Загружает все CSV с данными свечей по разным таймфреймам.
+    Загружает свечи символа: читается только один CSV — самый мелкий
+    доступный ТФ (обычно M5); остальные ТФ — через SymbolDataset.candles(tf).
     """
-    frames = []
-    for tf in ["M5", "M15", "M30", "H1", "H4", "D1"]:
+    for tf in TIMEFRAMES:
         path = os.path.join(BASE_DIR, f"{symbol}_{tf}_candles.csv")
         if not os.path.exists(path):
             print(f"⚠️ Нет данных для {tf}")
             continue
 
-        df = pd.read_csv(path)
-        df["tf"] = tf
-        frames.append(df)
+        base = _read_candles_csv(path)
+        print(f"✅ Загружено {len(base)} свечей {symbol} {tf} (базовый ТФ).")
+        return SymbolDataset(symbol, base, tf, meta)
 
-    if not frames:
-        raise FileNotFoundError("❌ Нет файлов свечей. Сначала запусти ctrader_candles_data.py")
-
-    combined = pd.concat(frames, ignore_index=True)
-    print(f"✅ Загружено {len(combined)} строк свечей по всем ТФ.")
-    return combined
+    raise FileNotFoundError("❌ Нет файлов свечей. Сначала запусти ctrader_candles_data.py")
 
 
 # ─────────────────────────────────────────────
@@ -73,42 +142,57 @@ def load_symbol_meta(symbol="US30"):
 
 
 # ─────────────────────────────────────────────
-# 4. Формирование сводного DataFrame
+# 4. Формирование датасета
 # ─────────────────────────────────────────────
-def build_dataset(symbol="US30"):
-    candles = load_candle_data(symbol)
-    meta = load_symbol_meta(symbol)
-
-    # Пример базовых инженерных фич
-    candles["body_size"] = abs(candles["close"] - candles["open"])
-    candles["upper_shadow"] = candles["high"] - candles[["close", "open"]].max(axis=1)
-    candles["lower_shadow"] = candles[["close", "open"]].min(axis=1) - candles["low"]
-    candles["range"] = candles["high"] - candles["low"]
-
-    # Привязка метаданных к свечам
-    for k, v in meta.items():
-        candles[k] = v
-
-    # Сохраняем результат
-    output_path = os.path.join(DATA_DIR, f"{symbol}_combined_dataset.csv")
-    candles.to_csv(output_path, index=False)
-    print(f"💾 Dataset сохранён: {output_path}")
-
-    return candles
+def add_candle_features(candles):
+    """Базовые инженерные фичи свечи (векторно, без копии исходника)."""
+    o, c = candles["open"].to_numpy(), candles["close"].to_numpy()
+    h, l = candles["high"].to_numpy(), candles["low"].to_numpy()
+    top = np.maximum(o, c)
+    bottom = np.minimum(o, c)
+    return candles.assign(
+        body_size=top - bottom,
+        upper_shadow=h - top,
+        lower_shadow=bottom - l,
+        range=h - l,
+    )
+
+
+def build_dataset(symbol="US30", timeframes=None):
+    dataset = load_candle_data(symbol, meta=load_symbol_meta(symbol))
+
+    # Сохраняем базовую серию с фичами и метаданные — по одному разу на символ
+    base_path = os.path.join(DATA_DIR, f"{symbol}_{dataset.base_tf}_dataset.csv")
+    dataset.features(dataset.base_tf).to_csv(base_path)
+    meta_path = os.path.join(DATA_DIR, f"{symbol}_dataset_meta.json")
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"base_tf": dataset.base_tf, "meta": dataset.meta}, f, ensure_ascii=False, indent=2)
+    print(f"💾 Dataset сохранён: {base_path} (+ {meta_path})")
+
+    # Старшие ТФ — только по запросу (кэш внутри dataset)
+    for tf in timeframes or []:
+        dataset.candles(tf)
+    return dataset
 
 
 # ─────────────────────────────────────────────
 # 5. Экспорт JSON для CrewAI агентов
 # ─────────────────────────────────────────────
-def export_for_agents(df, symbol="US30"):
+def export_for_agents(dataset, symbol=None, tf=None):
     """
     Формирует лёгкий JSON-файл с актуальными фичами для CrewAI Data/Meta Agents.
     """
+    symbol = symbol or dataset.symbol
+    tf = tf or dataset.base_tf
+    df = dataset.features(tf)
     export = {
         "symbol": symbol,
+        "timeframe": tf,
         "records": len(df),
+        "timeframes": dataset.timeframes,
+        "meta": dataset.meta,
         "updated": datetime.now().isoformat(),
-        "preview": df.head(5).to_dict(orient="records"),
+        "preview": json.loads(df.tail(5).reset_index().to_json(orient="records", date_format="iso")),
         "columns": list(df.columns)
     }
 
@@ -124,6 +208,6 @@ def export_for_agents(df, symbol="US30"):
 # ─────────────────────────────────────────────
 if __name__ == "__main__":
     symbol = "US30"
-    df = build_dataset(symbol)
-    export_for_agents(df, symbol)
+    dataset = build_dataset(symbol)
+    export_for_agents(dataset, symbol)
     print("✅ Полный цикл Data → Meta → CrewAI завершён.")
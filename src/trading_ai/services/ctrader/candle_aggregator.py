@@ -0,0 +1,174 @@
+"""
+candle_aggregator.py — сборка свечей всех таймфреймов из потока котировок
+
+Идея (вместо live trendbar подписки на каждый таймфрейм):
+- на символ одна подписка на споты; каждый тик за один проход обновляет
+  формирующиеся свечи всех таймфреймов (M1 … D1)
+- границы свечей — от начала торгового дня брокера (day_start, минуты от
+  00:00 UTC): D1 и H4 не переходят через смену сессии, младшие ТФ кратны им
+- свеча закрывается либо первым тиком следующего интервала, либо по времени
+  (close_due) — без ожидания тика, например на закрытии сессии в пятницу
+- закрытие → событие BarClosed (для индикаторов, детекторов, стратегий)
+
+Цена свечи — bid (как у trendbar cTrader), объём — число тиков.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from trading_ai.services.ctrader.candle_store import CandleRow
+
+TF_SECONDS: Dict[str, int] = {
+    "M1": 60,
+    "M5": 5 * 60,
+    "M15": 15 * 60,
+    "M30": 30 * 60,
+    "H1": 60 * 60,
+    "H4": 4 * 60 * 60,
+    "D1": 24 * 60 * 60,
+}
+
+
+# ─────────────────────────────────────────────
+# 0. События
+# ─────────────────────────────────────────────
+
+@dataclass
+class BarClosed:
+    symbol_key: str
+    timeframe: str
+    time: int               # начало свечи, UTC (сек)
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    by_timer: bool = False  # закрыта по времени, а не тиком следующего интервала
+
+    @property
+    def row(self) -> CandleRow:
+        return (self.time, self.open, self.high, self.low, self.close, self.volume)
+
+
+# ─────────────────────────────────────────────
+# 1. Агрегатор
+# ─────────────────────────────────────────────
+
+class TickAggregator:
+    """
+        agg = TickAggregator(["M1", "M5", "H1", "D1"], day_start=22 * 60)
+        closed = agg.on_tick("EURUSD", ts, bid)      # список BarClosed
+        agg.forming("EURUSD", "M5")                  # текущая свеча (CandleRow) или None
+        closed += agg.close_due(time.time() - 2)     # таймер: закрыть истёкшие интервалы
+
+    Тик, пришедший после закрытия своего интервала (задержка сети больше
+    grace таймера), в закрытую свечу не попадает и считается в late_ticks.
+    """
+
+    def __init__(self, timeframes: Sequence[str], day_start: int = 0):
+        unknown = [tf for tf in timeframes if tf not in TF_SECONDS]
+        if unknown:
+            raise ValueError(f"Неизвестные таймфреймы: {unknown}")
+        self.timeframes = list(timeframes)
+        self.day_start = day_start % (24 * 60)
+        self._offset = self.day_start * 60
+        self._seconds = [TF_SECONDS[tf] for tf in self.timeframes]
+        # symbol → по ТФ: [start, open, high, low, close, volume] или None
+        self._bars: Dict[str, List[Optional[list]]] = {}
+        # symbol → по ТФ: конец последнего закрытого интервала (раньше — поздние тики)
+        self._closed_until: Dict[str, List[int]] = {}
+        self.ticks = 0
+        self.late_ticks = 0
+
+    def bucket(self, t: int, timeframe: str) -> int:
+        """Начало интервала timeframe, в который попадает момент t (UTC, сек)."""
+        sec = TF_SECONDS[timeframe]
+        return t - (t - self._offset) % sec
+
+    def _state(self, symbol_key: str):
+        bars = self._bars.get(symbol_key)
+        if bars is None:
+            bars = self._bars[symbol_key] = [None] * len(self.timeframes)
+            self._closed_until[symbol_key] = [0] * len(self.timeframes)
+        return bars, self._closed_until[symbol_key]
+
+    def _close(self, symbol_key: str, i: int, bar: list, by_timer: bool) -> BarClosed:
+        self._closed_until[symbol_key][i] = bar[0] + self._seconds[i]
+        return BarClosed(symbol_key, self.timeframes[i], *bar, by_timer=by_timer)
+
+    def on_tick(self, symbol_key: str, ts: float, price: float, volume: float = 1.0) -> List[BarClosed]:
+        """Тик → обновление свечей всех ТФ; возвращает свечи, закрытые этим тиком."""
+        bars, closed_until = self._state(symbol_key)
+        t = int(ts)
+        offset = self._offset
+        closed: List[BarClosed] = []
+        late = False
+        self.ticks += 1
+        for i, sec in enumerate(self._seconds):
+            start = t - (t - offset) % sec
+            bar = bars[i]
+            if bar is not None and bar[0] == start:
+                if price > bar[2]:
+                    bar[2] = price
+                elif price < bar[3]:
+                    bar[3] = price
+                bar[4] = price
+                bar[5] += volume
+                continue
+            if start < closed_until[i] or (bar is not None and start < bar[0]):
+                late = True                     # интервал уже закрыт (или тик из прошлого)
+                continue
+            if bar is not None:
+                closed.append(self._close(symbol_key, i, bar, by_timer=False))
+            bars[i] = [start, price, price, price, price, volume]
+        if late:
+            self.late_ticks += 1
+        return closed
+
+    def close_due(self, now: float) -> List[BarClosed]:
+        """Закрывает свечи, чей интервал кончился к моменту now (UTC, сек)."""
+        closed: List[BarClosed] = []
+        for symbol_key, bars in self._bars.items():
+            for i, bar in enumerate(bars):
+                if bar is not None and bar[0] + self._seconds[i] <= now:
+                    closed.append(self._close(symbol_key, i, bar, by_timer=True))
+                    bars[i] = None
+        return closed
+
+    def forming(self, symbol_key: str, timeframe: str) -> Optional[CandleRow]:
+        bars = self._bars.get(symbol_key)
+        bar = bars[self.timeframes.index(timeframe)] if bars is not None else None
+        return tuple(bar) if bar is not None else None
+
+    def forming_rows(self, symbol_key: str) -> Dict[str, CandleRow]:
+        """Формирующиеся свечи символа по всем ТФ (после on_tick — для записи в хранилище)."""
+        bars = self._bars.get(symbol_key, ())
+        return {tf: tuple(bar) for tf, bar in zip(self.timeframes, bars) if bar is not None}
+
+    def resume(self, symbol_key: str, timeframe: str, row: CandleRow, now: float) -> Optional[CandleRow]:
+        """
+        Продолжить формирующуюся свечу из истории брокера (последняя свеча
+        ProtoOAGetTrendbarsRes): тики до подписки в агрегатор не попали.
+        Возвращает итоговую формирующуюся свечу или None, если интервал row уже закончился.
+        """
+        if timeframe not in self.timeframes:
+            return None
+        i = self.timeframes.index(timeframe)
+        start = int(row[0])
+        if start != self.bucket(start, timeframe) or start + self._seconds[i] <= now:
+            return None
+        bars, _ = self._state(symbol_key)
+        bar = bars[i]
+        if bar is None or bar[0] < start:
+            bars[i] = list(row)
+        elif bar[0] == start:
+            # открытие и объём — из истории (она видела начало свечи), экстремумы — общие
+            bar[1] = row[1]
+            bar[2] = max(bar[2], row[2])
+            bar[3] = min(bar[3], row[3])
+            bar[5] = max(bar[5], row[5])
+        else:
+            return tuple(bar)
+        return tuple(bars[i])
@@ -0,0 +1,334 @@
+"""
+candle_store.py — бинарное хранилище свечей: файл на символ × таймфрейм
+
+Идея (вместо одного большого CANDLES_JSON):
+- заголовок 64 байта + записи фиксированной ширины (time, OHLCV) подряд
+- запись: новая свеча — O(1) дописывание в конец, формирующаяся свеча
+  (то же время) — обновление последней записи на месте
+- размер файла после создания не меняется: Windows не даёт менять размер
+  отображённого файла, а его держат и писатель, и читатели в других процессах.
+  Когда место кончается, история копируется в файл следующего поколения
+  (вдвое больше) {symbol}_{tf}.{N}.bin, номер N пишется в заголовок старого
+  файла и базового {symbol}_{tf}.bin — читатели переходят на новый сами,
+  старые поколения удаляются, как только их никто не держит
+- чтение: mmap + np.frombuffer — последние N свечей без копирования,
+  согласованность с писателем — seqlock в заголовке (как в spot_table.py)
+
+Раскладка (little-endian):
+    заголовок: magic "CND1" | version u32 | record_size u32 | tf_minutes u32 | count u64 | seq u64
+               | next u64 (поколение, заменившее файл; 0 — файл актуален)
+    запись:    time i64 (UTC, сек) | open f64 | high f64 | low f64 | close f64 | volume f64
+"""
+
+from __future__ import annotations
+
+import mmap
+import struct
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"CND1"
+VERSION = 1
+HEADER_SIZE = 64
+GROW_RECORDS = 4096              # ёмкость нового файла (записей); следующее поколение — вдвое больше
+
+CANDLE_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+RECORD_SIZE = CANDLE_DTYPE.itemsize
+
+_HEADER = struct.Struct("<4sIIIQQ")
+_COUNT_OFFSET = 16
+_SEQ_OFFSET = 24
+_NEXT_OFFSET = 32
+_U64 = struct.Struct("<Q")
+
+CandleRow = Tuple[int, float, float, float, float, float]
+
+
+def candle_path(directory: Union[str, Path], symbol_key: str, timeframe: str) -> Path:
+    return Path(directory) / f"{symbol_key}_{timeframe}.bin"
+
+
+def generation_path(path: Union[str, Path], generation: int) -> Path:
+    """Файл поколения generation базового файла path (0 — сам path)."""
+    path = Path(path)
+    return path if generation == 0 else path.with_name(f"{path.stem}.{generation}{path.suffix}")
+
+
+def _generations(path: Path) -> List[int]:
+    """Номера поколений базового файла path, лежащих на диске (кроме 0)."""
+    out = []
+    for p in path.parent.glob(f"{path.stem}.*{path.suffix}"):
+        tail = p.name[len(path.stem) + 1:len(p.name) - len(path.suffix)]
+        if tail.isdigit():
+            out.append(int(tail))
+    return out
+
+
+def _read_next(path: Path) -> int:
+    """Поле next заголовка — через обычное чтение файла, без отображения."""
+    with path.open("rb") as f:
+        f.seek(_NEXT_OFFSET)
+        data = f.read(_U64.size)
+    return _U64.unpack(data)[0] if len(data) == _U64.size else 0
+
+
+def _create_file(path: Path, tf_minutes: int, capacity: int, records: Optional[np.ndarray] = None) -> None:
+    """Новый файл: заголовок, записи records, место под capacity записей (файл ещё никем не отображён)."""
+    n = 0 if records is None else len(records)
+    header = bytearray(HEADER_SIZE)
+    _HEADER.pack_into(header, 0, MAGIC, VERSION, RECORD_SIZE, tf_minutes, n, 0)
+    with path.open("wb") as f:
+        f.write(header)
+        if n:
+            f.write(records.tobytes())
+        f.truncate(HEADER_SIZE + capacity * RECORD_SIZE)
+
+
+class CandleStore:
+    """
+    Писатель (один на файл — ценовой демон):
+        store = CandleStore.open_writer(path, tf_minutes=15)
+        store.upsert(t, o, h, l, c, v)        # новая свеча или обновление формирующейся
+        store.extend(rows)                    # пачка истории (старое/дубликаты отбрасываются)
+
+    Читатель (любой процесс):
+        store = CandleStore.open_reader(path)  # None, если файла ещё нет
+        bars = store.tail(200)                 # структурированный np.ndarray (CANDLE_DTYPE)
+        df = store.frame(200)                  # DataFrame с UTC DatetimeIndex
+    """
+
+    def __init__(self, path: Path, writable: bool):
+        self.base_path = Path(path)
+        self.writable = writable
+        self.path = self.base_path               # файл актуального поколения
+        self.generation = 0
+        self._f = None
+        self._mm: Optional[mmap.mmap] = None
+        self._records: Optional[np.ndarray] = None
+        self._seq = 0
+        self._open_latest()
+
+    def _open(self, generation: int) -> None:
+        path = generation_path(self.base_path, generation)
+        f = path.open("r+b" if self.writable else "rb")
+        self._close_file()
+        self._f, self.path, self.generation = f, path, generation
+        self._map()
+        magic, version, record_size, self.tf_minutes, _, seq = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self.close()
+            raise ValueError(f"{self.path}: не файл свечей CND1 v{VERSION}")
+        if self.writable:
+            self._seq = seq + (seq & 1)          # писатель упал посреди записи — снова чётный
+            self._set_u64(_SEQ_OFFSET, self._seq)
+
+    def _open_latest(self, attempts: int = 5) -> None:
+        """Актуальное поколение — по полю next базового файла (его писатель обновляет всегда)."""
+        for attempt in range(attempts):
+            try:
+                self._open(_read_next(self.base_path))
+                return
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise                        # писатель успел сменить поколение снова — перечитать указатель
+
+    # ---------- открытие ----------
+
+    @classmethod
+    def open_writer(cls, path: Union[str, Path], tf_minutes: int = 0) -> "CandleStore":
+        path = Path(path)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _create_file(path, tf_minutes, GROW_RECORDS)
+        store = cls(path, writable=True)
+        store._remove_stale()                     # поколения, оставшиеся с прошлого запуска
+        return store
+
+    @classmethod
+    def open_reader(cls, path: Union[str, Path]) -> Optional["CandleStore"]:
+        path = Path(path)
+        if not path.exists() or path.stat().st_size < HEADER_SIZE:
+            return None
+        try:
+            return cls(path, writable=False)
+        except (ValueError, OSError):
+            return None
+
+    def _map(self) -> None:
+        self._records = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass                         # на старую карту ещё смотрят выданные срезы — закроет GC
+        access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=access)
+        capacity = (len(self._mm) - HEADER_SIZE) // RECORD_SIZE
+        self._records = np.frombuffer(self._mm, dtype=CANDLE_DTYPE, count=capacity, offset=HEADER_SIZE)
+
+    def _close_file(self) -> None:
+        self._records = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass
+            self._mm = None
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def close(self) -> None:
+        self._close_file()
+
+    # ---------- заголовок ----------
+
+    def _u64(self, offset: int) -> int:
+        return _U64.unpack_from(self._mm, offset)[0]
+
+    def _set_u64(self, offset: int, value: int) -> None:
+        _U64.pack_into(self._mm, offset, value)
+
+    @property
+    def count(self) -> int:
+        return self._u64(_COUNT_OFFSET)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._records)
+
+    def __len__(self) -> int:
+        return self.count
+
+    # ---------- запись ----------
+
+    def _begin(self) -> None:
+        self._seq += 1
+        self._set_u64(_SEQ_OFFSET, self._seq)      # нечётный — идёт запись
+
+    def _commit(self) -> None:
+        self._seq += 1
+        self._set_u64(_SEQ_OFFSET, self._seq)      # чётный — данные согласованы
+
+    def _reserve(self, n: int) -> None:
+        """
+        Места нет — история переезжает в файл следующего поколения. Размер
+        отображённого файла не трогаем: на Windows truncate упал бы, пока файл
+        отображён у писателя или у любого читателя.
+        """
+        if n <= self.capacity:
+            return
+        capacity = max(n, self.capacity * 2, GROW_RECORDS)
+        generation = max(_generations(self.base_path) + [self.generation]) + 1
+        _create_file(generation_path(self.base_path, generation), self.tf_minutes,
+                     capacity, self._records[:self.count])
+        self._set_u64(_NEXT_OFFSET, generation)       # читатели этого файла перейдут на новый
+        if self.generation:
+            with self.base_path.open("r+b") as f:     # вход для новых читателей
+                f.seek(_NEXT_OFFSET)
+                f.write(_U64.pack(generation))
+        self._open(generation)
+        self._remove_stale()
+
+    def _remove_stale(self) -> None:
+        """Удаляет прошлые поколения; занятые читателем (Windows) — при следующей смене."""
+        for generation in _generations(self.base_path):
+            if generation != self.generation:
+                try:
+                    generation_path(self.base_path, generation).unlink()
+                except OSError:
+                    pass
+
+    def last_time(self) -> Optional[int]:
+        n = self.count
+        return int(self._records[n - 1]["time"]) if n else None
+
+    def upsert(self, t: int, open_: float, high: float, low: float, close: float, volume: float) -> bool:
+        """
+        Свеча с тем же временем, что последняя, — обновление на месте (формирующаяся),
+        более поздняя — дописывается. Более ранние игнорируются (False).
+        """
+        n = self.count
+        last = int(self._records[n - 1]["time"]) if n else None
+        if last is not None and t < last:
+            return False
+        row = (t, open_, high, low, close, volume)
+        if t == last:
+            self._begin()
+            self._records[n - 1] = row
+            self._commit()
+            return True
+        self._reserve(n + 1)
+        self._begin()
+        self._records[n] = row
+        self._set_u64(_COUNT_OFFSET, n + 1)
+        self._commit()
+        return True
+
+    def extend(self, rows: Union[np.ndarray, Sequence[CandleRow]]) -> int:
+        """
+        Пачка свечей (отсортированных по времени) одной операцией: всё, что раньше
+        последней записи, отбрасывается; совпадающая по времени — обновляет её.
+        Возвращает число дописанных записей.
+        """
+        rows = np.asarray(rows, dtype=CANDLE_DTYPE) if isinstance(rows, np.ndarray) \
+            else np.array([tuple(r) for r in rows], dtype=CANDLE_DTYPE)
+        n = self.count
+        last = int(self._records[n - 1]["time"]) if n else None
+        if last is not None:
+            rows = rows[rows["time"] >= last]
+        if rows.size == 0:
+            return 0
+        update = last is not None and int(rows["time"][0]) == last
+        new = rows[1:] if update else rows
+        self._reserve(n + new.size)
+        self._begin()
+        if update:
+            self._records[n - 1] = rows[0]
+        self._records[n:n + new.size] = new
+        self._set_u64(_COUNT_OFFSET, n + new.size)
+        self._commit()
+        return int(new.size)
+
+    # ---------- чтение ----------
+
+    def tail(self, n: Optional[int] = None, copy: bool = False, retries: int = 1000) -> np.ndarray:
+        """
+        Последние n свечей (все — при n=None) как срез отображённого файла.
+        copy=False — без копирования: закрытые свечи неизменны, но последняя
+        (формирующаяся) может обновиться на месте уже после возврата.
+        copy=True — снимок, согласованный с писателем.
+        """
+        for attempt in range(retries):
+            if attempt:
+                time.sleep(0)                    # уступить писателю (поток этого же процесса ждёт GIL)
+            if not self.writable and self._u64(_NEXT_OFFSET):
+                self._open_latest()              # писатель переехал в файл следующего поколения
+            seq = self._u64(_SEQ_OFFSET)
+            if seq & 1:
+                continue
+            count = self.count
+            start = 0 if n is None else max(count - n, 0)
+            out = self._records[start:count]
+            if copy:
+                out = out.copy()
+            if self._u64(_SEQ_OFFSET) == seq:
+                return out
+        raise TimeoutError(f"{self.path}: не удалось получить согласованный срез")
+
+    def frame(self, n: Optional[int] = None) -> pd.DataFrame:
+        """Последние n свечей в DataFrame (open/high/low/close/volume, индекс — время UTC)."""
+        bars = self.tail(n, copy=True)
+        index = pd.DatetimeIndex(pd.to_datetime(bars["time"], unit="s", utc=True), name="time")
+        return pd.DataFrame({name: bars[name] for name in CANDLE_DTYPE.names[1:]}, index=index)
@@ -0,0 +1,610 @@
+"""
+ctrader_daemon.py — долгоживущий ценовой демон cTrader Open API
+
+Что делает:
+- одно подключение на процесс: ApplicationAuth → AccountAuth (один раз на сессию)
+- SymbolsList → symbol_id для всего WATCHLIST, SymbolById → digits
+- подписки: только спот (одним запросом на все символы); свечи всех таймфреймов
+  собирает из тиков candle_aggregator.py, стартовая история — ProtoOAGetTrendbarsReq
+- закрытие свечи (тиком или по таймеру) → IndicatorEngine пары и подписчики
+  add_bar_listener (события BarClosed)
+- последние bid/ask и свечи держит в памяти; котировки на каждом тике
+  пишет в mmap-таблицу SPOTS_TABLE (spot_table.py), свечи — в файлы
+  candle_store.py под CANDLES_DIR (дописывание / обновление формирующейся)
+- heartbeat, переподключение с экспоненциальной паузой и повторной подпиской
+- call(message) — запрос через то же подключение из синхронного кода
+- auth_only=True — только авторизация (без символов, подписок и файлов):
+  для скриптов-помощников, которым нужен лишь call()
+
+Запуск:
+    python -m trading_ai.services.ctrader.ctrader_price_source
+
+Офлайн-проверка: fake_openapi_server.py (повтор записанных кадров).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ssl
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoErrorRes, ProtoHeartbeatEvent
+from ctrader_open_api.messages.OpenApiMessages_pb2 import (
+    ProtoOAAccountAuthReq,
+    ProtoOAAccountsTokenInvalidatedEvent,
+    ProtoOAApplicationAuthReq,
+    ProtoOAClientDisconnectEvent,
+    ProtoOAErrorRes,
+    ProtoOAGetTrendbarsReq,
+    ProtoOASpotEvent,
+    ProtoOASubscribeSpotsReq,
+    ProtoOASymbolByIdReq,
+    ProtoOASymbolsListReq,
+)
+
+from trading_ai.analytics.indicators import IndicatorEngine
+from trading_ai.services.ctrader.candle_aggregator import TF_SECONDS, BarClosed, TickAggregator
+from trading_ai.services.ctrader.candle_store import CANDLE_DTYPE, CandleRow, CandleStore, candle_path
+from trading_ai.services.ctrader.ctrader_price_source import (
+    CANDLES_DIR,
+    SPOTS_TABLE,
+    CTraderConfig,
+)
+from trading_ai.services.ctrader.market_snapshot import (
+    CANDLE_TIMEFRAMES,
+    WATCHLIST,
+    Candle,
+    SymbolSnapshot,
+)
+from trading_ai.services.ctrader.openapi_wire import (
+    HEARTBEAT_TYPE,
+    TRENDBAR_PERIODS,
+    CTraderError,
+    FrameRecorder,
+    decode,
+    encode,
+    extract,
+    frame,
+    read_frame,
+    to_price,
+    trendbar_to_row,
+)
+from trading_ai.services.ctrader.spot_table import SpotTable
+
+_SPOT_TYPE = ProtoOASpotEvent().payloadType
+_ERROR_TYPES = {ProtoOAErrorRes().payloadType, ProtoErrorRes().payloadType}
+_DROP_TYPES = {ProtoOAClientDisconnectEvent().payloadType, ProtoOAAccountsTokenInvalidatedEvent().payloadType}
+
+
+# ─────────────────────────────────────────────
+# 0. Вспомогательные структуры
+# ─────────────────────────────────────────────
+
+@dataclass
+class DaemonStats:
+    connections: int = 0
+    reconnects: int = 0
+    frames: int = 0
+    spot_events: int = 0
+    bars_closed: int = 0
+    last_event: Optional[float] = None      # time.time() последнего спота
+    last_error: str = ""
+
+
+class _RateLimiter:
+    """Не больше per_second запросов в секунду (лимиты Open API: 50/с, история — 5/с)."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second
+        self._next = 0.0
+
+    def reset(self) -> None:
+        """Новое подключение: слоты, занятые запросами оборванной сессии, освобождаются."""
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# ─────────────────────────────────────────────
+# 1. Демон
+# ─────────────────────────────────────────────
+
+class CTraderPriceDaemon:
+    """
+    Состояние в памяти:
+      spots[key]          — {"symbol_name", "bid", "ask", "last", "timestamp"}
+      candles[key][tf]    — deque последних max_candles свечей (кортежи CandleRow)
+      indicators[(key, tf)] — IndicatorEngine по закрытым свечам пары
+
+    Свечи для других процессов — CandleStore на пару (символ, ТФ). Пока стартовая
+    история пары не загружена, живые свечи копятся только в памяти: файл
+    append-only, история должна лечь в него раньше них.
+
+    Один экземпляр = одно подключение. run() — корутина для своего event loop,
+    start() — то же в фоновом потоке (для синхронного кода: Market Engine, скрипты).
+    """
+
+    def __init__(
+        self,
+        config: CTraderConfig,
+        watchlist: Optional[Dict[str, str]] = None,
+        timeframes: Sequence[str] = CANDLE_TIMEFRAMES,
+        history_bars: int = 400,          # ≥ 302: MarketEngine.candle_limit (режимы волатильности)
+        max_candles: int = 500,
+        heartbeat_interval: float = 10.0,
+        request_timeout: float = 10.0,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 60.0,
+        record_path: Optional[Path] = None,
+        spot_table_path: Optional[Path] = SPOTS_TABLE,
+        candle_dir: Optional[Path] = CANDLES_DIR,
+        day_start: int = 0,
+        bar_close_grace: float = 2.0,
+        auth_only: bool = False,
+    ):
+        if auth_only:
+            # сессия без WATCHLIST: не резолвим символы, не подписываемся, общие файлы не трогаем
+            history_bars, spot_table_path, candle_dir = 0, None, None
+        self.auth_only = auth_only
+        self.config = config
+        self.watchlist = dict(watchlist or WATCHLIST)
+        self.timeframes = [tf for tf in timeframes if tf in TRENDBAR_PERIODS and tf in TF_SECONDS]
+        self.history_bars = history_bars
+        self.max_candles = max_candles
+        self.heartbeat_interval = heartbeat_interval
+        self.request_timeout = request_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.record_path = record_path
+        self.spot_table_path = Path(spot_table_path) if spot_table_path is not None else None
+        self.candle_dir = Path(candle_dir) if candle_dir is not None else None
+        self.bar_close_grace = bar_close_grace        # запас на задержку тиков перед закрытием по таймеру
+        self.aggregator = TickAggregator(self.timeframes, day_start=day_start)
+
+        self.symbol_ids: Dict[str, int] = {}          # key → symbolId
+        self.symbol_keys: Dict[int, str] = {}         # symbolId → key
+        self.digits: Dict[int, int] = {}
+        self.spots: Dict[str, Dict] = {}
+        self.candles: Dict[str, Dict[str, Deque[CandleRow]]] = {}
+        self.indicators: Dict[Tuple[str, str], IndicatorEngine] = {}
+        self.stats = DaemonStats()
+        self.ready = threading.Event()                # подписки активны
+
+        self._lock = threading.Lock()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._msg_id = 0
+        self._limit = _RateLimiter(45)
+        self._history_limit = _RateLimiter(4.5)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._recorder: Optional[FrameRecorder] = None
+        self._spot_table: Optional[SpotTable] = None
+        self._stores: Dict[Tuple[str, str], CandleStore] = {}
+        self._synced: Set[Tuple[str, str]] = set()    # пары, у которых файл свечей ведётся вживую
+        self._bar_listeners: List[Callable[[BarClosed], None]] = []
+
+    # ---------- запуск / остановка ----------
+
+    async def run(self) -> None:
+        """Сессии с переподключением, пока не вызван stop()."""
+        self._loop = asyncio.get_running_loop()
+        if self.record_path is not None:
+            self._recorder = FrameRecorder(self.record_path)
+        if self.spot_table_path is not None:
+            self._spot_table = SpotTable.create(self.spot_table_path, self.watchlist.keys())
+        bar_timer = asyncio.create_task(self._bar_timer_loop())
+        delay = self.reconnect_delay
+        try:
+            while not self._stopping:
+                try:
+                    await self._session()
+                except (OSError, ConnectionError, asyncio.IncompleteReadError,
+                        asyncio.TimeoutError, CTraderError) as e:
+                    if self._stopping:
+                        break
+                    self.stats.last_error = f"{type(e).__name__}: {e}"
+                    print(f"[ctrader_daemon] соединение потеряно: {self.stats.last_error}")
+                except Exception as e:  # noqa
+                    if self._stopping:
+                        break
+                    # ошибка не сети, а обработки (декодирование кадра, индикаторы, хранилище):
+                    # поток демона не должен умереть молча, а snapshot() — отдавать старые цены
+                    self.stats.last_error = f"{type(e).__name__}: {e}"
+                    print(f"[ctrader_daemon] ошибка сессии, переподключение:\n{traceback.format_exc()}")
+                    with self._lock:
+                        self.spots.clear()
+                if self.ready.is_set():
+                    delay = self.reconnect_delay   # сессия дошла до подписок — пауза с начала
+                self.ready.clear()
+                if self._stopping:
+                    break
+                self.stats.reconnects += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+        finally:
+            bar_timer.cancel()
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
+            if self._recorder is not None:
+                self._recorder.close()
+            if self._spot_table is not None:
+                self._spot_table.close()
+
+    def start(self) -> "CTraderPriceDaemon":
+        """Запуск в фоновом потоке со своим event loop."""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run()), name="ctrader-daemon", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping = True
+        if self._loop is not None and self._writer is not None:
+            self._loop.call_soon_threadsafe(self._writer.close)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def add_bar_listener(self, callback: Callable[[BarClosed], None]) -> None:
+        """callback(BarClosed) на каждую закрытую свечу — вызывается в потоке демона."""
+        self._bar_listeners.append(callback)
+
+    def call(self, message, timeout: Optional[float] = None):
+        """Синхронный запрос через подключение демона (из другого потока)."""
+        if self._loop is None:
+            raise RuntimeError("Демон не запущен")
+        fut = asyncio.run_coroutine_threadsafe(self.request(message), self._loop)
+        return fut.result(timeout or self.request_timeout + 1)
+
+    # ---------- сессия ----------
+
+    async def _session(self) -> None:
+        cfg = self.config
+        ssl_ctx = ssl.create_default_context() if cfg.use_ssl else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(cfg.host, cfg.port, ssl=ssl_ctx), self.request_timeout
+        )
+        self._writer = writer
+        self.stats.connections += 1
+        self._limit.reset()
+        self._history_limit.reset()
+        receiver = asyncio.create_task(self._read_loop(reader))
+        receiver.add_done_callback(lambda _: self._fail_pending())
+        heartbeat = asyncio.create_task(self._heartbeat_loop())
+        history: Optional[asyncio.Task] = None
+        with self._lock:
+            self._synced.clear()                      # история перезагружается — закроет пробел за время обрыва
+        try:
+            await self._guarded(receiver, self._authenticate())
+            if self.auth_only:
+                self.ready.set()
+                print("[ctrader_daemon] авторизация выполнена (auth_only: без подписок)")
+                await receiver
+                return
+            await self._guarded(receiver, self._resolve_symbols())
+            await self._guarded(receiver, self._subscribe())
+            self.ready.set()
+            print(f"[ctrader_daemon] подписка активна: {len(self.symbol_ids)} символов, ТФ {self.timeframes}")
+            if self.history_bars > 0:
+                history = asyncio.create_task(self._load_all_history())
+            else:
+                with self._lock:
+                    for key in self.symbol_ids:
+                        for tf in self.timeframes:
+                            self._sync_store(key, tf)
+            await receiver
+        finally:
+            for task in (heartbeat, receiver, history):
+                if task is not None:
+                    task.cancel()
+            writer.close()
+            self._writer = None
+            self._fail_pending()
+
+    @staticmethod
+    async def _guarded(receiver: asyncio.Task, coro):
+        """Шаг сессии, который прерывается сразу, как только оборвался приём кадров."""
+        step = asyncio.ensure_future(coro)
+        await asyncio.wait({step, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        if not step.done():
+            step.cancel()
+            await receiver          # пробросит причину обрыва
+        return step.result()
+
+    def _fail_pending(self) -> None:
+        """Соединение закрыто — ожидающие запросы завершаются ошибкой сразу, без таймаута."""
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("соединение закрыто"))
+        self._pending.clear()
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            data = await read_frame(reader)
+            self.stats.frames += 1
+            if self._recorder is not None:
+                self._recorder.write(data)
+            self._dispatch(decode(data))
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self._send(ProtoHeartbeatEvent())
+
+    def _send(self, message, client_msg_id: Optional[str] = None) -> None:
+        if self._writer is None or self._writer.is_closing():
+            raise ConnectionError("нет подключения")
+        self._writer.write(frame(encode(message, client_msg_id)))
+
+    async def request(self, message, history: bool = False):
+        """Запрос → ответ (по clientMsgId); ProtoOAErrorRes превращается в CTraderError."""
+        await (self._history_limit if history else self._limit).wait()
+        self._msg_id += 1
+        msg_id = str(self._msg_id)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = fut
+        try:
+            self._send(message, msg_id)
+            await self._writer.drain()
+            msg = await asyncio.wait_for(fut, self.request_timeout)
+        finally:
+            self._pending.pop(msg_id, None)
+            if fut.done() and not fut.cancelled():
+                fut.exception()     # ошибка обрыва уже обработана сессией — не логировать её повторно
+        payload = extract(msg)
+        if msg.payloadType in _ERROR_TYPES:
+            raise CTraderError(f"{payload.errorCode}: {payload.description}")
+        return payload
+
+    def _dispatch(self, msg) -> None:
+        if msg.HasField("clientMsgId") and msg.clientMsgId in self._pending:
+            fut = self._pending[msg.clientMsgId]
+            if not fut.done():
+                fut.set_result(msg)
+        elif msg.payloadType == _SPOT_TYPE:
+            self._on_spot(extract(msg))
+        elif msg.payloadType in _DROP_TYPES:
+            print(f"[ctrader_daemon] сервер закрыл сессию: {extract(msg)}")
+            self._writer.close()
+        elif msg.payloadType in _ERROR_TYPES:
+            print(f"[ctrader_daemon] ошибка Open API: {extract(msg)}")
+        elif msg.payloadType != HEARTBEAT_TYPE:
+            pass  # прочие события (исполнения, маржа) демону не нужны
+
+    # ---------- авторизация и подписки ----------
+
+    async def _authenticate(self) -> None:
+        cfg = self.config
+        await self.request(ProtoOAApplicationAuthReq(clientId=cfg.app_id, clientSecret=cfg.app_secret))
+        await self.request(ProtoOAAccountAuthReq(ctidTraderAccountId=cfg.account_id, accessToken=cfg.access_token))
+
+    async def _resolve_symbols(self) -> None:
+        cfg = self.config
+        listing = await self.request(ProtoOASymbolsListReq(ctidTraderAccountId=cfg.account_id))
+        by_name = {s.symbolName: s.symbolId for s in listing.symbol}
+        ids: Dict[str, int] = {}
+        for key, name in self.watchlist.items():
+            if name in by_name:
+                ids[key] = by_name[name]
+            else:
+                print(f"[ctrader_daemon] символ {name} ({key}) не найден у брокера — пропущен")
+        if not ids:
+            raise CTraderError("ни один символ WATCHLIST не найден у брокера")
+
+        details = await self.request(ProtoOASymbolByIdReq(ctidTraderAccountId=cfg.account_id, symbolId=list(ids.values())))
+        digits = {s.symbolId: s.digits for s in details.symbol}
+        with self._lock:
+            self.symbol_ids = ids
+            self.symbol_keys = {v: k for k, v in ids.items()}
+            self.digits = {sid: digits.get(sid, 5) for sid in ids.values()}
+
+    async def _subscribe(self) -> None:
+        # одна подписка на символ: свечи всех ТФ строит агрегатор из спотов
+        account = self.config.account_id
+        ids = list(self.symbol_ids.values())
+        await self.request(ProtoOASubscribeSpotsReq(ctidTraderAccountId=account, symbolId=ids))
+
+    async def _load_all_history(self) -> None:
+        """Стартовая история (лимит Open API — 5 исторических запросов/с), в фоне после подписок."""
+        await self._gather_logged("история свечей", [
+            self._load_history(sid, tf) for sid in self.symbol_ids.values() for tf in self.timeframes
+        ])
+
+    @staticmethod
+    async def _gather_logged(what: str, coros) -> None:
+        errors = [r for r in await asyncio.gather(*coros, return_exceptions=True) if isinstance(r, Exception)]
+        if errors:
+            print(f"[ctrader_daemon] {what}: {len(errors)} ошибок, первая — {errors[0]!r}")
+
+    async def _load_history(self, symbol_id: int, tf: str) -> None:
+        key = self.symbol_keys[symbol_id]
+        try:
+            now_ms = int(time.time() * 1000)
+            span_ms = self.history_bars * TF_SECONDS[tf] * 1000 * 3   # с запасом на выходные
+            res = await self.request(ProtoOAGetTrendbarsReq(
+                ctidTraderAccountId=self.config.account_id,
+                symbolId=symbol_id,
+                period=TRENDBAR_PERIODS[tf],
+                fromTimestamp=now_ms - span_ms,
+                toTimestamp=now_ms,
+                count=self.history_bars,
+            ), history=True)
+            digits = self.digits[symbol_id]
+            rows = [trendbar_to_row(bar, digits) for bar in res.trendbar]
+            with self._lock:
+                book = self._candle_book(key, tf)
+                live = [r for r in book if not rows or r[0] > rows[-1][0]]
+                book.clear()
+                book.extend(rows[-self.max_candles:])
+                book.extend(live)
+                # последняя свеча истории может ещё формироваться — агрегатор продолжает её
+                merged = self.aggregator.resume(key, tf, rows[-1], time.time()) if rows else None
+                if merged is not None and book[-1][0] == merged[0]:
+                    book[-1] = merged
+        finally:
+            # и при ошибке запроса: файл дальше ведётся тем, что есть в памяти
+            with self._lock:
+                self._sync_store(key, tf)
+
+    # ---------- события ----------
+
+    def _candle_book(self, key: str, tf: str) -> Deque[CandleRow]:
+        return self.candles.setdefault(key, {}).setdefault(tf, deque(maxlen=self.max_candles))
+
+    def _candle_store(self, key: str, tf: str) -> Optional[CandleStore]:
+        if self.candle_dir is None:
+            return None
+        store = self._stores.get((key, tf))
+        if store is None:
+            store = CandleStore.open_writer(candle_path(self.candle_dir, key, tf), tf_minutes=TF_SECONDS[tf] // 60)
+            self._stores[(key, tf)] = store
+        return store
+
+    def _sync_store(self, key: str, tf: str) -> None:
+        """
+        Свечи пары из памяти → файл (старше последней записи отбрасываются) и
+        прогрев IndicatorEngine по закрытым из них; дальше — вживую.
+        """
+        store = self._candle_store(key, tf)
+        rows = list(self.candles.get(key, {}).get(tf, ()))
+        if store is not None and rows:
+            store.extend(rows)
+        forming = self.aggregator.forming(key, tf)
+        if rows and forming is not None and rows[-1][0] == forming[0]:
+            rows = rows[:-1]
+        engine = IndicatorEngine()
+        if rows:
+            engine.update(pd.DataFrame(rows, columns=["time", "Open", "High", "Low", "Close", "Volume"]))
+        self.indicators[(key, tf)] = engine
+        self._synced.add((key, tf))
+
+    def _put_bar(self, key: str, tf: str, row: CandleRow) -> None:
+        book = self._candle_book(key, tf)
+        if book and book[-1][0] == row[0]:
+            book[-1] = row                     # формирующаяся свеча
+        elif not book or book[-1][0] < row[0]:
+            book.append(row)
+        if (key, tf) in self._synced and self.candle_dir is not None:
+            self._candle_store(key, tf).upsert(*row)
+
+    def _on_bars_closed(self, events: List[BarClosed]) -> None:
+        with self._lock:
+            self.stats.bars_closed += len(events)
+            for ev in events:
+                engine = self.indicators.get((ev.symbol_key, ev.timeframe))
+                if engine is not None:
+                    engine.update(pd.DataFrame({"Close": [ev.close], "Volume": [ev.volume]}))
+        for ev in events:
+            for callback in self._bar_listeners:
+                try:
+                    callback(ev)
+                except Exception as e:  # noqa
+                    print(f"[ctrader_daemon] обработчик закрытия свечи: {e!r}")
+
+    async def _bar_timer_loop(self) -> None:
+        """Закрытие свечей по времени — даже если следующий тик не пришёл (конец сессии)."""
+        while True:
+            await asyncio.sleep(1.0)
+            try:
+                with self._lock:
+                    closed = self.aggregator.close_due(time.time() - self.bar_close_grace)
+                if closed:
+                    self._on_bars_closed(closed)
+            except Exception:  # noqa
+                print(f"[ctrader_daemon] ошибка закрытия свечей по таймеру:\n{traceback.format_exc()}")
+
+    def _on_spot(self, ev) -> None:
+        key = self.symbol_keys.get(ev.symbolId)
+        if key is None:
+            return
+        digits = self.digits.get(ev.symbolId, 5)
+        ts = ev.timestamp / 1000 if ev.HasField("timestamp") else time.time()
+        closed: List[BarClosed] = []
+        with self._lock:
+            prev = self.spots.get(key, {})
+            # Open API присылает только изменившуюся сторону котировки
+            bid = to_price(ev.bid, digits) if ev.HasField("bid") else prev.get("bid")
+            ask = to_price(ev.ask, digits) if ev.HasField("ask") else prev.get("ask")
+            if bid is not None and ask is not None:
+                last = round((bid + ask) / 2, digits)
+                self.spots[key] = {
+                    "symbol_name": self.watchlist[key],
+                    "bid": bid,
+                    "ask": ask,
+                    "last": last,
+                    "timestamp": datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(),
+                }
+                if self._spot_table is not None:
+                    self._spot_table.write(key, bid, ask, last, ts)
+            if bid is not None:
+                closed = self.aggregator.on_tick(key, ts, bid)
+                for tf, row in self.aggregator.forming_rows(key).items():
+                    self._put_bar(key, tf, row)
+        if closed:
+            self._on_bars_closed(closed)
+        self.stats.spot_events += 1
+        self.stats.last_event = time.time()
+
+    # ---------- состояние ----------
+
+    def snapshot(self, symbol_key: str) -> Optional[SymbolSnapshot]:
+        with self._lock:
+            row = self.spots.get(symbol_key)
+            row = dict(row) if row else None
+        if row is None:
+            return None
+        return SymbolSnapshot(
+            symbol_key=symbol_key,
+            symbol_name=row["symbol_name"],
+            bid=row["bid"],
+            ask=row["ask"],
+            last=row["last"],
+            spread=round(row["ask"] - row["bid"], 2),
+            timestamp=datetime.fromisoformat(row["timestamp"]),
+            source="ctrader",
+        )
+
+    def indicator_values(self, symbol_key: str, timeframe: str) -> Dict[str, float]:
+        """Последние EMA / RSI / MACD по закрытым свечам пары (IndicatorEngine.last)."""
+        with self._lock:
+            engine = self.indicators.get((symbol_key, timeframe))
+            return dict(engine.last) if engine is not None else {}
+
+    def recent_bars(self, symbol_key: str, timeframe: str, limit: int = 50) -> np.ndarray:
+        """Последние limit свечей массивом CANDLE_DTYPE (как CandleStore.tail)."""
+        with self._lock:
+            rows = list(self.candles.get(symbol_key, {}).get(timeframe, ()))[-limit:]
+        return np.array(rows, dtype=CANDLE_DTYPE)
+
+    def recent_candles(self, symbol_key: str, timeframe: str, limit: int = 50) -> List[Candle]:
+        with self._lock:
+            rows = list(self.candles.get(symbol_key, {}).get(timeframe, ()))[-limit:]
+        return [
+            Candle(
+                symbol_key=symbol_key,
+                symbol_name=self.watchlist[symbol_key],
+                timeframe=timeframe,
+                time=datetime.fromtimestamp(t, tz=timezone.utc),
+                open=o,
+                high=h,
+                low=l,
+                close=c,
+                volume=v,
+            )
+            for t, o, h, l, c, v in rows
+        ]
@@ -1,5 +1,5 @@
 """
-ctrader_price_source.py — каркас полного модуля cTrader для Market Engine
+ctrader_price_source.py — источник котировок cTrader для Market Engine
 
 Задачи:
 - подключение к cTrader Open API (через библиотеку ctrader-open-api или JSON WebSocket)
@@ -8,21 +8,21 @@ ctrader_price_source.py — каркас полного модуля cTrader д
   - исторических/живых свечей (trendbars) по символу и таймфрейму
 - конвертация в внутренние датаклассы из market_snapshot.py
 
-ВНИМАНИЕ:
-- Этот файл сделан как архитектурный каркас.
-- Конкретные вызовы к cTrader Open API (ProtoOASubscribeSpotsReq,
-  ProtoOAGetTrendbarsReq и т.п.) нужно будет дописать по официальной
-  документации Spotware: https://help.ctrader.com/open-api/symbol-data/
+Живое подключение (авторизация, подписки, переподключение) —
+в ctrader_daemon.py; здесь конфиг, файловый кэш и чтение состояния.
+Документация Spotware: https://help.ctrader.com/open-api/symbol-data/
 """
 
 from __future__ import annotations
 
-import json
 import os
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
 
 # Импортируем модели из market_snapshot
 from trading_ai.services.ctrader.market_snapshot import (
@@ -31,15 +31,8 @@ from trading_ai.services.ctrader.market_snapshot import (
     Timeframe,
     WATCHLIST,
 )
-
-# Если используешь library ctrader-open-api, раскомментируй:
-# from ctrader_open_api import Client, EndPoints, TcpProtocol
-# from ctrader_open_api.messages.OpenApiMessages_pb2 import (
-#     ProtoOASubscribeSpotsReq,
-#     ProtoOAGetTrendbarsReq,
-# )
-# from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoOAPayloadType
-# from ctrader_open_api.messages.OpenApiModelMessages_pb2 import ProtoOATrendbarPeriod
+from trading_ai.services.ctrader.candle_store import CandleStore, candle_path
+from trading_ai.services.ctrader.spot_table import SpotTable
 
 # ─────────────────────────────────────────────
 # 0. Конфигурация cTrader
@@ -53,6 +46,7 @@ class CTraderConfig:
     app_secret: str           # clientSecret
     access_token: str         # OAuth accessToken
     account_id: int           # ctidTraderAccountId
+    use_ssl: bool = True      # False — только для локального fake_openapi_server
 
     @classmethod
     def from_env(cls) -> "CTraderConfig":
@@ -60,13 +54,14 @@ class CTraderConfig:
         Читает настройки из .env.
 
         Обязательные переменные:
-        - CTRADER_APP_ID
-        - CTRADER_APP_SECRET
+        - CTRADER_APP_ID      (или CTRADER_CLIENT_ID, как в скриптах-помощниках)
+        - CTRADER_APP_SECRET  (или CTRADER_CLIENT_SECRET)
         - CTRADER_ACCESS_TOKEN
         - CTRADER_ACCOUNT_ID
         - CTRADER_ENV  ("DEMO" или "LIVE")
 
-        Порт почти всегда EndPoints.PROTOBUF_PORT, но можно вынести явно.
+        Необязательные: CTRADER_HOST / CTRADER_PORT / CTRADER_SSL=0
+        (например, для локального fake_openapi_server).
         """
         env = os.getenv("CTRADER_ENV", "DEMO").upper()
 
@@ -76,21 +71,23 @@ class CTraderConfig:
         # else:
         #     host = EndPoints.PROTOBUF_DEMO_HOST
 
-        # Чтобы не тащить EndPoints сюда, зададим строками:
+        # Чтобы не тащить EndPoints сюда, зададим строками (как EndPoints.PROTOBUF_*_HOST):
         if env == "LIVE":
-            host = "prime-datapath.ctrader.com"
+            host = "live.ctraderapi.com"
         else:
-            host = "demo-datapath.ctrader.com"
+            host = "demo.ctraderapi.com"
+        host = os.getenv("CTRADER_HOST", host)
 
         port = int(os.getenv("CTRADER_PORT", "5035"))
 
         return cls(
             host=host,
             port=port,
-            app_id=os.environ["CTRADER_APP_ID"],
-            app_secret=os.environ["CTRADER_APP_SECRET"],
+            app_id=os.getenv("CTRADER_APP_ID") or os.environ["CTRADER_CLIENT_ID"],
+            app_secret=os.getenv("CTRADER_APP_SECRET") or os.environ["CTRADER_CLIENT_SECRET"],
             access_token=os.environ["CTRADER_ACCESS_TOKEN"],
             account_id=int(os.environ["CTRADER_ACCOUNT_ID"]),
+            use_ssl=os.getenv("CTRADER_SSL", "1") != "0",
         )
 
 
@@ -106,10 +103,11 @@ class CTraderConfig:
 
 - подключается к Open API
 - подписывается на нужные символы
-- при каждом ProtoOASpotEvent/Trendbar обновляет JSON-файл с последними
-  ценами и свечами.
+- при каждом ProtoOASpotEvent пишет котировку в mmap-таблицу SPOTS_TABLE
+  (слот на символ, seqlock — см. spot_table.py), свечи — в бинарные
+  файлы CANDLES_DIR (по файлу на символ × таймфрейм, см. candle_store.py).
 
-А Market Engine читает УЖЕ ГОТОВЫЙ JSON и строит SymbolSnapshot/Candle.
+А Market Engine читает УЖЕ ГОТОВЫЕ данные и строит SymbolSnapshot/Candle.
 
 Так мы разделяем:
 - сложный асинхронный слой cTrader
@@ -119,24 +117,38 @@ class CTraderConfig:
 DATA_DIR = Path(os.getenv("TRADING_AI_DATA_DIR", ".")) / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-SPOTS_JSON = DATA_DIR / "ctrader_spots.json"
-CANDLES_JSON = DATA_DIR / "ctrader_candles.json"
+SPOTS_TABLE = DATA_DIR / "ctrader_spots.bin"
+CANDLES_DIR = DATA_DIR / "candles"
 
 
-def _load_json(path: Path) -> Dict:
-    if not path.exists():
-        return {}
-    try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+# Демон, запущенный в этом же процессе (start_daemon) — читаем его память, а не файлы
+_ACTIVE_DAEMON = None
+
+# Таблица котировок, отображённая в память этого процесса (открывается при первом чтении)
+_SPOT_TABLE: Optional[SpotTable] = None
+
+
+def _spot_table() -> Optional[SpotTable]:
+    global _SPOT_TABLE
+    if _SPOT_TABLE is not None and _SPOT_TABLE.stale:
+        _SPOT_TABLE.close()
+        _SPOT_TABLE = None
+    if _SPOT_TABLE is None:
+        _SPOT_TABLE = SpotTable.open(SPOTS_TABLE)
+    return _SPOT_TABLE
+
+
+# Файлы свечей, отображённые в память этого процесса: (symbol_key, tf) → CandleStore
+_CANDLE_STORES: Dict[tuple, CandleStore] = {}
 
 
-def _save_json(path: Path, data: Dict) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+def _candle_store(symbol_key: str, timeframe: str) -> Optional[CandleStore]:
+    store = _CANDLE_STORES.get((symbol_key, timeframe))
+    if store is None:
+        store = CandleStore.open_reader(candle_path(CANDLES_DIR, symbol_key, timeframe))
+        if store is not None:
+            _CANDLE_STORES[(symbol_key, timeframe)] = store
+    return store
 
 
 # ─────────────────────────────────────────────
@@ -145,39 +157,30 @@ def _save_json(path: Path, data: Dict) -> None:
 
 def get_realtime_snapshot(symbol_key: str) -> Optional[SymbolSnapshot]:
     """
-    Возвращает актуальный snapshot из JSON-кэша,
-    который обновляется отдельным cTrader-демоном.
-
-    Формат SPOTS_JSON:
-    {
-      "US30": {
-        "symbol_name": "US30",
-        "bid": 39012.5,
-        "ask": 39013.0,
-        "last": 39012.5,
-        "timestamp": "2025-11-29T12:34:56.789123+00:00"
-      },
-      ...
-    }
+    Возвращает актуальный snapshot из таблицы котировок SPOTS_TABLE,
+    которую на каждом тике обновляет cTrader-демон (или из памяти демона,
+    если он запущен в этом процессе). Чтение слота — без JSON и блокировок.
     """
-    spots = _load_json(SPOTS_JSON)
-    row = spots.get(symbol_key)
-    if not row:
+    if _ACTIVE_DAEMON is not None:
+        snap = _ACTIVE_DAEMON.snapshot(symbol_key)
+        if snap is not None:
+            return snap
+
+    table = _spot_table()
+    row = table.read(symbol_key) if table is not None else None
+    if row is None:
         return None
 
-    try:
-        ts = datetime.fromisoformat(row["timestamp"])
-    except Exception:
-        ts = datetime.now(timezone.utc)
-
+    bid, ask, last, ts = row
     return SymbolSnapshot(
         symbol_key=symbol_key,
-        symbol_name=row.get("symbol_name", WATCHLIST[symbol_key]),
-        bid=float(row["bid"]),
-        ask=float(row["ask"]),
-        last=float(row["last"]),
-        spread=round(float(row["ask"]) - float(row["bid"]), 2),
-        timestamp=ts,
+        symbol_name=WATCHLIST[symbol_key],
+        bid=bid,
+        ask=ask,
+        last=last,
+        spread=round(ask - bid, 2),
+        timestamp=datetime.fromtimestamp(ts, tz=timezone.utc),
+        source="ctrader",
     )
 
 
@@ -187,104 +190,116 @@ def get_realtime_candles(
     limit: int = 50,
 ) -> List[Candle]:
     """
-    Возвращает свечи из JSON-кэша, которые обновляет cTrader-демон.
-
-    Формат CANDLES_JSON:
-    {
-      "US30": {
-        "M15": [
-          {
-            "time": "2025-11-29T12:30:00+00:00",
-            "open": 39000.0,
-            "high": 39010.0,
-            "low": 38990.0,
-            "close": 39005.0,
-            "volume": 1234.0
-          },
-          ...
-        ]
-      },
-      ...
-    }
+    Возвращает свечи из файла CANDLES_DIR/<symbol>_<tf>.bin, который ведёт
+    cTrader-демон: читаются только последние limit записей отображённого файла.
     """
-    store = _load_json(CANDLES_JSON)
-    sym_block = store.get(symbol_key, {})
-    tf_block = sym_block.get(timeframe, [])
-    result: List[Candle] = []
-
-    for row in tf_block[-limit:]:
-        try:
-            t = datetime.fromisoformat(row["time"])
-        except Exception:
-            t = datetime.now(timezone.utc)
-        result.append(
-            Candle(
-                symbol_key=symbol_key,
-                symbol_name=WATCHLIST[symbol_key],
-                timeframe=timeframe,
-                time=t,
-                open=float(row["open"]),
-                high=float(row["high"]),
-                low=float(row["low"]),
-                close=float(row["close"]),
-                volume=float(row.get("volume", 0.0)),
-            )
+    if _ACTIVE_DAEMON is not None:
+        candles = _ACTIVE_DAEMON.recent_candles(symbol_key, timeframe, limit)
+        if candles:
+            return candles
+
+    store = _candle_store(symbol_key, timeframe)
+    if store is None:
+        return []
+
+    return [
+        Candle(
+            symbol_key=symbol_key,
+            symbol_name=WATCHLIST[symbol_key],
+            timeframe=timeframe,
+            time=datetime.fromtimestamp(int(t), tz=timezone.utc),
+            open=float(o),
+            high=float(h),
+            low=float(l),
+            close=float(c),
+            volume=float(v),
         )
+        for t, o, h, l, c, v in store.tail(limit, copy=True).tolist()
+    ]
 
+
+def get_realtime_candle_arrays(
+    symbol_keys: Sequence[str],
+    timeframes: Sequence[Timeframe],
+    limit: int = 50,
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Последние limit свечей по всем парам (символ, таймфрейм) одним проходом:
+    {symbol_key: {tf: массив CANDLE_DTYPE}}. Пары без файла не попадают в результат.
+    Файлы уже отображены в память — на пару одна копия limit записей.
+    """
+    result: Dict[str, Dict[str, np.ndarray]] = {}
+    for symbol_key in symbol_keys:
+        block: Dict[str, np.ndarray] = {}
+        for tf in timeframes:
+            bars = _ACTIVE_DAEMON.recent_bars(symbol_key, tf, limit) if _ACTIVE_DAEMON is not None else None
+            if bars is None or len(bars) == 0:
+                store = _candle_store(symbol_key, tf)
+                bars = store.tail(limit, copy=True) if store is not None else None
+            if bars is not None and len(bars):
+                block[tf] = bars
+        result[symbol_key] = block
     return result
 
 
+def get_realtime_candle_frame(
+    symbol_key: str,
+    timeframe: Timeframe,
+    limit: Optional[int] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Последние limit свечей (все — при None) из файла демона сразу в DataFrame
+    (open/high/low/close/volume, индекс — время UTC) — без объектов Candle.
+    """
+    store = _candle_store(symbol_key, timeframe)
+    return store.frame(limit) if store is not None else None
+
+
 # ─────────────────────────────────────────────
-# 3. TODO: сам cTrader-демон (live-интеграция)
+# 3. cTrader-демон (live-интеграция)
 # ─────────────────────────────────────────────
 
-"""
-Здесь должна жить логика:
-
-- создать Client(…)
-- подключиться к демо/лайв хосту
-- пройти:
-    ProtoOAApplicationAuthReq  (app_id/app_secret)
-    ProtoOAAccountAuthReq      (access_token, account_id)
-- получить список символов (ProtoOASymbolsListReq) → маппинг symbol_name → symbol_id
-- подписаться:
-    ProtoOASubscribeSpotsReq          (для bid/ask/last)
-    ProtoOASubscribeLiveTrendbarReq   (для лайв свечей)
-
-- в onMessage / обработчике ProtoOASpotEvent:
-    * пересчитать bid/ask/last из "relative" в цену (делим на 100000, округляем по digits)
-    * обновить dict latest_spots
-    * сохранить latest_spots в SPOTS_JSON через _save_json
-
-- в обработчике ProtoOAGetTrendbarsRes / live trendbars:
-    * аналогично пересчитать O/H/L/C из relative формата (см. docs)
-    * обновить latest_candles
-    * сохранить latest_candles в CANDLES_JSON
-
-Пример Python-обработки исторических свечей есть в официальной документации
-("Attain symbol data" → блок Python с ProtoOAGetTrendbarsReq / onHistoricalTrendbarsReceived).
-Там показан расчёт реальных цен из относительных значений.
-"""
+def start_daemon(config: Optional[CTraderConfig] = None, **kwargs):
+    """
+    Поднимает CTraderPriceDaemon в фоновом потоке этого процесса:
+    get_realtime_snapshot / get_realtime_candles начинают читать его память.
+    """
+    global _ACTIVE_DAEMON
+    from trading_ai.services.ctrader.ctrader_daemon import CTraderPriceDaemon
+
+    daemon = CTraderPriceDaemon(config or CTraderConfig.from_env(), **kwargs).start()
+    _ACTIVE_DAEMON = daemon
+    return daemon
 
 
 def run_ctrader_daemon() -> None:
     """
-    Заготовка точки входа для отдельного процесса cTrader-демона.
-
-    План:
-    - прочитать конфиг: cfg = CTraderConfig.from_env()
-    - создать Client / WebSocket
-    - запустить подключение и цикл обработки
-    - внутри обработчиков постоянно обновлять SPOTS_JSON и CANDLES_JSON
-
-    Сейчас функция — заглушка, чтобы не ломать импорт.
+    Точка входа для отдельного процесса cTrader-демона:
+    одно подключение, подписки на весь WATCHLIST, состояние сбрасывается
+    в SPOTS_TABLE / CANDLES_DIR, откуда его читают остальные процессы.
+
+    CTRADER_RECORD=<файл> — дополнительно записывать входящие кадры
+    (для повтора через fake_openapi_server.py).
+    CTRADER_DAY_START=<минуты от 00:00 UTC> — начало торгового дня брокера
+    (граница свечей D1/H4 в агрегаторе), по умолчанию 0.
     """
-    print("[ctrader_price_source] TODO: реализовать run_ctrader_daemon() с реальным подключением к cTrader.")
-    print("Смотри комментарии в этом файле и официальную документацию Open API.")
-    
+    import asyncio
+    from trading_ai.services.ctrader.ctrader_daemon import CTraderPriceDaemon
+
+    record = os.getenv("CTRADER_RECORD")
+    daemon = CTraderPriceDaemon(
+        CTraderConfig.from_env(),
+        record_path=Path(record) if record else None,
+        day_start=int(os.getenv("CTRADER_DAY_START", "0")),
+    )
+    try:
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        print("[ctrader_price_source] демон остановлен.")
+
 
 if __name__ == "__main__":
     # При запуске:
     #   python -m trading_ai.services.ctrader.ctrader_price_source
-    # можно будет поднимать отдельный демон.
+    # поднимается отдельный демон.
     run_ctrader_daemon()
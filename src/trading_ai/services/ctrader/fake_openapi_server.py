@@ -0,0 +1,372 @@
+"""
+fake_openapi_server.py — локальный стенд cTrader Open API
+
+Что делает:
+- слушает TCP (без TLS) и говорит тем же протоколом: 4 байта длины + ProtoMessage
+- отвечает на ApplicationAuth / AccountAuth / SymbolsList / SymbolById /
+  SubscribeSpots / SubscribeLiveTrendbar / GetTrendbars
+  (ответы берутся из записи сессии, если они там есть)
+- после подписки на спот повторяет записанные ProtoOASpotEvent —
+  в реальном темпе (speed=1), ускоренно или без пауз (speed=None)
+- drop_after / drops — рвёт соединение, чтобы проверить переподключение демона
+
+Запись сессии делает сам демон (CTRADER_RECORD=<файл>), синтетическую —
+synthetic_spot_frames().
+
+Запуск:
+    python -m trading_ai.services.ctrader.fake_openapi_server --synthetic 100000 --port 5035
+    CTRADER_HOST=127.0.0.1 CTRADER_SSL=0 python -m trading_ai.services.ctrader.ctrader_price_source
+
+    python -m trading_ai.services.ctrader.fake_openapi_server --synthetic 200000 --bench
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoMessage
+from ctrader_open_api.messages.OpenApiMessages_pb2 import (
+    ProtoOAAccountAuthReq,
+    ProtoOAAccountAuthRes,
+    ProtoOAApplicationAuthReq,
+    ProtoOAApplicationAuthRes,
+    ProtoOAErrorRes,
+    ProtoOAGetTrendbarsReq,
+    ProtoOAGetTrendbarsRes,
+    ProtoOASpotEvent,
+    ProtoOASubscribeLiveTrendbarReq,
+    ProtoOASubscribeLiveTrendbarRes,
+    ProtoOASubscribeSpotsReq,
+    ProtoOASubscribeSpotsRes,
+    ProtoOASymbolByIdReq,
+    ProtoOASymbolByIdRes,
+    ProtoOASymbolsListReq,
+    ProtoOASymbolsListRes,
+)
+from ctrader_open_api.messages.OpenApiModelMessages_pb2 import ProtoOALightSymbol, ProtoOASymbol, ProtoOATrendbar
+
+from trading_ai.services.ctrader.market_snapshot import WATCHLIST
+from trading_ai.services.ctrader.openapi_wire import (
+    HEARTBEAT_TYPE,
+    PRICE_SCALE,
+    TRENDBAR_PERIODS,
+    decode,
+    encode,
+    extract,
+    frame,
+    read_frame,
+    read_recording,
+)
+
+Frames = List[Tuple[float, bytes]]
+
+_SPOT_TYPE = ProtoOASpotEvent().payloadType
+_DRAIN_EVERY = 256          # кадров между await drain() при повторе
+
+
+# ─────────────────────────────────────────────
+# 1. Синтетическая запись
+# ─────────────────────────────────────────────
+
+def default_symbols() -> Dict[str, int]:
+    """SYMBOL_NAME WATCHLIST → symbolId 1..N."""
+    return {name: i + 1 for i, name in enumerate(WATCHLIST.values())}
+
+
+def synthetic_spot_frames(
+    symbols: Optional[Dict[str, int]] = None,
+    n_events: int = 10_000,
+    digits: int = 2,
+    seed: int = 0,
+    start: Optional[float] = None,
+    step: float = 0.05,
+    trendbar_tf: Optional[str] = "M1",
+) -> Frames:
+    """
+    Спот-события случайного блуждания по символам по кругу (как пришли бы
+    от сервера после подписки), с live trendbar trendbar_tf в каждом событии.
+    """
+    symbols = symbols or default_symbols()
+    ids = list(symbols.values())
+    rng = np.random.default_rng(seed)
+    start = time.time() if start is None else start
+    scale = 10 ** digits
+    unit = PRICE_SCALE // scale                    # шаг цены в единицах Open API
+
+    mids = {sid: 1000.0 + 100.0 * k for k, sid in enumerate(ids)}
+    bars: Dict[int, List[int]] = {}                # sid → [minute, open, high, low, close, volume]
+    steps = rng.normal(0.0, 0.5, n_events)
+    frames: Frames = []
+    for i in range(n_events):
+        sid = ids[i % len(ids)]
+        ts = start + i * step
+        mids[sid] = max(mids[sid] + steps[i], 1.0)
+        mid = int(round(mids[sid] * scale)) * unit
+        bid, ask = mid - unit, mid + unit
+
+        ev = ProtoOASpotEvent(ctidTraderAccountId=1, symbolId=sid, bid=bid, ask=ask, timestamp=int(ts * 1000))
+        if trendbar_tf is not None:
+            minutes = {"M1": 1, "M5": 5, "M15": 15}[trendbar_tf]
+            minute = int(ts // 60) // minutes * minutes
+            bar = bars.get(sid)
+            if bar is None or bar[0] != minute:
+                bar = bars[sid] = [minute, bid, bid, bid, bid, 0]
+            bar[2], bar[3], bar[4], bar[5] = max(bar[2], bid), min(bar[3], bid), bid, bar[5] + 1
+            ev.trendbar.append(ProtoOATrendbar(
+                period=TRENDBAR_PERIODS[trendbar_tf], utcTimestampInMinutes=minute, volume=bar[5],
+                low=bar[3], deltaOpen=bar[1] - bar[3], deltaHigh=bar[2] - bar[3], deltaClose=bar[4] - bar[3],
+            ))
+        frames.append((ts, encode(ev)))
+    return frames
+
+
+# ─────────────────────────────────────────────
+# 2. Сервер
+# ─────────────────────────────────────────────
+
+class FakeOpenApiServer:
+    """
+    recording — кадры [(время, ProtoMessage)] или путь к записи демона.
+    Из записи берутся ответы (список символов, digits, история свечей) и
+    спот-события для повтора; чего в записи нет — генерируется из symbols/digits.
+
+    Повтор продолжается с того же места после переподключения (как живой поток).
+    """
+
+    def __init__(
+        self,
+        recording: Union[Frames, Path, str, None] = None,
+        symbols: Optional[Dict[str, int]] = None,
+        digits: Union[int, Dict[int, int]] = 2,
+        speed: Optional[float] = None,
+        drop_after: Optional[int] = None,
+        drops: int = 0,
+        loop_replay: bool = False,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        if isinstance(recording, (str, Path)):
+            recording = read_recording(Path(recording))
+        self.symbols = symbols or default_symbols()
+        self.digits = digits
+        self.speed = speed
+        self.drop_after = drop_after
+        self.drops_left = drops
+        self.loop_replay = loop_replay
+        self.host = host
+        self.port = port
+
+        self.events: Frames = []
+        self.symbols_list: Optional[ProtoOASymbolsListRes] = None
+        self.symbol_details: Dict[int, ProtoOASymbol] = {}
+        self.history: Dict[Tuple[int, int], ProtoOAGetTrendbarsRes] = {}
+        self._load(recording or [])
+
+        self.connections = 0
+        self.frames_sent = 0
+        self.requests = 0
+        self.finished = asyncio.Event()           # все события отправлены (без loop_replay)
+        self._cursor = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def _load(self, recording: Frames) -> None:
+        for ts, data in recording:
+            msg = decode(data)
+            if msg.payloadType == _SPOT_TYPE:
+                self.events.append((ts, data))
+            elif msg.payloadType == ProtoOASymbolsListRes().payloadType:
+                self.symbols_list = extract(msg)
+            elif msg.payloadType == ProtoOASymbolByIdRes().payloadType:
+                for s in extract(msg).symbol:
+                    self.symbol_details[s.symbolId] = s
+            elif msg.payloadType == ProtoOAGetTrendbarsRes().payloadType:
+                res = extract(msg)
+                self.history[(res.symbolId, res.period)] = res
+
+    # ---------- жизненный цикл ----------
+
+    async def start(self) -> Tuple[str, int]:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.host, self.port
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # ---------- соединение ----------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        replay: Optional[asyncio.Task] = None
+        try:
+            while True:
+                msg = decode(await read_frame(reader))
+                if msg.payloadType == HEARTBEAT_TYPE:
+                    continue
+                self.requests += 1
+                response = self._respond(msg)
+                client_msg_id = msg.clientMsgId if msg.HasField("clientMsgId") else None
+                writer.write(frame(encode(response, client_msg_id)))
+                if isinstance(response, ProtoOASubscribeSpotsRes) and replay is None:
+                    replay = asyncio.create_task(self._replay(writer))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if replay is not None:
+                replay.cancel()
+            writer.close()
+
+    def _respond(self, msg: ProtoMessage):
+        req = extract(msg)
+        if isinstance(req, ProtoOAApplicationAuthReq):
+            return ProtoOAApplicationAuthRes()
+        if isinstance(req, ProtoOAAccountAuthReq):
+            return ProtoOAAccountAuthRes(ctidTraderAccountId=req.ctidTraderAccountId)
+        if isinstance(req, ProtoOASymbolsListReq):
+            if self.symbols_list is not None:
+                return self.symbols_list
+            return ProtoOASymbolsListRes(
+                ctidTraderAccountId=req.ctidTraderAccountId,
+                symbol=[ProtoOALightSymbol(symbolId=sid, symbolName=name, enabled=True)
+                        for name, sid in self.symbols.items()],
+            )
+        if isinstance(req, ProtoOASymbolByIdReq):
+            return ProtoOASymbolByIdRes(
+                ctidTraderAccountId=req.ctidTraderAccountId,
+                symbol=[self._symbol_details(sid) for sid in req.symbolId],
+            )
+        if isinstance(req, ProtoOASubscribeSpotsReq):
+            return ProtoOASubscribeSpotsRes(ctidTraderAccountId=req.ctidTraderAccountId)
+        if isinstance(req, ProtoOASubscribeLiveTrendbarReq):
+            return ProtoOASubscribeLiveTrendbarRes(ctidTraderAccountId=req.ctidTraderAccountId)
+        if isinstance(req, ProtoOAGetTrendbarsReq):
+            recorded = self.history.get((req.symbolId, req.period))
+            if recorded is not None:
+                return recorded
+            return ProtoOAGetTrendbarsRes(
+                ctidTraderAccountId=req.ctidTraderAccountId, period=req.period,
+                timestamp=req.toTimestamp, symbolId=req.symbolId,
+            )
+        return ProtoOAErrorRes(errorCode="UNSUPPORTED_MESSAGE", description=type(req).__name__)
+
+    def _symbol_details(self, symbol_id: int) -> ProtoOASymbol:
+        if symbol_id in self.symbol_details:
+            return self.symbol_details[symbol_id]
+        digits = self.digits.get(symbol_id, 2) if isinstance(self.digits, dict) else self.digits
+        return ProtoOASymbol(symbolId=symbol_id, digits=digits, pipPosition=max(digits - 1, 0))
+
+    async def _replay(self, writer: asyncio.StreamWriter) -> None:
+        """Повтор спот-событий с текущей позиции; speed=None — без пауз (замер пропускной способности)."""
+        sent = 0
+        prev_ts: Optional[float] = None
+        while self._cursor < len(self.events):
+            ts, data = self.events[self._cursor]
+            if self.speed and prev_ts is not None and ts > prev_ts:
+                await asyncio.sleep((ts - prev_ts) / self.speed)
+            prev_ts = ts
+            writer.write(frame(data))
+            self._cursor += 1
+            self.frames_sent += 1
+            sent += 1
+            if self.drop_after and self.drops_left > 0 and sent >= self.drop_after:
+                self.drops_left -= 1
+                await writer.drain()
+                writer.transport.abort()            # обрыв «сети» посреди потока
+                return
+            if sent % _DRAIN_EVERY == 0:
+                await writer.drain()
+            if self._cursor == len(self.events) and self.loop_replay:
+                self._cursor = 0
+        await writer.drain()
+        self.finished.set()
+
+
+# ─────────────────────────────────────────────
+# 3. Замер: сервер + демон в одном процессе
+# ─────────────────────────────────────────────
+
+async def run_benchmark(server: FakeOpenApiServer, timeout: float = 120.0) -> Dict[str, float]:
+    """Прогон всех событий записи через CTraderPriceDaemon: события/с, переподключения."""
+    from trading_ai.services.ctrader.ctrader_daemon import CTraderPriceDaemon
+    from trading_ai.services.ctrader.ctrader_price_source import CTraderConfig
+
+    host, port = await server.start()
+    cfg = CTraderConfig(host=host, port=port, app_id="fake", app_secret="fake",
+                        access_token="fake", account_id=1, use_ssl=False)
+    tmp = Path(tempfile.mkdtemp(prefix="fake_openapi_"))
+    daemon = CTraderPriceDaemon(
+        cfg, history_bars=0, reconnect_delay=0.05,
+        spot_table_path=tmp / "spots.bin", candle_dir=tmp / "candles",
+    )
+    runner = asyncio.create_task(daemon.run())
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(server.finished.wait(), timeout)
+        # дочитать хвост: ждём, пока счётчик демона не догонит сервер или не перестанет расти
+        seen = -1
+        while daemon.stats.spot_events < server.frames_sent and daemon.stats.spot_events != seen:
+            seen = daemon.stats.spot_events
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+    finally:
+        daemon._stopping = True
+        if daemon._writer is not None:
+            daemon._writer.close()
+        await asyncio.wait_for(runner, 10.0)
+        await server.close()
+
+    return {
+        "events_sent": float(server.frames_sent),
+        "events_received": float(daemon.stats.spot_events),
+        "seconds": round(elapsed, 3),
+        "events_per_sec": round(daemon.stats.spot_events / elapsed, 1),
+        "connections": float(daemon.stats.connections),
+        "reconnects": float(daemon.stats.reconnects),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake cTrader Open API server (replay)")
+    parser.add_argument("--recording", type=Path, default=None, help="запись демона (CTRADER_RECORD)")
+    parser.add_argument("--synthetic", type=int, default=0, help="сгенерировать N спот-событий")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5035)
+    parser.add_argument("--speed", type=float, default=None, help="1 = реальный темп, по умолчанию без пауз")
+    parser.add_argument("--drop-after", type=int, default=None)
+    parser.add_argument("--drops", type=int, default=0)
+    parser.add_argument("--loop", action="store_true", help="повторять запись по кругу")
+    parser.add_argument("--bench", action="store_true", help="прогнать запись через демон и вывести замер")
+    args = parser.parse_args(argv)
+
+    frames: Frames = list(read_recording(args.recording)) if args.recording else []
+    if args.synthetic:
+        frames += synthetic_spot_frames(n_events=args.synthetic)
+
+    async def _run() -> None:
+        server = FakeOpenApiServer(
+            frames, speed=args.speed, drop_after=args.drop_after, drops=args.drops,
+            loop_replay=args.loop and not args.bench, host=args.host, port=0 if args.bench else args.port,
+        )
+        if args.bench:
+            print(await run_benchmark(server))
+            return
+        host, port = await server.start()
+        print(f"🧪 Fake Open API: {host}:{port}, событий в записи: {len(server.events)}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
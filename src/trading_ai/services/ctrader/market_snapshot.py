@@ -6,6 +6,7 @@ market_snapshot.py — FULL Market Engine v1 + Candle Engine
 - единый интерфейс получения:
   - snapshot по символу (bid/ask/last/spread/время)
   - набор свечей по символу и таймфрейму
+  - пакетный срез свечей всех символов × таймфреймов за цикл (CandleBatch)
 
 Сейчас:
 - по умолчанию используются фейковые данные (заглушки), чтобы всё работало и
@@ -22,20 +23,13 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
-from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Literal, Optional
-
-# Попытка импортировать источник реальных котировок
-try:
-    from trading_ai.services.ctrader.ctrader_price_source import (
-        get_realtime_snapshot,
-        get_realtime_candles,
-    )
-except Exception:
-    # Если что-то пошло не так — просто работаем на фейках
-    get_realtime_snapshot = None  # type: ignore
-    get_realtime_candles = None  # type: ignore
+from datetime import datetime, timezone
+from typing import Dict, List, Literal, Optional, Sequence
+
+import numpy as np
+import pandas as pd
 
+from .candle_store import CANDLE_DTYPE      # относительный импорт: модуль грузится и как src.trading_ai
 
 # ─────────────────────────────────────────────
 # 0. Флаг использования cTrader
@@ -86,6 +80,7 @@ class SymbolSnapshot:
     last: float
     spread: float
     timestamp: datetime
+    source: str = "fake"   # "ctrader" — живые котировки, "fake" — заглушка
 
 
 @dataclass
@@ -101,6 +96,19 @@ class Candle:
     volume: float
 
 
+# Источник реальных котировок импортируется при первом обращении:
+# ctrader_price_source сам импортирует WATCHLIST / SymbolSnapshot / Candle
+# из этого модуля, и импорт на уровне модуля ломался бы при любом порядке загрузки.
+def _realtime_source():
+    """(get_realtime_snapshot, get_realtime_candles, get_realtime_candle_arrays) или (None, None, None)."""
+    try:
+        from trading_ai.services.ctrader import ctrader_price_source as src
+    except Exception:
+        # Если что-то пошло не так — просто работаем на фейках
+        return None, None, None
+    return src.get_realtime_snapshot, src.get_realtime_candles, src.get_realtime_candle_arrays
+
+
 # ─────────────────────────────────────────────
 # 3. Фейковые данные (заглушки)
 # ─────────────────────────────────────────────
@@ -151,58 +159,72 @@ def _fake_symbol_snapshot(symbol_key: str) -> SymbolSnapshot:
     )
 
 
-def _fake_symbol_candles(
+_TF_SECONDS: Dict[str, int] = {
+    "M5": 5 * 60,
+    "M15": 15 * 60,
+    "M30": 30 * 60,
+    "H1": 60 * 60,
+    "H4": 4 * 60 * 60,
+    "D1": 24 * 60 * 60,
+}
+
+
+_FAKE_BAR_STEP = 0.0005      # рост фейковой свечи, доля цены
+
+
+def _fake_symbol_bars(
     symbol_key: str,
     timeframe: Timeframe,
     limit: int = 50,
-) -> List[Candle]:
+) -> np.ndarray:
     """
-    Фейковые свечи: лёгкий тренд вверх для отладки.
+    Фейковые свечи массивом CANDLE_DTYPE: лёгкий тренд вверх для отладки.
+    Шаг — доля от base_price (геометрический), поэтому цены положительны
+    при любом limit и у любого инструмента (EURUSD ~1.09, US30 ~39000).
     """
+    base_price = _fake_symbol_snapshot(symbol_key).last
+    now = int(datetime.now(timezone.utc).timestamp())
+    i = np.arange(limit)
+    step = _FAKE_BAR_STEP
+
+    bars = np.empty(limit, dtype=CANDLE_DTYPE)
+    price = base_price * (1.0 + step) ** (i - limit // 2)  # немного в прошлое, +step за свечу
+    bars["time"] = now - _TF_SECONDS[timeframe] * (limit - 1 - i)
+    bars["open"] = np.round(price, 5)
+    bars["high"] = np.round(price * (1.0 + 3 * step), 5)
+    bars["low"] = np.round(price * (1.0 - 3 * step), 5)
+    bars["close"] = np.round(price * (1.0 + step), 5)
+    bars["volume"] = 100 + i * 10
+    return bars
+
+
+def _bars_to_candles(symbol_key: str, timeframe: Timeframe, bars: np.ndarray) -> List[Candle]:
     symbol_name = WATCHLIST[symbol_key]
-
-    base_snapshot = _fake_symbol_snapshot(symbol_key)
-    base_price = base_snapshot.last
-
-    now = datetime.now(timezone.utc)
-
-    tf_to_delta = {
-        "M5": timedelta(minutes=5),
-        "M15": timedelta(minutes=15),
-        "M30": timedelta(minutes=30),
-        "H1": timedelta(hours=1),
-        "H4": timedelta(hours=4),
-        "D1": timedelta(days=1),
-    }
-    step = tf_to_delta[timeframe]
-
-    candles: List[Candle] = []
-    price = base_price - (limit // 2)  # немного в прошлое
-
-    for i in range(limit):
-        t = now - step * (limit - 1 - i)
-        o = round(price, 2)
-        h = round(price + 3, 2)
-        l = round(price - 3, 2)
-        c = round(price + 1, 2)
-        v = 100 + i * 10
-
-        candles.append(
-            Candle(
-                symbol_key=symbol_key,
-                symbol_name=symbol_name,
-                timeframe=timeframe,
-                time=t,
-                open=o,
-                high=h,
-                low=l,
-                close=c,
-                volume=v,
-            )
+    return [
+        Candle(
+            symbol_key=symbol_key,
+            symbol_name=symbol_name,
+            timeframe=timeframe,
+            time=datetime.fromtimestamp(t, tz=timezone.utc),
+            open=o,
+            high=h,
+            low=l,
+            close=c,
+            volume=v,
         )
-        price += 1  # лёгкий тренд вверх
+        for t, o, h, l, c, v in bars.tolist()
+    ]
+
 
-    return candles
+def _fake_symbol_candles(
+    symbol_key: str,
+    timeframe: Timeframe,
+    limit: int = 50,
+) -> List[Candle]:
+    """
+    Фейковые свечи: лёгкий тренд вверх для отладки.
+    """
+    return _bars_to_candles(symbol_key, timeframe, _fake_symbol_bars(symbol_key, timeframe, limit))
 
 
 # ─────────────────────────────────────────────
@@ -221,7 +243,8 @@ def get_symbol_snapshot(symbol_key: str) -> SymbolSnapshot:
         raise KeyError(f"Unknown symbol_key: {symbol_key}")
 
     # Путь 1: реальный cTrader
-    if CTRADER_ENABLED and get_realtime_snapshot is not None:
+    get_realtime_snapshot = _realtime_source()[0] if CTRADER_ENABLED else None
+    if get_realtime_snapshot is not None:
         try:
             snap = get_realtime_snapshot(symbol_key)
             if snap is not None:
@@ -251,7 +274,8 @@ def get_symbol_candles(
         raise ValueError(f"Unsupported timeframe: {timeframe}")
 
     # Путь 1: реальные свечи cTrader
-    if CTRADER_ENABLED and get_realtime_candles is not None:
+    get_realtime_candles = _realtime_source()[1] if CTRADER_ENABLED else None
+    if get_realtime_candles is not None:
         try:
             candles = get_realtime_candles(symbol_key, timeframe, limit=limit)
             if candles:
@@ -282,14 +306,102 @@ def get_full_candles_snapshot(
     limit: int = 50,
 ) -> Dict[str, Dict[Timeframe, List[Candle]]]:
     """
-    Вернуть свечи по всем символам и всем таймфреймам.
+    Вернуть свечи по всем символам и всем таймфреймам (объектами Candle;
+    для аналитики дешевле get_candle_batch — те же данные массивами).
+    """
+    batch = get_candle_batch(timeframes, limit=limit)
+    return {
+        symbol_key: {tf: batch.candles(symbol_key, tf) for tf in batch.timeframes}
+        for symbol_key in WATCHLIST.keys()
+    }
+
+
+# ─────────────────────────────────────────────
+# 6. Пакетный срез свечей (один проход за цикл)
+# ─────────────────────────────────────────────
+
+_EMPTY_BARS = np.empty(0, dtype=CANDLE_DTYPE)
+
+
+@dataclass
+class CandleBatch:
+    """
+    Свечи всех символов × таймфреймов за один цикл Market Engine.
+
+    bars[symbol_key][tf] — структурированный массив CANDLE_DTYPE (как в
+    candle_store.py: time — UTC в секундах, OHLCV), по возрастанию времени;
+    последняя строка — формирующаяся свеча.
+    """
+    bars: Dict[str, Dict[str, np.ndarray]]
+    timeframes: List[str]
+
+    def get(self, symbol_key: str, timeframe: str) -> np.ndarray:
+        return self.bars.get(symbol_key, {}).get(timeframe, _EMPTY_BARS)
+
+    def closed(self, symbol_key: str, timeframe: str) -> np.ndarray:
+        """Только закрытые свечи (без формирующейся)."""
+        return self.get(symbol_key, timeframe)[:-1]
+
+    def candles(self, symbol_key: str, timeframe: str) -> List[Candle]:
+        return _bars_to_candles(symbol_key, timeframe, self.get(symbol_key, timeframe))
+
+    def closes(self, timeframe: str, closed: bool = True) -> Dict[str, pd.Series]:
+        """Цены закрытия по символам: Series с UTC DatetimeIndex."""
+        out: Dict[str, pd.Series] = {}
+        for symbol_key in self.bars:
+            bars = self.closed(symbol_key, timeframe) if closed else self.get(symbol_key, timeframe)
+            index = pd.DatetimeIndex(pd.to_datetime(bars["time"], unit="s", utc=True), name="time")
+            out[symbol_key] = pd.Series(bars["close"], index=index, dtype="float64")
+        return out
+
+    def frame(self) -> pd.DataFrame:
+        """Все свечи одним DataFrame: MultiIndex (symbol, timeframe, time), колонки OHLCV."""
+        parts = [
+            (symbol_key, tf, bars)
+            for symbol_key, tfs in self.bars.items()
+            for tf, bars in tfs.items()
+        ]
+        if not parts:
+            return pd.DataFrame(columns=list(CANDLE_DTYPE.names[1:]))
+        bars = np.concatenate([p[2] for p in parts])
+        index = pd.MultiIndex.from_arrays(
+            [
+                np.repeat([p[0] for p in parts], [len(p[2]) for p in parts]),
+                np.repeat([p[1] for p in parts], [len(p[2]) for p in parts]),
+                pd.to_datetime(bars["time"], unit="s", utc=True),
+            ],
+            names=["symbol", "timeframe", "time"],
+        )
+        return pd.DataFrame({name: bars[name] for name in CANDLE_DTYPE.names[1:]}, index=index)
+
+
+def get_candle_batch(
+    timeframes: Sequence[Timeframe] | None = None,
+    limit: int = 50,
+) -> CandleBatch:
+    """
+    Свечи по всем символам WATCHLIST и таймфреймам одним вызовом:
+
+    - если CTRADER_ENABLED=1 → хвосты файлов свечей демона (candle_store.py),
+      по последним limit записей на пару, без JSON и объектов Candle;
+    - пары без данных (или при ошибке источника) → фейковые свечи, как в get_symbol_candles.
     """
-    if timeframes is None:
-        timeframes = CANDLE_TIMEFRAMES
+    timeframes = list(timeframes or CANDLE_TIMEFRAMES)
+    for tf in timeframes:
+        if tf not in CANDLE_TIMEFRAMES:
+            raise ValueError(f"Unsupported timeframe: {tf}")
+
+    bars: Dict[str, Dict[str, np.ndarray]] = {}
+    get_realtime_candle_arrays = _realtime_source()[2] if CTRADER_ENABLED else None
+    if get_realtime_candle_arrays is not None:
+        try:
+            bars = get_realtime_candle_arrays(list(WATCHLIST.keys()), timeframes, limit=limit)
+        except Exception as e:
+            print(f"[market_snapshot] cTrader candle batch error: {e}")
 
-    result: Dict[str, Dict[Timeframe, List[Candle]]] = {}
     for symbol_key in WATCHLIST.keys():
-        result[symbol_key] = {}
+        tfs = bars.setdefault(symbol_key, {})
         for tf in timeframes:
-            result[symbol_key][tf] = get_symbol_candles(symbol_key, tf, limit=limit)
-    return result
+            if len(tfs.get(tf, _EMPTY_BARS)) == 0:
+                tfs[tf] = _fake_symbol_bars(symbol_key, tf, limit=limit)
+    return CandleBatch(bars=bars, timeframes=timeframes)
@@ -0,0 +1,143 @@
+"""
+openapi_wire.py — транспорт cTrader Open API без Twisted
+
+Задачи:
+- кадры протокола: 4 байта длины (big-endian) + ProtoMessage
+- упаковка / распаковка сообщений (payloadType + payload + clientMsgId)
+- пересчёт цен и trendbar из "relative" формата (1/100000)
+- запись / чтение сессий (для fake_openapi_server.py)
+
+Используется:
+- ctrader_daemon.py        (живое подключение)
+- fake_openapi_server.py   (локальный стенд с повтором записанных кадров)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoHeartbeatEvent, ProtoMessage
+from ctrader_open_api.messages.OpenApiModelMessages_pb2 import ProtoOATrendbarPeriod
+from ctrader_open_api.protobuf import Protobuf
+
+# ─────────────────────────────────────────────
+# 0. Константы протокола
+# ─────────────────────────────────────────────
+
+PRICE_SCALE = 100_000            # цены в Open API — целые в 1/100000
+MAX_FRAME = 15_000_000           # как TcpProtocol.MAX_LENGTH в ctrader-open-api
+HEARTBEAT_TYPE = ProtoHeartbeatEvent().payloadType
+
+# Наши таймфреймы → ProtoOATrendbarPeriod
+TRENDBAR_PERIODS: Dict[str, int] = {
+    tf: ProtoOATrendbarPeriod.Value(tf) for tf in ("M1", "M5", "M15", "M30", "H1", "H4", "D1")
+}
+PERIOD_NAMES: Dict[int, str] = {v: k for k, v in TRENDBAR_PERIODS.items()}
+
+_LEN = struct.Struct(">I")
+_REC = struct.Struct("<dI")      # запись сессии: время (сек) + длина кадра
+
+
+class CTraderError(RuntimeError):
+    """Ответ ProtoOAErrorRes / ProtoErrorRes на запрос."""
+
+
+# ─────────────────────────────────────────────
+# 1. Кадры и сообщения
+# ─────────────────────────────────────────────
+
+def encode(message, client_msg_id: Optional[str] = None) -> bytes:
+    """Payload-сообщение (ProtoOA...) → сериализованный ProtoMessage."""
+    wrapper = ProtoMessage(payloadType=message.payloadType, payload=message.SerializeToString())
+    if client_msg_id is not None:
+        wrapper.clientMsgId = client_msg_id
+    return wrapper.SerializeToString()
+
+
+def frame(data: bytes) -> bytes:
+    return _LEN.pack(len(data)) + data
+
+
+def decode(data: bytes) -> ProtoMessage:
+    msg = ProtoMessage()
+    msg.ParseFromString(data)
+    return msg
+
+
+def extract(msg: ProtoMessage):
+    """ProtoMessage → конкретное сообщение по payloadType."""
+    return Protobuf.extract(msg)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    """Следующий кадр из потока (IncompleteReadError — соединение закрыто)."""
+    (size,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+    if size > MAX_FRAME:
+        raise ConnectionError(f"Слишком большой кадр Open API: {size} байт")
+    return await reader.readexactly(size)
+
+
+# ─────────────────────────────────────────────
+# 2. Цены и свечи
+# ─────────────────────────────────────────────
+
+def to_price(value: int, digits: int) -> float:
+    return round(value / PRICE_SCALE, digits)
+
+
+def trendbar_to_row(bar, digits: int) -> Tuple[int, float, float, float, float, float]:
+    """ProtoOATrendbar → (time UTC в секундах, open, high, low, close, volume) — запись candle_store."""
+    low = bar.low
+    return (
+        bar.utcTimestampInMinutes * 60,
+        to_price(low + bar.deltaOpen, digits),
+        to_price(low + bar.deltaHigh, digits),
+        to_price(low, digits),
+        to_price(low + bar.deltaClose, digits),
+        float(bar.volume),
+    )
+
+
+# ─────────────────────────────────────────────
+# 3. Запись и чтение сессий
+# ─────────────────────────────────────────────
+
+class FrameRecorder:
+    """Дописывает входящие кадры в файл: (время, длина, ProtoMessage) подряд."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = self.path.open("ab")
+
+    def write(self, data: bytes, ts: Optional[float] = None) -> None:
+        self._f.write(_REC.pack(time.time() if ts is None else ts, len(data)))
+        self._f.write(data)
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def write_recording(path: Path, frames: Iterable[Tuple[float, bytes]]) -> None:
+    rec = FrameRecorder(path)
+    try:
+        for ts, data in frames:
+            rec.write(data, ts)
+    finally:
+        rec.close()
+
+
+def read_recording(path: Path) -> List[Tuple[float, bytes]]:
+    raw = Path(path).read_bytes()
+    out = []
+    pos = 0
+    while pos + _REC.size <= len(raw):
+        ts, size = _REC.unpack_from(raw, pos)
+        pos += _REC.size
+        out.append((ts, raw[pos:pos + size]))
+        pos += size
+    return out
@@ -0,0 +1,237 @@
+"""
+spot_table.py — таблица последних котировок в mmap-файле (вместо ctrader_spots.json)
+
+Идея:
+- файл фиксированной раскладки: заголовок + по одному слоту на символ WATCHLIST
+- слот (64 байта, одна кэш-линия): seq, bid, ask, last, timestamp, имя символа
+- демон пишет на каждом тике, читатели в других процессах отображают тот же
+  файл и читают слот без парсинга JSON и без блокировок
+- согласованность — seqlock: писатель делает seq нечётным, пишет поля,
+  делает seq чётным; читатель повторяет чтение, если seq нечётный или изменился
+- отображённый файл не заменяется и не меняет размер (Windows этого не даёт):
+  новая раскладка пишется в файл следующего поколения ctrader_spots.{N}.bin,
+  старый и базовый файлы помечаются STALE с номером N — читатели переходят сами
+
+Раскладка (little-endian):
+    заголовок 64 байта: magic "SPT1", version, n_slots, slot_size, next u64 (поколение после STALE)
+    слот i:   seq u64 | bid f64 | ask f64 | last f64 | timestamp f64 | key 16s | резерв
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"SPT1"
+STALE = b"DEAD"              # файл заменён новой раскладкой — читателю пора переоткрыть
+VERSION = 1
+
+_HEADER = struct.Struct("<4sIII")
+HEADER_SIZE = 64
+SLOT_SIZE = 64
+_SEQ = struct.Struct("<Q")
+_NEXT_OFFSET = _HEADER.size                      # u64: поколение, заменившее файл (вместе с STALE)
+_FIELDS = struct.Struct("<dddd")                 # bid, ask, last, timestamp
+_SLOT = struct.Struct("<Qdddd16s")
+_KEY_OFFSET = _SEQ.size + _FIELDS.size
+
+SpotRow = Tuple[float, float, float, float]      # bid, ask, last, timestamp (epoch, сек)
+
+
+def generation_path(path: Path, generation: int) -> Path:
+    """Файл поколения generation базового файла path (0 — сам path)."""
+    return path if generation == 0 else path.with_name(f"{path.stem}.{generation}{path.suffix}")
+
+
+def _generations(path: Path) -> List[int]:
+    """Номера поколений базового файла path, лежащих на диске (кроме 0)."""
+    out = []
+    for p in path.parent.glob(f"{path.stem}.*{path.suffix}"):
+        tail = p.name[len(path.stem) + 1:len(p.name) - len(path.suffix)]
+        if tail.isdigit():
+            out.append(int(tail))
+    return out
+
+
+def _current_generation(path: Path) -> Optional[int]:
+    """Актуальное поколение по заголовку базового файла; None — таблицы нет."""
+    if not path.exists() or path.stat().st_size < HEADER_SIZE:
+        return None
+    with path.open("rb") as f:
+        head = f.read(_NEXT_OFFSET + _SEQ.size)
+    return _SEQ.unpack_from(head, _NEXT_OFFSET)[0] if head[:4] == STALE else 0
+
+
+def _mark_stale(path: Path, generation: int) -> None:
+    """STALE + номер нового поколения обычной записью в файл (отображение не нужно)."""
+    with path.open("r+b") as f:
+        f.seek(_NEXT_OFFSET)
+        f.write(_SEQ.pack(generation))
+        f.seek(0)
+        f.write(STALE)
+
+
+class SpotTable:
+    """
+    Писатель (демон):
+        table = SpotTable.create(path, WATCHLIST.keys())
+        table.write("US30", bid, ask, last, ts)
+
+    Читатель (любой процесс):
+        table = SpotTable.open(path)        # None, если файла ещё нет
+        table.read("US30")                  # (bid, ask, last, ts) или None
+    """
+
+    def __init__(self, path: Path, mm: mmap.mmap, keys: Iterable[str], writable: bool, generation: int = 0):
+        self.base_path = Path(path)                              # вход для читателей
+        self.generation = generation
+        self.path = generation_path(self.base_path, generation)  # файл актуального поколения
+        self._mm = mm
+        self.keys = list(keys)
+        self._slots: Dict[str, int] = {k: HEADER_SIZE + i * SLOT_SIZE for i, k in enumerate(self.keys)}
+        self._seq: Dict[str, int] = {}
+        self.writable = writable
+        if writable:
+            for key, off in self._slots.items():
+                seq = _SEQ.unpack_from(mm, off)[0]
+                self._seq[key] = seq + (seq & 1)     # писатель упал посреди записи — слот снова чётный
+
+    # ---------- открытие ----------
+
+    @classmethod
+    def create(cls, path: Path, keys: Iterable[str]) -> "SpotTable":
+        """
+        Открывает таблицу на запись. Совместимый файл (те же символы) переиспользуется —
+        читатели продолжают работать; иначе новая таблица пишется в файл следующего
+        поколения, а старый и базовый помечаются STALE. Существующий файл не заменяется
+        (os.replace поверх отображённого файла на Windows падает).
+        """
+        path = Path(path)
+        keys = list(keys)
+        existing = cls.open(path)
+        if existing is not None and existing.keys == keys:
+            table = cls(path, existing._mm, keys, writable=True, generation=existing.generation)
+            table._remove_stale()
+            return table
+
+        size = HEADER_SIZE + SLOT_SIZE * len(keys)
+        buf = bytearray(size)
+        _HEADER.pack_into(buf, 0, MAGIC, VERSION, len(keys), SLOT_SIZE)
+        for i, key in enumerate(keys):
+            name = key.encode("utf-8")
+            if len(name) > 16:
+                raise ValueError(f"Слишком длинное имя символа для таблицы: {key}")
+            _SLOT.pack_into(buf, HEADER_SIZE + i * SLOT_SIZE, 0, 0.0, 0.0, 0.0, 0.0, name)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        generation = 0
+        if _current_generation(path) is not None:
+            generation = max(_generations(path) + [existing.generation if existing else 0]) + 1
+        target = generation_path(path, generation)
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        tmp.write_bytes(bytes(buf))
+        os.replace(tmp, target)                  # target ещё не существует — никем не отображён
+
+        if existing is not None:
+            existing._mm[_NEXT_OFFSET:_NEXT_OFFSET + _SEQ.size] = _SEQ.pack(generation)
+            existing._mm[:4] = STALE
+            existing.close()
+        if generation:
+            _mark_stale(path, generation)        # вход для новых читателей
+        table = cls(path, cls._map(target), keys, writable=True, generation=generation)
+        table._remove_stale()
+        return table
+
+    @classmethod
+    def open(cls, path: Path, attempts: int = 5) -> Optional["SpotTable"]:
+        """Актуальное поколение таблицы (по указателю базового файла) или None."""
+        path = Path(path)
+        for _ in range(attempts):                # писатель мог как раз сменить поколение
+            generation = _current_generation(path)
+            if generation is None:
+                return None
+            target = generation_path(path, generation)
+            try:
+                if target.stat().st_size < HEADER_SIZE:
+                    return None
+                mm = cls._map(target)
+            except FileNotFoundError:
+                continue
+            magic, version, n_slots, slot_size = _HEADER.unpack_from(mm, 0)
+            if magic == STALE:
+                mm.close()
+                continue
+            if magic != MAGIC or version != VERSION or slot_size != SLOT_SIZE \
+                    or len(mm) < HEADER_SIZE + n_slots * SLOT_SIZE:
+                mm.close()
+                return None
+            keys = []
+            for i in range(n_slots):
+                off = HEADER_SIZE + i * SLOT_SIZE + _KEY_OFFSET
+                keys.append(bytes(mm[off:off + 16]).rstrip(b"\0").decode("utf-8"))
+            return cls(path, mm, keys, writable=False, generation=generation)
+        return None
+
+    @staticmethod
+    def _map(path: Path) -> mmap.mmap:
+        with path.open("r+b") as f:
+            return mmap.mmap(f.fileno(), 0)
+
+    @property
+    def stale(self) -> bool:
+        """Демон пересоздал таблицу с другой раскладкой — нужно открыть файл заново."""
+        return self._mm[:4] != MAGIC
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def _remove_stale(self) -> None:
+        """Удаляет прошлые поколения; занятые читателем (Windows) — при следующем create()."""
+        for generation in _generations(self.base_path):
+            if generation != self.generation:
+                try:
+                    generation_path(self.base_path, generation).unlink()
+                except OSError:
+                    pass
+
+    # ---------- запись / чтение ----------
+
+    def write(self, key: str, bid: float, ask: float, last: float, timestamp: float) -> None:
+        """Запись слота под seqlock (один писатель на таблицу)."""
+        off = self._slots[key]
+        seq = self._seq[key]
+        mm = self._mm
+        _SEQ.pack_into(mm, off, seq + 1)                      # нечётный — идёт запись
+        _FIELDS.pack_into(mm, off + _SEQ.size, bid, ask, last, timestamp)
+        _SEQ.pack_into(mm, off, seq + 2)                      # чётный — слот согласован
+        self._seq[key] = seq + 2
+
+    def read(self, key: str, retries: int = 1000) -> Optional[SpotRow]:
+        """Согласованный снимок слота; None — символ ещё не писался (или нет в таблице)."""
+        off = self._slots.get(key)
+        if off is None:
+            return None
+        mm = self._mm
+        for _ in range(retries):
+            seq, bid, ask, last, ts, _ = _SLOT.unpack_from(mm, off)
+            if seq & 1:
+                continue                                      # писатель посреди записи
+            if _SEQ.unpack_from(mm, off)[0] != seq:
+                continue                                      # слот перезаписан во время чтения
+            return None if seq == 0 else (bid, ask, last, ts)
+        return None
+
+    def read_all(self) -> Dict[str, SpotRow]:
+        out = {}
+        for key in self.keys:
+            row = self.read(key)
+            if row is not None:
+                out[key] = row
+        return out
+
+    def sequence(self, key: str) -> int:
+        """Номер версии слота (чётный, растёт на 2 с каждым тиком)."""
+        return _SEQ.unpack_from(self._mm, self._slots[key])[0]